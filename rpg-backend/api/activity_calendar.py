@@ -0,0 +1,149 @@
+"""
+Календарь активности пользователя (тепловая карта и график XP).
+
+Одна строка ActivityYear на пользователя и год хранит два упакованных
+массива по 366 дней: число выполненных квестов (uint16) и полученный XP
+(uint32), little-endian. Год профиля читается одной строкой по ключу
+(user, year). День определяется в часовом поясе пользователя.
+
+Изменения календаря пользователя сериализуются блокировкой строки User:
+её берут и record_activity, и rebuild_calendar, поэтому пересборка не
+теряет и не удваивает параллельные начисления.
+"""
+import sys
+from array import array
+from datetime import date
+
+from django.db import transaction
+from django.utils import timezone
+
+from .ledger import CORRECTION_REASON, OPENING_REASON, XP
+from .models import DAYS_IN_YEAR, ActivityYear, ArchivedCurrencyTransaction, CurrencyTransaction, QuestAssignment, User
+
+COMPLETIONS_MAX = 0xFFFF
+XP_MAX = 0xFFFFFFFF
+
+
+def unpack(data, typecode):
+    values = array(typecode)
+    values.frombytes(bytes(data))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+def pack(values):
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def day_index(day):
+    return day.timetuple().tm_yday - 1
+
+
+def record_activity(user, xp=0, completions=0, day=None):
+    """
+    Прибавляет XP и выполненные квесты к дню календаря пользователя.
+
+    Вызывается в транзакции, записавшей исходную строку (выполнение или
+    начисление XP): строка пользователя блокируется до её конца, поэтому
+    пересборка видит либо и исходную строку, и прибавку, либо ни одну.
+    Блокировка User берётся до ActivityYear; вызывающий, который уже пишет
+    журнал (LedgerAccount), должен заблокировать User раньше него.
+    """
+    if xp <= 0 and completions <= 0:
+        return
+    if day is None:
+        from .utils import user_today
+        day = user_today(user)
+    index = day_index(day)
+    with transaction.atomic():
+        User.objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True).first()
+        row, _ = ActivityYear.objects.select_for_update().get_or_create(user_id=user.pk, year=day.year)
+        day_completions = unpack(row.completions, 'H')
+        day_xp = unpack(row.xp, 'I')
+        day_completions[index] = min(COMPLETIONS_MAX, day_completions[index] + max(0, completions))
+        day_xp[index] = min(XP_MAX, day_xp[index] + max(0, xp))
+        row.completions = pack(day_completions)
+        row.xp = pack(day_xp)
+        row.save(update_fields=['completions', 'xp', 'updated_at'])
+
+
+def get_year(user_id, year):
+    """
+    Календарь пользователя за год.
+
+    Returns:
+        dict: {'year', 'start', 'completions': [...], 'xp': [...], 'total_completions', 'total_xp', 'active_days'}
+            или None, если пользователя нет
+    """
+    days = (date(year + 1, 1, 1) - date(year, 1, 1)).days
+    row = ActivityYear.objects.filter(user_id=user_id, year=year).values_list('completions', 'xp').first()
+    if row is None:
+        if not User.objects.filter(pk=user_id).exists():
+            return None
+        completions, xp = [0] * days, [0] * days
+    else:
+        completions = unpack(row[0], 'H').tolist()[:days]
+        xp = unpack(row[1], 'I').tolist()[:days]
+    return {
+        'year': year,
+        'start': date(year, 1, 1),
+        'completions': completions,
+        'xp': xp,
+        'total_completions': sum(completions),
+        'total_xp': sum(xp),
+        'active_days': sum(1 for a, b in zip(completions, xp) if a or b),
+    }
+
+
+def rebuild_calendar(tz_by_user):
+    """
+    Пересобирает календари пользователей из выполненных квестов и начислений XP
+    (включая архивированные записи журнала).
+
+    Исходные строки читаются и календари заменяются в одной транзакции под
+    блокировкой строк пользователей, поэтому параллельные record_activity
+    не теряются. Вводные и корректирующие записи журнала пропускаются.
+
+    Args:
+        tz_by_user: {user_id: tzinfo} пользователей пачки (их годы перезаписываются)
+
+    Returns:
+        int: Количество сохранённых строк ActivityYear
+    """
+    user_ids = list(tz_by_user)
+    years = {}
+
+    def cell(user_id, moment):
+        day = timezone.localdate(moment, timezone=tz_by_user[user_id])
+        key = (user_id, day.year)
+        if key not in years:
+            years[key] = (array('H', [0]) * DAYS_IN_YEAR, array('I', [0]) * DAYS_IN_YEAR)
+        return years[key], day_index(day)
+
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(id__in=user_ids).order_by('id').values_list('id', flat=True))
+
+        completed = QuestAssignment.objects.filter(
+            user_id__in=user_ids, is_completed=True, completed_at__isnull=False
+        ).values_list('user_id', 'completed_at')
+        for user_id, completed_at in completed.iterator():
+            (day_completions, _), index = cell(user_id, completed_at)
+            day_completions[index] = min(COMPLETIONS_MAX, day_completions[index] + 1)
+        for model in (CurrencyTransaction, ArchivedCurrencyTransaction):
+            xp_rows = model.objects.filter(user_id__in=user_ids, currency=XP, delta__gt=0).exclude(
+                reason__in=(OPENING_REASON, CORRECTION_REASON)
+            ).values_list('user_id', 'created_at', 'delta')
+            for user_id, created_at, delta in xp_rows.iterator():
+                (_, day_xp), index = cell(user_id, created_at)
+                day_xp[index] = min(XP_MAX, day_xp[index] + delta)
+
+        ActivityYear.objects.filter(user_id__in=user_ids).delete()
+        ActivityYear.objects.bulk_create([
+            ActivityYear(user_id=user_id, year=year, completions=pack(day_completions), xp=pack(day_xp))
+            for (user_id, year), (day_completions, day_xp) in years.items()
+        ])
+    return len(years)
@@ -0,0 +1,160 @@
+"""
+Журнал действий пользователей (ActivityLog) с буферизованной записью.
+
+log_activity() не пишет в базу: событие после фиксации транзакции
+запроса кладётся в очередь процесса, а фоновый поток сохраняет очередь
+пачками через bulk_create — когда набралось ACTIVITY_LOG_BATCH_SIZE
+событий или прошло ACTIVITY_LOG_FLUSH_INTERVAL. Очередь ограничена
+ACTIVITY_LOG_QUEUE_SIZE: при переполнении новые события отбрасываются
+(с предупреждением в лог), а не копятся в памяти. При завершении
+процесса остаток очереди сохраняется (atexit).
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from .models import ActivityLog
+
+logger = logging.getLogger(__name__)
+
+QUEST_COMPLETED = 'quest_completed'
+ITEM_PURCHASED = 'item_purchased'
+GROUP_JOINED = 'group_joined'
+GROUP_LEFT = 'group_left'
+LOGIN = 'login'
+ACHIEVEMENT_UNLOCKED = 'achievement_unlocked'
+
+_STOP = object()
+
+
+class ActivityLogWriter:
+    def __init__(self, batch_size, flush_interval, max_queue):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='activity-log-writer', daemon=True)
+            self._thread.start()
+
+    def put(self, event):
+        self.start()
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning('Очередь журнала действий переполнена, отброшено событий: %s', self.dropped)
+
+    def flush(self, timeout=5):
+        """Дожидается сохранения всех событий, поставленных до вызова"""
+        if self._thread is None or not self._thread.is_alive():
+            self._drain()
+            return True
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def stop(self, timeout=5):
+        """Сохраняет остаток очереди и останавливает поток"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            self._drain()
+            return
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning('Журнал действий: очередь не освободилась при остановке')
+            return
+        thread.join(timeout)
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                event = self.queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                event = None
+            if event is _STOP:
+                self._write(batch)
+                connections.close_all()
+                return
+            if isinstance(event, threading.Event):
+                self._write(batch)
+                batch = []
+                event.set()
+                continue
+            if event is not None:
+                batch.append(event)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                self._write(batch)
+                batch = []
+                deadline = time.monotonic() + self.flush_interval
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                event = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(event, threading.Event):
+                event.set()
+            elif event is not _STOP:
+                batch.append(event)
+        self._write(batch)
+
+    def _write(self, batch):
+        if not batch:
+            return
+        close_old_connections()
+        try:
+            ActivityLog.objects.bulk_create(batch, batch_size=self.batch_size)
+        except Exception:
+            logger.exception('Не удалось сохранить %s событий журнала действий', len(batch))
+
+
+writer = ActivityLogWriter(
+    batch_size=settings.ACTIVITY_LOG_BATCH_SIZE,
+    flush_interval=settings.ACTIVITY_LOG_FLUSH_INTERVAL.total_seconds(),
+    max_queue=settings.ACTIVITY_LOG_QUEUE_SIZE,
+)
+atexit.register(writer.stop)
+
+
+def log_activity(user, verb, **data):
+    """
+    Записывает действие пользователя в журнал (асинхронно).
+
+    Событие попадает в очередь только после фиксации текущей транзакции,
+    поэтому откаченные действия в журнал не попадают. Время события —
+    момент вызова, а не сохранения пачки.
+
+    Args:
+        user: Пользователь (или None)
+        verb: Действие (QUEST_COMPLETED, ITEM_PURCHASED, ...)
+        **data: Данные события (JSON)
+    """
+    event = ActivityLog(user_id=getattr(user, 'pk', None), verb=verb, data=data, created_at=timezone.now())
+    transaction.on_commit(lambda: writer.put(event))
+
+
+def flush_activity_log(timeout=5):
+    """Сохраняет накопленные события (для команд и тестов)"""
+    return writer.flush(timeout)
@@ -6,7 +6,7 @@ from .models import *
 @admin.register(User)
 class UserAdmin(BaseUserAdmin):
     fieldsets = BaseUserAdmin.fieldsets + (
-        ('Game fields', {'fields': ('role', 'level', 'xp', 'coins', 'last_active', 'streak', 'last_activity_date', 'faculty', 'group_name')}),
+        ('Game fields', {'fields': ('role', 'level', 'xp', 'coins', 'last_active', 'streak', 'last_activity_date', 'time_zone', 'faculty', 'group_name')}),
     )
 
 # Регистрация остальных моделей
@@ -31,4 +31,13 @@ admin.site.register(QuestComment)
 admin.site.register(QuestLike)
 admin.site.register(GroupPost)
 admin.site.register(GroupPostComment)
-admin.site.register(GroupGoal)
\ No newline at end of file
+admin.site.register(GroupGoal)
+admin.site.register(GroupGoalContribution)
+admin.site.register(GroupGoalContributor)
+admin.site.register(GroupStats)
+admin.site.register(CourseStats)
+admin.site.register(QuestRecommendation)
+admin.site.register(PurchaseCounter)
+admin.site.register(FlashSaleSlot)
+admin.site.register(FlashSaleRequest)
+admin.site.register(IdempotencyKey)
@@ -0,0 +1,220 @@
+"""
+Материализованная статистика групп и курсов.
+
+GroupStats/CourseStats хранят количество участников, суммарный XP, XP за
+текущую неделю и количество выполненных квестов. Строки обновляются
+инкрементально (F-выражениями) при начислении XP, выполнении квеста и
+изменении состава группы, поэтому рейтинги групп и курсов читаются
+индексным сканом. Полный пересчёт из исходных таблиц —
+команда rebuild_group_stats.
+
+Статистика группы — сумма показателей её текущих участников; статистика
+курса — сумма показателей уникальных участников его групп.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Case, Count, F, Sum, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .ledger import XP
+from .models import Course, CourseStats, CurrencyTransaction, Group, GroupStats, QuestAssignment, User
+from .utils import calculate_total_xp
+
+
+def current_week_start():
+    """Понедельник текущей недели в часовом поясе TIME_ZONE"""
+    today = timezone.localdate()
+    return today - timedelta(days=today.weekday())
+
+
+def week_start_datetime(week_start):
+    return timezone.make_aware(datetime.combine(week_start, time.min))
+
+
+def _week_xp_expr(week_start, delta):
+    """XP за неделю с учётом того, что строка могла остаться с прошлой недели"""
+    return Greatest(
+        Case(
+            When(week_start=week_start, then=F('week_xp') + delta),
+            default=Value(delta),
+        ),
+        Value(0),
+    )
+
+
+def _apply(user_id, total_xp=0, week_xp=0, quests_completed=0, member_count=0, group_ids=None):
+    """
+    Прибавляет дельты ко всем строкам статистики, в которые входит пользователь.
+
+    Если group_ids не передан, обновляются все группы пользователя
+    и курсы этих групп (каждый курс — один раз).
+    """
+    week_start = current_week_start()
+    updates = {
+        'total_xp': Greatest(F('total_xp') + total_xp, Value(0)),
+        'week_xp': _week_xp_expr(week_start, week_xp),
+        'week_start': week_start,
+        'quests_completed': Greatest(F('quests_completed') + quests_completed, Value(0)),
+        'member_count': Greatest(F('member_count') + member_count, Value(0)),
+        'updated_at': timezone.now(),
+    }
+    if group_ids is None:
+        GroupStats.objects.filter(group__members=user_id).update(**updates)
+        CourseStats.objects.filter(course__groups__members=user_id).update(**updates)
+    else:
+        GroupStats.objects.filter(group_id__in=group_ids).update(**updates)
+
+
+def record_xp_award(user, xp_amount):
+    """Учитывает начисление XP в статистике групп и курсов пользователя"""
+    if xp_amount:
+        _apply(user.pk, total_xp=xp_amount, week_xp=xp_amount)
+
+
+def record_quest_completed(user):
+    """Учитывает выполненный квест в статистике групп и курсов пользователя"""
+    _apply(user.pk, quests_completed=1)
+
+
+def get_user_contribution(user_ids):
+    """
+    Текущие показатели пользователей для статистики групп.
+
+    Returns:
+        dict: user_id -> {'total_xp', 'week_xp', 'quests_completed'}
+    """
+    since = week_start_datetime(current_week_start())
+    result = {
+        user_id: {'total_xp': calculate_total_xp(level, xp), 'week_xp': 0, 'quests_completed': 0}
+        for user_id, level, xp in User.objects.filter(pk__in=user_ids).values_list('id', 'level', 'xp')
+    }
+    week = CurrencyTransaction.objects.filter(
+        user_id__in=user_ids, currency=XP, created_at__gte=since
+    ).values('user').annotate(week_xp=Sum('delta'))
+    for row in week:
+        result[row['user']]['week_xp'] = row['week_xp']
+    completed = QuestAssignment.objects.filter(
+        user_id__in=user_ids, is_completed=True
+    ).values('user').annotate(count=Count('id'))
+    for row in completed:
+        result[row['user']]['quests_completed'] = row['count']
+    return result
+
+
+def apply_membership_change(memberships, sign):
+    """
+    Учитывает вступление (sign=1) или выход (sign=-1) участников групп.
+
+    Args:
+        memberships: пары (group_id, user_id), изменённые одной операцией
+            (m2m_changed с любой стороны связи или удаление пользователя)
+        sign: 1 или -1
+
+    Изменение курса считается один раз на пару (курс, пользователь) по всей
+    операции: участник учитывается, только если у него нет в этом курсе
+    других членств, кроме изменяемых.
+    """
+    memberships = set(memberships)
+    if not memberships:
+        return
+    user_ids = {user_id for _, user_id in memberships}
+    contribution = get_user_contribution(user_ids)
+    group_course = dict(
+        Group.objects.filter(pk__in={group_id for group_id, _ in memberships}).values_list('id', 'course_id')
+    )
+
+    courses = set()
+    for group_id, user_id in memberships:
+        if user_id not in contribution or group_id not in group_course:
+            continue
+        deltas = {key: sign * value for key, value in contribution[user_id].items()}
+        _apply(user_id, member_count=sign, group_ids=[group_id], **deltas)
+        if group_course[group_id]:
+            courses.add((group_course[group_id], user_id))
+    if not courses:
+        return
+
+    remaining = {
+        (course_id, user_id)
+        for group_id, course_id, user_id in Group.members.through.objects.filter(
+            group__course_id__in={course_id for course_id, _ in courses}, user_id__in=user_ids
+        ).values_list('group_id', 'group__course_id', 'user_id')
+        if (group_id, user_id) not in memberships
+    }
+    week_start = current_week_start()
+    for course_id, user_id in courses - remaining:
+        deltas = {key: sign * value for key, value in contribution[user_id].items()}
+        CourseStats.objects.filter(course_id=course_id).update(
+            total_xp=Greatest(F('total_xp') + deltas['total_xp'], Value(0)),
+            week_xp=_week_xp_expr(week_start, deltas['week_xp']),
+            week_start=week_start,
+            quests_completed=Greatest(F('quests_completed') + deltas['quests_completed'], Value(0)),
+            member_count=Greatest(F('member_count') + sign, Value(0)),
+            updated_at=timezone.now(),
+        )
+
+
+def rebuild_stats():
+    """
+    Полностью пересчитывает GroupStats и CourseStats из исходных таблиц.
+
+    Returns:
+        tuple: (количество групп, количество курсов)
+    """
+    week_start = current_week_start()
+    since = week_start_datetime(week_start)
+
+    total_xp = {
+        user_id: calculate_total_xp(level, xp)
+        for user_id, level, xp in User.objects.values_list('id', 'level', 'xp').iterator()
+    }
+    week_xp = dict(
+        CurrencyTransaction.objects.filter(currency=XP, created_at__gte=since)
+        .values('user').annotate(s=Sum('delta')).values_list('user', 's')
+    )
+    completed = dict(
+        QuestAssignment.objects.filter(is_completed=True)
+        .values('user').annotate(c=Count('id')).values_list('user', 'c')
+    )
+
+    def empty():
+        return {'member_count': 0, 'total_xp': 0, 'week_xp': 0, 'quests_completed': 0}
+
+    group_course = dict(Group.objects.values_list('id', 'course_id'))
+    group_rows = {group_id: empty() for group_id in group_course}
+    course_rows = {course_id: empty() for course_id in Course.objects.values_list('id', flat=True)}
+    course_members = set()
+
+    memberships = Group.members.through.objects.values_list('group_id', 'user_id').iterator()
+    for group_id, user_id in memberships:
+        targets = [group_rows[group_id]]
+        course_id = group_course[group_id]
+        if course_id is not None and (course_id, user_id) not in course_members:
+            course_members.add((course_id, user_id))
+            targets.append(course_rows[course_id])
+        for row in targets:
+            row['member_count'] += 1
+            row['total_xp'] += total_xp.get(user_id, 0)
+            row['week_xp'] += week_xp.get(user_id, 0)
+            row['quests_completed'] += completed.get(user_id, 0)
+
+    fields = ['member_count', 'total_xp', 'week_xp', 'week_start', 'quests_completed', 'updated_at']
+    GroupStats.objects.bulk_create(
+        [
+            GroupStats(group_id=group_id, course_id=group_course[group_id], week_start=week_start, **row)
+            for group_id, row in group_rows.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['group'],
+        update_fields=['course'] + fields,
+        batch_size=1000,
+    )
+    CourseStats.objects.bulk_create(
+        [CourseStats(course_id=course_id, week_start=week_start, **row) for course_id, row in course_rows.items()],
+        update_conflicts=True,
+        unique_fields=['course'],
+        update_fields=fields,
+        batch_size=1000,
+    )
+    return len(group_rows), len(course_rows)
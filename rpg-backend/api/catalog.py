@@ -0,0 +1,98 @@
+"""
+Кэш каталога магазина в памяти процесса.
+
+Item и StoreItem меняются только из админки и команды add_shop_items,
+поэтому каждый воркер держит снимок каталога (товары с предметами и уже
+сериализованный список) и перечитывает его, только когда меняется номер
+версии в CatalogVersion. Номер увеличивается сигналами при сохранении и
+удалении Item/StoreItem; массовые изменения (queryset.update, bulk_create)
+должны вызывать bump_catalog_version сами.
+
+Склад в снимок не входит: остатки меняет каждая покупка, поэтому они
+читаются из базы отдельным лёгким запросом. Баланс и склад при покупке
+по-прежнему проверяются условными UPDATE (см. api/shop.py).
+"""
+import copy
+import hashlib
+import threading
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import CatalogVersion, StoreItem
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+class CatalogSnapshot:
+    def __init__(self, version, store_items, data):
+        self.version = version
+        self.store_items = store_items  # id -> StoreItem с загруженным item
+        self.data = data  # Сериализованный список активных товаров без склада
+
+
+def get_catalog_version():
+    version = CatalogVersion.objects.filter(pk=1).values_list('version', flat=True).first()
+    return version or 0
+
+
+def bump_catalog_version():
+    """Увеличивает версию каталога; снимки во всех воркерах устаревают"""
+    if not CatalogVersion.objects.filter(pk=1).update(version=F('version') + 1):
+        CatalogVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+
+
+def bump_catalog_version_on_commit():
+    transaction.on_commit(bump_catalog_version)
+
+
+def _load(version):
+    from .serializers import StoreItemSerializer
+
+    store_items = {
+        store_item.id: store_item
+        for store_item in StoreItem.objects.select_related('item').filter(is_active=True).order_by('id')
+    }
+    data = StoreItemSerializer(list(store_items.values()), many=True).data
+    for row in data:
+        row.pop('stock', None)
+    return CatalogSnapshot(version, store_items, data)
+
+
+def get_catalog():
+    """Актуальный снимок каталога: один запрос версии, каталог — только после изменений"""
+    global _snapshot
+    version = get_catalog_version()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = _load(version)
+        return _snapshot
+
+
+def get_store_item(store_item_id):
+    """
+    Активный товар магазина из снимка (копия, которую можно менять) или None.
+
+    Поле stock копии — значение на момент снимка и годится только для
+    проверки «склад ограничен»; актуальный остаток проверяет UPDATE.
+    """
+    store_item = get_catalog().store_items.get(store_item_id)
+    return copy.copy(store_item) if store_item is not None else None
+
+
+def store_list():
+    """
+    Список активных товаров с актуальными остатками и ETag.
+
+    Returns:
+        tuple: (список товаров, ETag)
+    """
+    snapshot = get_catalog()
+    stock = dict(StoreItem.objects.filter(id__in=snapshot.store_items).values_list('id', 'stock'))
+    digest = hashlib.md5(repr(sorted(stock.items())).encode(), usedforsecurity=False).hexdigest()[:16]
+    data = [{**row, 'stock': stock.get(row['id'])} for row in snapshot.data]
+    return data, f'"{snapshot.version}-{digest}"'
@@ -0,0 +1,200 @@
+"""
+Эффекты предметов: бусты и расходники.
+
+Использование предмета из инвентаря списывает одну единицу и:
+- для множителей (xp_multiplier, coins_multiplier, luck_multiplier,
+  speed_multiplier, group_boost) создаёт ActiveEffect на duration_hours /
+  duration_days; повторное использование того же предмета продлевает эффект;
+- для мгновенных бонусов (xp_bonus, coins_bonus, coins_bonus_random,
+  streak_bonus) сразу начисляет награду.
+
+Множители одного вида не складываются — действует наибольший. Набор
+действующих эффектов пользователя читается одним запросом и кэшируется
+до ближайшего истечения (но не дольше EFFECTS_CACHE_TTL). Истёкшие строки
+удаляет команда expire_effects; на расчёт они не влияют и до удаления.
+"""
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .ledger import COINS, record
+from .models import ActiveEffect, InventoryItem, Notification, User
+
+MULTIPLIER_KINDS = ('xp_multiplier', 'coins_multiplier', 'luck_multiplier', 'speed_multiplier', 'group_boost')
+INSTANT_KINDS = ('xp_bonus', 'coins_bonus', 'coins_bonus_random', 'streak_bonus')
+
+
+class EffectError(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'Предмет нельзя использовать'
+    default_code = 'effect_error'
+
+
+def _cache_key(user_id):
+    return f'effects:{user_id}'
+
+
+def invalidate_effects(*user_ids):
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+def get_active_effects(user_id):
+    """
+    Действующие множители пользователя.
+
+    Returns:
+        dict: вид эффекта -> множитель (только действующие)
+    """
+    key = _cache_key(user_id)
+    effects = cache.get(key)
+    if effects is not None:
+        return effects
+
+    now = timezone.now()
+    effects = {}
+    earliest = None
+    rows = ActiveEffect.objects.filter(user_id=user_id, expires_at__gt=now).values_list('kind', 'value', 'expires_at')
+    for kind, value, expires_at in rows:
+        effects[kind] = max(effects.get(kind, value), value)
+        earliest = expires_at if earliest is None else min(earliest, expires_at)
+
+    ttl = settings.EFFECTS_CACHE_TTL.total_seconds()
+    if earliest is not None:
+        ttl = min(ttl, (earliest - now).total_seconds())
+    # Таймаут 0 — не кэшировать: эффект истекает меньше чем через секунду
+    cache.set(key, effects, int(ttl))
+    return effects
+
+
+def get_multiplier(user, kind):
+    return get_active_effects(user.pk).get(kind, 1)
+
+
+def apply_multiplier(user, kind, amount):
+    """Награда с учётом действующего множителя указанного вида"""
+    multiplier = get_multiplier(user, kind)
+    return int(amount * multiplier) if multiplier != 1 else amount
+
+
+def _duration(properties):
+    return timedelta(
+        hours=properties.get('duration_hours', 0) or 0,
+        days=properties.get('duration_days', 0) or 0,
+    )
+
+
+def use_item(user, inventory_item):
+    """
+    Использует предмет из инвентаря пользователя.
+
+    Returns:
+        dict: {'effects': [ActiveEffect], 'xp': начислено XP, 'coins': начислено монет, 'streak': +streak}
+
+    Raises:
+        EffectError: У предмета нет применимых эффектов или он закончился
+    """
+    from .utils import add_xp_to_user
+
+    item = inventory_item.item
+    properties = item.properties or {}
+    multipliers = {kind: float(properties[kind]) for kind in MULTIPLIER_KINDS if kind in properties}
+    instant = {kind: properties[kind] for kind in INSTANT_KINDS if kind in properties}
+    if not multipliers and not instant:
+        raise EffectError('У этого предмета нет активируемых эффектов')
+    duration = _duration(properties)
+    if multipliers and not duration:
+        raise EffectError('У буста не указана длительность')
+
+    result = {'effects': [], 'xp': 0, 'coins': 0, 'streak': 0}
+    with transaction.atomic():
+        used = InventoryItem.objects.filter(pk=inventory_item.pk, user=user, quantity__gte=1).update(
+            quantity=F('quantity') - 1
+        )
+        if not used:
+            raise EffectError('Предмет закончился')
+        InventoryItem.objects.filter(pk=inventory_item.pk, quantity=0).delete()
+
+        now = timezone.now()
+        for kind, value in multipliers.items():
+            effect = ActiveEffect.objects.select_for_update().filter(
+                user=user, item=item, kind=kind, expires_at__gt=now
+            ).first()
+            if effect is not None:
+                effect.expires_at += duration
+                effect.save(update_fields=['expires_at'])
+            else:
+                effect = ActiveEffect.objects.create(
+                    user=user, item=item, kind=kind, value=value, expires_at=now + duration
+                )
+            result['effects'].append(effect)
+
+        reason = f"Использование: {item.name}"
+        meta = {"item_id": item.id}
+        if instant.get('xp_bonus'):
+            result['xp'] = int(instant['xp_bonus'])
+            add_xp_to_user(user, result['xp'], reason, meta, boost=False)
+        coins = int(instant.get('coins_bonus', 0) or 0)
+        if isinstance(instant.get('coins_bonus_random'), dict):
+            bounds = instant['coins_bonus_random']
+            coins += random.randint(int(bounds.get('min', 0)), int(bounds.get('max', 0)))
+        if coins:
+            User.objects.filter(pk=user.pk).update(coins=F('coins') + coins)
+            record(user, COINS, coins, reason, meta)
+            result['coins'] = coins
+        if instant.get('streak_bonus'):
+            result['streak'] = int(instant['streak_bonus'])
+            User.objects.filter(pk=user.pk).update(streak=F('streak') + result['streak'])
+
+        if multipliers:
+            transaction.on_commit(lambda: invalidate_effects(user.pk))
+
+    user.refresh_from_db(fields=['xp', 'level', 'coins', 'streak'])
+    return result
+
+
+def expire_effects(batch_size=1000):
+    """
+    Удаляет истёкшие эффекты и предметы инвентаря пачками и уведомляет владельцев.
+
+    Returns:
+        tuple: (удалено эффектов, удалено предметов инвентаря)
+    """
+    now = timezone.now()
+    effects = 0
+    expired = ActiveEffect.objects.filter(expires_at__lte=now).order_by('expires_at', 'id')
+    while True:
+        rows = list(expired.values_list('id', 'user_id', 'item__name')[:batch_size])
+        if not rows:
+            break
+        with transaction.atomic():
+            ActiveEffect.objects.filter(id__in=[row[0] for row in rows]).delete()
+            names = {}
+            for _, user_id, name in rows:
+                names.setdefault(user_id, set()).add(name or 'буст')
+            Notification.objects.bulk_create([
+                Notification(
+                    user_id=user_id,
+                    title="Действие буста закончилось",
+                    body=f"Закончилось действие: {', '.join(sorted(items))}",
+                    data={"type": "effect_expired"}
+                )
+                for user_id, items in names.items()
+            ])
+        invalidate_effects(*names)
+        effects += len(rows)
+
+    items = 0
+    expired_items = InventoryItem.objects.filter(expires_at__lte=now).order_by('expires_at', 'id')
+    while True:
+        ids = list(expired_items.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            break
+        items += InventoryItem.objects.filter(id__in=ids).delete()[0]
+    return effects, items
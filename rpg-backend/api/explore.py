@@ -0,0 +1,137 @@
+"""
+Лента «Обзор»: недавно выполненные публичные квесты по «горячести».
+
+Горячесть назначения хранится в QuestAssignment.hot_score:
+
+    log10(1 + лайки) + (completed_at - HOT_EPOCH) / HOT_DECAY_SECONDS
+
+Вклад времени растёт для новых выполнений, поэтому старые записи
+опускаются без периодического пересчёта: каждые HOT_DECAY_SECONDS
+новизны стоят десятикратного числа лайков. Оценка задаётся при
+выполнении и пересчитывается при появлении и удалении лайка, а лента
+читается по индексу -hot_score.
+
+Горячесть меняется с каждым лайком, поэтому курсор по ней пропускал бы
+и повторял записи между страницами. Первая страница фиксирует порядок:
+первые EXPLORE_SNAPSHOT_SIZE id ленты сохраняются в кэше на
+EXPLORE_SNAPSHOT_TTL, и курсор — это (снимок, смещение). Цена
+стабильности: новые выполнения и лайки видны со следующего открытия
+ленты, глубина ленты ограничена снимком, а устаревший курсор требует
+начать ленту заново.
+"""
+import base64
+import math
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import BooleanField, Count, Exists, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import QuestAssignment, QuestLike
+
+HOT_EPOCH = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+HOT_DECAY_SECONDS = 45000  # 12.5 часа
+
+
+class ExploreError(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'Неверный или устаревший курсор ленты, начните ленту заново'
+    default_code = 'explore_error'
+
+
+def hot_score(likes, completed_at):
+    return math.log10(1 + max(0, likes)) + (completed_at - HOT_EPOCH).total_seconds() / HOT_DECAY_SECONDS
+
+
+def refresh_hot_score(assignment_id):
+    """Пересчитывает горячесть назначения по текущему числу лайков"""
+    completed_at = QuestAssignment.objects.filter(
+        pk=assignment_id, is_completed=True, completed_at__isnull=False
+    ).values_list('completed_at', flat=True).first()
+    if completed_at is None:
+        return
+    likes = QuestLike.objects.filter(quest_assignment_id=assignment_id).count()
+    QuestAssignment.objects.filter(pk=assignment_id).update(hot_score=hot_score(likes, completed_at))
+
+
+def refresh_hot_score_on_commit(assignment_id):
+    # После фиксации, чтобы подсчёт видел лайки параллельных транзакций
+    transaction.on_commit(lambda: refresh_hot_score(assignment_id))
+
+
+def _feed():
+    since = timezone.now() - timedelta(days=settings.EXPLORE_FEED_DAYS)
+    return QuestAssignment.objects.filter(hot_score__isnull=False, completed_at__gte=since, quest__is_public=True)
+
+
+def explore_queryset(user):
+    """
+    Выполненные публичные квесты за последние EXPLORE_FEED_DAYS дней,
+    с likes_count и is_liked.
+
+    Счётчик лайков — коррелированный подзапрос, а не JOIN с GROUP BY,
+    чтобы запрос не группировал всю ленту.
+    """
+    likes = QuestLike.objects.filter(quest_assignment=OuterRef('pk')).values('quest_assignment').annotate(
+        total=Count('id')
+    ).values('total')
+    queryset = _feed().select_related('quest', 'user').annotate(
+        likes_count=Coalesce(Subquery(likes, output_field=IntegerField()), Value(0)),
+    )
+    if user.is_authenticated:
+        return queryset.annotate(is_liked=Exists(
+            QuestLike.objects.filter(quest_assignment=OuterRef('pk'), user=user)
+        ))
+    return queryset.annotate(is_liked=Value(False, output_field=BooleanField()))
+
+
+def _snapshot_key(token):
+    return f'explore:{token}'
+
+
+def encode_cursor(token, offset):
+    return base64.urlsafe_b64encode(f'{token}|{offset}'.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        token, offset = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return token, max(0, int(offset))
+    except (ValueError, UnicodeError):
+        raise ExploreError()
+
+
+def explore_page(user, cursor=None, limit=20):
+    """
+    Страница ленты «Обзор» по снимку порядка.
+
+    Args:
+        user: Читатель (для is_liked)
+        cursor: Курсор из предыдущей страницы (next_cursor) или None — новый снимок
+        limit: Размер страницы
+
+    Returns:
+        tuple: (назначения страницы в порядке снимка, курсор следующей страницы или None)
+    """
+    if cursor:
+        token, offset = decode_cursor(cursor)
+        ids = cache.get(_snapshot_key(token))
+        if ids is None:
+            raise ExploreError()
+    else:
+        token, offset = uuid.uuid4().hex, 0
+        ids = list(_feed().order_by('-hot_score', '-id').values_list('id', flat=True)[:settings.EXPLORE_SNAPSHOT_SIZE])
+        cache.set(_snapshot_key(token), ids, int(settings.EXPLORE_SNAPSHOT_TTL.total_seconds()))
+
+    page_ids = ids[offset:offset + limit]
+    rows = {row.pk: row for row in explore_queryset(user).filter(pk__in=page_ids)}
+    # Записи, удалённые или вышедшие из ленты после снимка, пропускаются
+    page = [rows[pk] for pk in page_ids if pk in rows]
+    next_cursor = encode_cursor(token, offset + limit) if offset + limit < len(ids) else None
+    return page, next_cursor
@@ -0,0 +1,280 @@
+"""
+Потоковая выгрузка данных для отчётности.
+
+Наборы: назначения квестов, журнал XP и монет, пользователи, журнал
+активности. Фильтры: период (по дате в TIME_ZONE), факультет, курс
+(пользователь состоит в группе курса). Строки читаются
+values_list(...).iterator() — в PostgreSQL это серверный курсор, поэтому
+выгрузка любого размера не загружает queryset в память целиком.
+
+Форматы: CSV и NDJSON (потоком, в HTTP и в файл), Parquet — только в файл
+командой export_data и только при установленном pyarrow.
+"""
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .ledger import detail_horizon, month_start_datetime
+from .models import ActivityLog, ArchivedCurrencyTransaction, CurrencyTransaction, Group, QuestAssignment, User
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+PARQUET = 'parquet'
+STREAM_FORMATS = (CSV, NDJSON)
+CHUNK_SIZE = 2000
+LINES_PER_WRITE = 500
+
+
+class ExportError(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'Неверные параметры выгрузки'
+    default_code = 'export_error'
+
+
+class Dataset:
+    def __init__(self, model, columns, date_field, user_field, archive_model=None):
+        self.model = model
+        self.columns = columns  # {имя колонки: путь поля для values_list}
+        self.date_field = date_field
+        self.user_field = user_field  # Поле с id пользователя (для фильтров по факультету и курсу)
+        self.archive_model = archive_model  # Архив записей старше detail_horizon() с теми же полями и id
+
+
+DATASETS = {
+    'assignments': Dataset(
+        QuestAssignment,
+        {
+            'id': 'id', 'quest_id': 'quest_id', 'quest_title': 'quest__title', 'user_id': 'user_id',
+            'username': 'user__username', 'faculty': 'user__faculty', 'group_id': 'group_id',
+            'is_completed': 'is_completed', 'completed_at': 'completed_at', 'due_date': 'due_date',
+            'is_overdue': 'is_overdue', 'xp_reward': 'xp_reward', 'coin_reward': 'coin_reward',
+            'created_at': 'created_at',
+        },
+        date_field='created_at',
+        user_field='user_id',
+    ),
+    'transactions': Dataset(
+        CurrencyTransaction,
+        {
+            'id': 'id', 'user_id': 'user_id', 'username': 'user__username', 'currency': 'currency',
+            'delta': 'delta', 'balance': 'balance', 'reason': 'reason', 'created_at': 'created_at',
+        },
+        date_field='created_at',
+        user_field='user_id',
+        archive_model=ArchivedCurrencyTransaction,
+    ),
+    'users': Dataset(
+        User,
+        {
+            'id': 'id', 'username': 'username', 'role': 'role', 'faculty': 'faculty', 'group_name': 'group_name',
+            'level': 'level', 'xp': 'xp', 'coins': 'coins', 'streak': 'streak',
+            'last_activity_date': 'last_activity_date', 'is_active': 'is_active', 'date_joined': 'date_joined',
+        },
+        date_field='date_joined',
+        user_field='id',
+    ),
+    'activity': Dataset(
+        ActivityLog,
+        {
+            'id': 'id', 'user_id': 'user_id', 'username': 'user__username', 'verb': 'verb', 'data': 'data',
+            'created_at': 'created_at',
+        },
+        date_field='created_at',
+        user_field='user_id',
+    ),
+}
+
+
+def _parse_date(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise ExportError(f'{name}: ожидается дата YYYY-MM-DD')
+
+
+def build_queryset(name, date_from=None, date_to=None, faculty=None, course=None):
+    """
+    Строки набора для выгрузки (values_list в порядке id).
+
+    Для журнала XP и монет период, начинающийся раньше горизонта
+    детализации, дополняется архивированными записями (UNION ALL).
+
+    Args:
+        name: Имя набора из DATASETS
+        date_from, date_to: Границы периода включительно (строки YYYY-MM-DD)
+        faculty: Факультет пользователя
+        course: id курса, в группах которого состоит пользователь
+
+    Returns:
+        tuple: (список имён колонок, queryset)
+    """
+    dataset = DATASETS.get(name)
+    if dataset is None:
+        raise ExportError(f'Неизвестный набор: {name}. Доступны: {", ".join(DATASETS)}')
+
+    start = _parse_date(date_from, 'from')
+    end = _parse_date(date_to, 'to')
+    filters = {}
+    if start:
+        filters[f'{dataset.date_field}__gte'] = timezone.make_aware(datetime.combine(start, time.min))
+    if end:
+        filters[f'{dataset.date_field}__lt'] = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+    user_prefix = '' if dataset.user_field == 'id' else 'user__'
+    if faculty:
+        filters[f'{user_prefix}faculty'] = faculty
+    conditions = []
+    if course:
+        try:
+            course_id = int(course)
+        except (TypeError, ValueError):
+            raise ExportError('course: ожидается id курса')
+        # Exists вместо JOIN по участникам, чтобы пользователь из нескольких групп курса не дублировал строки
+        conditions.append(Exists(Group.members.through.objects.filter(
+            user_id=OuterRef(dataset.user_field), group__course_id=course_id
+        )))
+
+    def rows(model):
+        return model.objects.filter(*conditions, **filters).values_list(*dataset.columns.values())
+
+    queryset = rows(dataset.model)
+    if dataset.archive_model and (not start or filters[f'{dataset.date_field}__gte'] < month_start_datetime(detail_horizon())):
+        queryset = queryset.union(rows(dataset.archive_model), all=True)
+    return list(dataset.columns), queryset.order_by('id')
+
+
+def iter_rows(queryset):
+    return queryset.iterator(chunk_size=CHUNK_SIZE)
+
+
+class _Echo:
+    """Псевдо-файл для csv.writer: write возвращает строку вместо записи"""
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, cls=DjangoJSONEncoder)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(columns, rows):
+    """Строки CSV пачками по LINES_PER_WRITE (заголовок первым)"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    buffer = []
+    for row in rows:
+        buffer.append(writer.writerow([_csv_value(value) for value in row]))
+        if len(buffer) >= LINES_PER_WRITE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_ndjson(columns, rows):
+    """Строки NDJSON (один JSON-объект на строку) пачками по LINES_PER_WRITE"""
+    buffer = []
+    for row in rows:
+        buffer.append(json.dumps(dict(zip(columns, row)), ensure_ascii=False, cls=DjangoJSONEncoder) + '\n')
+        if len(buffer) >= LINES_PER_WRITE:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream(output_format, columns, rows):
+    if output_format == CSV:
+        return stream_csv(columns, rows)
+    if output_format == NDJSON:
+        return stream_ndjson(columns, rows)
+    raise ExportError(f'Формат {output_format} недоступен для потоковой выгрузки, доступны: {", ".join(STREAM_FORMATS)}')
+
+
+def _model_field(model, path):
+    """Поле модели по пути values_list (через связи '__'); для ForeignKey — поле ключа цели"""
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    field = model._meta.get_field(name)
+    return field.target_field if field.is_relation else field
+
+
+def parquet_schema(name):
+    """
+    Схема Parquet набора по типам полей модели.
+
+    Схема задаётся явно, а не выводится из первой группы строк: иначе
+    колонка, пустая (NULL) во всей первой группе, получает тип null,
+    и приведение следующих групп к нему падает.
+    """
+    import pyarrow as pa
+
+    types = {
+        'AutoField': pa.int64(), 'BigAutoField': pa.int64(), 'SmallAutoField': pa.int64(),
+        'IntegerField': pa.int64(), 'BigIntegerField': pa.int64(), 'SmallIntegerField': pa.int64(),
+        'PositiveIntegerField': pa.int64(), 'PositiveBigIntegerField': pa.int64(),
+        'PositiveSmallIntegerField': pa.int64(),
+        'BooleanField': pa.bool_(), 'FloatField': pa.float64(),
+        'DateField': pa.date32(), 'DateTimeField': pa.timestamp('us', tz='UTC'),
+    }
+    dataset = DATASETS[name]
+    fields = []
+    for column, path in dataset.columns.items():
+        field = _model_field(dataset.model, path)
+        internal_type = field.get_internal_type()
+        if internal_type == 'DecimalField':
+            arrow_type = pa.decimal128(field.max_digits, field.decimal_places)
+        else:
+            # Строки, тексты и JSON (сериализуется в строку, как в CSV)
+            arrow_type = types.get(internal_type, pa.string())
+        fields.append(pa.field(column, arrow_type))
+    return pa.schema(fields)
+
+
+def write_parquet(path, name, rows, row_group_size=50000):
+    """
+    Пишет набор name в Parquet группами строк по row_group_size (нужен pyarrow).
+
+    Returns:
+        int: Количество строк
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError('Для Parquet нужен пакет pyarrow')
+
+    schema = parquet_schema(name)
+    total = 0
+    batch = []
+
+    def flush(writer):
+        data = {
+            column: [_csv_value(row[index]) if isinstance(row[index], (dict, list)) else row[index] for row in batch]
+            for index, column in enumerate(schema.names)
+        }
+        writer.write_table(pa.table(data, schema=schema))
+
+    with pq.ParquetWriter(path, schema) as writer:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= row_group_size:
+                flush(writer)
+                total += len(batch)
+                batch = []
+        if batch or not total:
+            flush(writer)
+            total += len(batch)
+    return total
@@ -0,0 +1,95 @@
+"""
+Идемпотентность изменяющих игровых действий.
+
+Клиент передаёт заголовок Idempotency-Key; первый ответ на пару
+(пользователь, ключ) сохраняется на IDEMPOTENCY_KEY_TTL, и повторы с тем же
+ключом получают сохранённый ответ без повторного выполнения действия
+(с заголовком Idempotent-Replayed: true). Ответы 5xx не сохраняются, чтобы
+запрос можно было повторить. Просроченные ключи удаляет команда
+purge_idempotency_keys.
+"""
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAY_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+def _claim(user, key, fingerprint):
+    """
+    Создает запись ключа или возвращает существующую.
+
+    Returns:
+        tuple: (запись, True если ключ только что занят этим запросом)
+    """
+    while True:
+        now = timezone.now()
+        IdempotencyKey.objects.filter(user=user, key=key, expires_at__lte=now).delete()
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=user, key=key, fingerprint=fingerprint,
+                    expires_at=now + settings.IDEMPOTENCY_KEY_TTL,
+                )
+            return record, True
+        except IntegrityError:
+            record = IdempotencyKey.objects.filter(user=user, key=key).first()
+            if record is not None:
+                return record, False
+            # Конфликтующая запись успела откатиться или удалиться — занимаем ключ заново
+
+
+def idempotent(view_method):
+    """
+    Декоратор действия ViewSet, включающий поддержку Idempotency-Key.
+
+    Без заголовка действие выполняется как обычно.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response({'detail': f'{HEADER} не длиннее {MAX_KEY_LENGTH} символов'}, status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = f'{request.method} {request.path}'[:255]
+        record, claimed = _claim(request.user, key, fingerprint)
+        if not claimed:
+            if record.fingerprint != fingerprint:
+                return Response(
+                    {'detail': 'Ключ идемпотентности уже использован для другого запроса'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if record.status_code is None:
+                return Response({'detail': 'Запрос с этим ключом ещё выполняется'}, status=status.HTTP_409_CONFLICT)
+            response = Response(record.response_body, status=record.status_code)
+            response[REPLAY_HEADER] = 'true'
+            return response
+
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except APIException as exc:
+            response = self.handle_exception(exc)
+        except Exception:
+            record.delete()
+            raise
+
+        if response.status_code >= 500:
+            record.delete()
+        else:
+            IdempotencyKey.objects.filter(pk=record.pk).update(
+                status_code=response.status_code, response_body=response.data
+            )
+        return response
+
+    return wrapper
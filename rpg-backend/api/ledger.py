@@ -0,0 +1,311 @@
+"""
+Журнал XP и монет.
+
+Каждая запись CurrencyTransaction относится к одному счёту (user, currency)
+и хранит баланс счёта после себя. Запись делается через record():
+баланс LedgerAccount увеличивается условным UPDATE (строка счёта
+блокируется до конца транзакции), поэтому параллельные записи одного
+счёта получают последовательные балансы.
+
+Благодаря балансу в каждой записи:
+- баланс на момент T — последняя запись до T (индекс user, currency, created_at);
+- заработано за период — разность двух таких балансов.
+
+Команда ledger_checkpoint периодически сохраняет балансы в
+BalanceCheckpoint. Команда archive_ledger переносит записи старше
+LEDGER_DETAIL_MONTHS месяцев в ArchivedCurrencyTransaction, оставляя
+помесячные итоги LedgerMonth; история старых периодов читается из итогов,
+а баланс на момент внутри архивированного месяца — из архивированной записи.
+"""
+from datetime import date, datetime, time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, DateField, F, IntegerField, Max, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from .models import (
+    ArchivedCurrencyTransaction, BalanceCheckpoint, CurrencyTransaction, LedgerAccount, LedgerMonth,
+)
+
+XP = 'xp'
+COINS = 'coins'
+
+# Служебные записи — не начисления конкретного дня (миграция 0013 хранит свою копию)
+OPENING_REASON = 'Начальный баланс'
+CORRECTION_REASON = 'Сверка журнала'
+
+
+def _credit(user_id, currency, amount):
+    """Изменяет баланс счёта и возвращает новый баланс (вызывается внутри транзакции)"""
+    accounts = LedgerAccount.objects.filter(user_id=user_id, currency=currency)
+    if not accounts.update(balance=F('balance') + amount, updated_at=timezone.now()):
+        LedgerAccount.objects.get_or_create(user_id=user_id, currency=currency)
+        accounts.update(balance=F('balance') + amount, updated_at=timezone.now())
+    return accounts.values_list('balance', flat=True).get()
+
+
+def record(user, currency, delta, reason, meta=None):
+    """
+    Записывает операцию в журнал.
+
+    Args:
+        user: Пользователь
+        currency: XP или COINS
+        delta: Изменение (отрицательное — списание)
+        reason: Причина
+        meta: Дополнительные данные
+
+    Returns:
+        CurrencyTransaction
+    """
+    with transaction.atomic():
+        balance = _credit(user.pk, currency, delta)
+        return CurrencyTransaction.objects.create(
+            user=user, currency=currency, delta=delta, balance=balance, reason=reason, meta=meta or {}
+        )
+
+
+def record_many(user, currency, entries):
+    """
+    Записывает несколько операций одного счёта одним INSERT.
+
+    Args:
+        entries: список (delta, reason, meta) в порядке выполнения
+
+    Returns:
+        list[CurrencyTransaction]
+    """
+    if not entries:
+        return []
+    with transaction.atomic():
+        balance = _credit(user.pk, currency, sum(delta for delta, _, _ in entries))
+        balance -= sum(delta for delta, _, _ in entries)
+        rows = []
+        for delta, reason, meta in entries:
+            balance += delta
+            rows.append(CurrencyTransaction(
+                user=user, currency=currency, delta=delta, balance=balance, reason=reason, meta=meta or {}
+            ))
+        return CurrencyTransaction.objects.bulk_create(rows)
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def add_months(month, count):
+    years, index = divmod(month.month - 1 + count, 12)
+    return date(month.year + years, index + 1, 1)
+
+
+def month_start_datetime(month):
+    return timezone.make_aware(datetime.combine(month, time.min))
+
+
+def detail_horizon():
+    """Первый месяц, записи которого хранятся подробно (не меньше двух последних месяцев)"""
+    return add_months(month_start(timezone.localdate()), -max(2, settings.LEDGER_DETAIL_MONTHS))
+
+
+def balance_at(user_id, currency, at):
+    """
+    Баланс счёта на момент at: последняя запись журнала (подробная или
+    архивированная), итог архивированного месяца или снимок.
+
+    Итог предыдущего месяца — только запасной вариант: для момента внутри
+    архивированного месяца он не учёл бы движения с начала месяца до at.
+    """
+    for model in (CurrencyTransaction, ArchivedCurrencyTransaction):
+        row = model.objects.filter(
+            user_id=user_id, currency=currency, created_at__lte=at
+        ).order_by('-created_at', '-id').values_list('balance', flat=True).first()
+        if row is not None:
+            return row
+    closing = LedgerMonth.objects.filter(
+        user_id=user_id, currency=currency, month__lt=month_start(timezone.localdate(at))
+    ).order_by('-month').values_list('closing_balance', flat=True).first()
+    if closing is not None:
+        return closing
+    checkpoint = BalanceCheckpoint.objects.filter(
+        user_id=user_id, currency=currency, taken_at__lte=at
+    ).order_by('-taken_at').values_list('balance', flat=True).first()
+    return checkpoint or 0
+
+
+def earned_between(user_id, currency, start, end=None):
+    """Изменение баланса за период [start, end)"""
+    end = end or timezone.now()
+    return balance_at(user_id, currency, end) - balance_at(user_id, currency, start)
+
+
+def balance_before_expr(currency, at, user_ref='pk'):
+    """Подзапрос: баланс счёта пользователя (OuterRef(user_ref)) до момента at"""
+    last = CurrencyTransaction.objects.filter(
+        user_id=OuterRef(user_ref), currency=currency, created_at__lt=at
+    ).order_by('-created_at', '-id').values('balance')[:1]
+    archived = ArchivedCurrencyTransaction.objects.filter(
+        user_id=OuterRef(user_ref), currency=currency, created_at__lt=at
+    ).order_by('-created_at', '-id').values('balance')[:1]
+    closing = LedgerMonth.objects.filter(
+        user_id=OuterRef(user_ref), currency=currency, month__lt=month_start(timezone.localdate(at))
+    ).order_by('-month').values('closing_balance')[:1]
+    checkpoint = BalanceCheckpoint.objects.filter(
+        user_id=OuterRef(user_ref), currency=currency, taken_at__lt=at
+    ).order_by('-taken_at').values('balance')[:1]
+    return Coalesce(
+        Subquery(last, output_field=IntegerField()),
+        Subquery(archived, output_field=IntegerField()),
+        Subquery(closing, output_field=IntegerField()),
+        Subquery(checkpoint, output_field=IntegerField()),
+        Value(0),
+    )
+
+
+def earned_since_expr(currency, since, user_ref='pk'):
+    """Выражение для annotate: изменение баланса счёта с момента since до текущего"""
+    current = LedgerAccount.objects.filter(user_id=OuterRef(user_ref), currency=currency).values('balance')[:1]
+    return Coalesce(Subquery(current, output_field=IntegerField()), Value(0)) - balance_before_expr(currency, since, user_ref)
+
+
+def take_checkpoints(at=None, batch_size=1000):
+    """
+    Сохраняет снимки балансов счетов, изменившихся после предыдущего снимка.
+
+    Returns:
+        int: Количество сохранённых снимков
+    """
+    at = at or timezone.now()
+    last_taken = BalanceCheckpoint.objects.order_by('-taken_at').values_list('taken_at', flat=True).first()
+    accounts = LedgerAccount.objects.all()
+    if last_taken is not None:
+        accounts = accounts.filter(updated_at__gt=last_taken)
+    last = CurrencyTransaction.objects.filter(
+        user_id=OuterRef('user_id'), currency=OuterRef('currency'), created_at__lte=at
+    ).order_by('-created_at', '-id')
+    accounts = accounts.annotate(
+        last_balance=Subquery(last.values('balance')[:1]),
+        last_id=Subquery(last.values('id')[:1]),
+    ).filter(last_id__isnull=False).values_list('user_id', 'currency', 'last_balance', 'last_id')
+
+    saved = 0
+    batch = []
+    for user_id, currency, balance, last_id in accounts.iterator(chunk_size=batch_size):
+        batch.append(BalanceCheckpoint(
+            user_id=user_id, currency=currency, taken_at=at, balance=balance, last_transaction_id=last_id
+        ))
+        if len(batch) >= batch_size:
+            BalanceCheckpoint.objects.bulk_create(batch)
+            saved += len(batch)
+            batch = []
+    BalanceCheckpoint.objects.bulk_create(batch)
+    return saved + len(batch)
+
+
+def ledger_history(user_id, currency, months=12):
+    """
+    Помесячная история счёта за последние months месяцев.
+
+    Архивированные месяцы берутся из LedgerMonth, остальные считаются по
+    подробным записям. Архивируются месяцы целиком, поэтому итоги и
+    записи не пересекаются и просто складываются.
+
+    Returns:
+        list: [{'month', 'credit', 'debit', 'entries', 'closing_balance'}], новые месяцы первыми
+    """
+    first = add_months(month_start(timezone.localdate()), -(months - 1))
+    history = {}
+    rollups = LedgerMonth.objects.filter(user_id=user_id, currency=currency, month__gte=first).values(
+        'month', 'credit', 'debit', 'entries', 'closing_balance'
+    )
+    for row in rollups:
+        history[row['month']] = row
+
+    detail = CurrencyTransaction.objects.filter(
+        user_id=user_id, currency=currency, created_at__gte=month_start_datetime(first)
+    ).annotate(
+        month=TruncMonth('created_at', output_field=DateField())
+    ).values('month').annotate(
+        credit=Sum(Case(When(delta__gt=0, then=F('delta')), default=Value(0))),
+        debit=Sum(Case(When(delta__lt=0, then=-F('delta')), default=Value(0))),
+        entries=Count('id'),
+        last_id=Max('id'),
+    ).order_by('month')
+    detail = list(detail)
+    closing = dict(CurrencyTransaction.objects.filter(id__in=[row['last_id'] for row in detail]).values_list('id', 'balance'))
+    for row in detail:
+        month = history.setdefault(row['month'], {'month': row['month'], 'credit': 0, 'debit': 0, 'entries': 0})
+        month['credit'] += row['credit']
+        month['debit'] += row['debit']
+        month['entries'] += row['entries']
+        month['closing_balance'] = closing[row['last_id']]
+    return [history[month] for month in sorted(history, reverse=True)]
+
+
+def archive_ledger(horizon=None, batch_size=5000):
+    """
+    Переносит записи журнала старше horizon (первого дня месяца) в архив
+    и добавляет их к помесячным итогам.
+
+    Записи обрабатываются пачками по возрастанию (created_at, id); каждая
+    пачка — отдельная транзакция, поэтому прерванный запуск можно повторить.
+
+    Returns:
+        int: Количество перенесённых записей
+    """
+    horizon = horizon or detail_horizon()
+    old = CurrencyTransaction.objects.filter(created_at__lt=month_start_datetime(horizon)).order_by('created_at', 'id')
+    archived = 0
+    while True:
+        with transaction.atomic():
+            rows = list(old[:batch_size])
+            if not rows:
+                return archived
+            _archive_batch(rows)
+        archived += len(rows)
+
+
+def _archive_batch(rows):
+    totals = {}
+    for row in rows:
+        key = (row.user_id, row.currency, month_start(timezone.localdate(row.created_at)))
+        total = totals.setdefault(key, {'credit': 0, 'debit': 0, 'entries': 0})
+        if row.delta > 0:
+            total['credit'] += row.delta
+        else:
+            total['debit'] -= row.delta
+        total['entries'] += 1
+        total['closing_balance'] = row.balance  # Записи идут по времени — последняя задаёт баланс
+
+    existing = {
+        (rollup.user_id, rollup.currency, rollup.month): rollup
+        for rollup in LedgerMonth.objects.select_for_update().filter(
+            user_id__in={key[0] for key in totals}, month__in={key[2] for key in totals}
+        )
+    }
+    to_update, to_create = [], []
+    for key, total in totals.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            to_create.append(LedgerMonth(user_id=key[0], currency=key[1], month=key[2], **total))
+            continue
+        rollup.credit += total['credit']
+        rollup.debit += total['debit']
+        rollup.entries += total['entries']
+        rollup.closing_balance = total['closing_balance']
+        to_update.append(rollup)
+    LedgerMonth.objects.bulk_update(to_update, ['credit', 'debit', 'entries', 'closing_balance', 'updated_at'])
+    LedgerMonth.objects.bulk_create(to_create)
+
+    ArchivedCurrencyTransaction.objects.bulk_create(
+        [
+            ArchivedCurrencyTransaction(
+                id=row.id, user_id=row.user_id, currency=row.currency, delta=row.delta, balance=row.balance,
+                reason=row.reason, meta=row.meta, created_at=row.created_at,
+            )
+            for row in rows
+        ],
+        ignore_conflicts=True,
+    )
+    CurrencyTransaction.objects.filter(id__in=[row.id for row in rows]).delete()
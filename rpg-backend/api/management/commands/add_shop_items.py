@@ -1,598 +1,206 @@
 """
 Django management command для добавления предметов в магазин
-Использование: python manage.py add_shop_items
+Использование: python manage.py add_shop_items [--file PATH] [--dry-run] [--clear]
+
+Каталог хранится в api/data/shop_items.json: список записей
+{"item": {...поля Item...}, "store": {...поля StoreItem...}}, ключ — sku.
+Загрузка выполняется несколькими запросами на весь файл: предметы —
+bulk_create с обновлением по sku, записи магазина — bulk_update
+существующих и bulk_create новых.
 """
-from django.core.management.base import BaseCommand
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.catalog import bump_catalog_version_on_commit
 from api.models import Item, StoreItem
 
+DEFAULT_FILE = Path(__file__).resolve().parents[2] / 'data' / 'shop_items.json'
+ITEM_FIELDS = ['name', 'description', 'item_type', 'properties']
+STORE_FIELDS = ['price', 'stock', 'purchase_limit', 'is_active']
+
 
 class Command(BaseCommand):
-    help = 'Добавляет игровые предметы в магазин'
+    help = 'Добавляет игровые предметы в магазин из файла каталога'
 
     def add_arguments(self, parser):
+        parser.add_argument(
+            '--file',
+            type=str,
+            default=str(DEFAULT_FILE),
+            help='JSON-файл каталога (по умолчанию: api/data/shop_items.json)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что будет создано и изменено'
+        )
         parser.add_argument(
             '--clear',
             action='store_true',
             help='Очистить существующие предметы перед добавлением'
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк в одном запросе (по умолчанию: 1000)'
+        )
 
     def handle(self, *args, **options):
+        entries = self.load(options['file'])
+        dry_run = options['dry_run']
         clear = options['clear']
+        batch_size = max(1, options['batch_size'])
+
+        if clear:
+            existing_items, existing_store = {}, {}
+        else:
+            existing_items, existing_store = self.load_existing(entries)
+        created, updated, unchanged = self.diff(entries, existing_items, existing_store)
 
+        self.stdout.write(f'Файл каталога: {options["file"]} ({len(entries)} предметов)')
         if clear:
-            self.stdout.write(self.style.WARNING('Очистка существующих предметов...'))
-            StoreItem.objects.all().delete()
-            Item.objects.all().delete()
-            self.stdout.write(self.style.SUCCESS('Предметы очищены'))
+            self.stdout.write(self.style.WARNING(
+                f'Будут удалены все предметы: {Item.objects.count()}, записей магазина: {StoreItem.objects.count()}'
+            ))
+        for sku in created:
+            self.stdout.write(self.style.SUCCESS(f'   + {sku}'))
+        for sku, changes in updated.items():
+            self.stdout.write(self.style.WARNING(f'   ~ {sku}'))
+            for field, (old, new) in changes.items():
+                self.stdout.write(f'       {field}: {old!r} -> {new!r}')
+
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(
+                f'\nПробный запуск: будет создано {len(created)}, изменено {len(updated)}, без изменений {unchanged}'
+            ))
+            return
+
+        with transaction.atomic():
+            if clear:
+                self.stdout.write(self.style.WARNING('Очистка существующих предметов...'))
+                StoreItem.objects.all().delete()
+                Item.objects.all().delete()
+            self.upsert(entries, existing_store, batch_size)
+            bump_catalog_version_on_commit()
 
-        self.stdout.write(self.style.SUCCESS('Добавление предметов в магазин...'))
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Предметы добавлены в магазин!'))
+        self.stdout.write(f'   - Создано новых: {len(created)}')
+        self.stdout.write(f'   - Обновлено существующих: {len(updated)}')
+        self.stdout.write(f'   - Без изменений: {unchanged}')
+        self.stdout.write(f'   - Всего предметов в магазине: {StoreItem.objects.filter(is_active=True).count()}')
 
-        items_data = [
-            # Косметика
-            {
-                'item': {
-                    'sku': 'COSM-001',
-                    'name': 'Золотая корона',
-                    'description': 'Корона из чистого золота. Показывает ваш статус короля квестов! 👑',
-                    'item_type': 'cosmetic',
-                    'properties': {'rarity': 'legendary', 'slot': 'head'}
-                },
-                'store': {
-                    'price': 500,
-                    'stock': None,
-                    'purchase_limit': 1,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'COSM-002',
-                    'name': 'Плащ мудреца',
-                    'description': 'Магический плащ, который придает мудрости и интеллекта 🧙',
-                    'item_type': 'cosmetic',
-                    'properties': {'rarity': 'epic', 'slot': 'back'}
-                },
-                'store': {
-                    'price': 300,
-                    'stock': None,
-                    'purchase_limit': 1,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'COSM-003',
-                    'name': 'Меч победителя',
-                    'description': 'Легендарный меч, который светится при выполнении квестов ⚔️',
-                    'item_type': 'cosmetic',
-                    'properties': {'rarity': 'epic', 'slot': 'weapon'}
-                },
-                'store': {
-                    'price': 400,
-                    'stock': None,
-                    'purchase_limit': 1,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'COSM-004',
-                    'name': 'Ореол достижений',
-                    'description': 'Светящийся ореол над головой. Видно всем, что вы мастер! ✨',
-                    'item_type': 'cosmetic',
-                    'properties': {'rarity': 'rare', 'slot': 'head'}
-                },
-                'store': {
-                    'price': 200,
-                    'stock': None,
-                    'purchase_limit': 1,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'COSM-005',
-                    'name': 'Крылья ангела',
-                    'description': 'Прекрасные белые крылья. Летайте к новым высотам! 🕊️',
-                    'item_type': 'cosmetic',
-                    'properties': {'rarity': 'legendary', 'slot': 'back'}
-                },
-                'store': {
-                    'price': 600,
-                    'stock': None,
-                    'purchase_limit': 1,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'COSM-006',
-                    'name': 'Маска ниндзя',
-                    'description': 'Таинственная маска для скрытных операций 🥷',
-                    'item_type': 'cosmetic',
-                    'properties': {'rarity': 'rare', 'slot': 'face'}
-                },
-                'store': {
-                    'price': 150,
-                    'stock': None,
-                    'purchase_limit': 1,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'COSM-007',
-                    'name': 'Доспех чемпиона',
-                    'description': 'Блестящие латы легендарного воина. Показывает всем, что вы непобедимы! 🛡️',
-                    'item_type': 'cosmetic',
-                    'properties': {'rarity': 'legendary', 'slot': 'chest'}
-                },
-                'store': {
-                    'price': 550,
-                    'stock': None,
-                    'purchase_limit': 1,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'COSM-008',
-                    'name': 'Шлем дракона',
-                    'description': 'Грозный шлем с рогами дракона. Внушает страх врагам! 🐉',
-                    'item_type': 'cosmetic',
-                    'properties': {'rarity': 'epic', 'slot': 'head'}
-                },
-                'store': {
-                    'price': 350,
-                    'stock': None,
-                    'purchase_limit': 1,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'COSM-009',
-                    'name': 'Кольцо власти',
-                    'description': 'Магическое кольцо, излучающее ауру лидерства 💍',
-                    'item_type': 'cosmetic',
-                    'properties': {'rarity': 'epic', 'slot': 'ring'}
-                },
-                'store': {
-                    'price': 280,
-                    'stock': None,
-                    'purchase_limit': 1,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'COSM-010',
-                    'name': 'Плащ вампира',
-                    'description': 'Темный плащ, развевающийся на ветру. Для истинных ночных охотников! 🦇',
-                    'item_type': 'cosmetic',
-                    'properties': {'rarity': 'epic', 'slot': 'back'}
-                },
-                'store': {
-                    'price': 320,
-                    'stock': None,
-                    'purchase_limit': 1,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'COSM-011',
-                    'name': 'Посох мага',
-                    'description': 'Древний посох, украшенный кристаллами силы. Увеличивает магию! 🔮',
-                    'item_type': 'cosmetic',
-                    'properties': {'rarity': 'epic', 'slot': 'weapon'}
-                },
-                'store': {
-                    'price': 380,
-                    'stock': None,
-                    'purchase_limit': 1,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'COSM-012',
-                    'name': 'Ореол святости',
-                    'description': 'Божественный ореол, озаряющий путь к знаниям ✨',
-                    'item_type': 'cosmetic',
-                    'properties': {'rarity': 'legendary', 'slot': 'head'}
-                },
-                'store': {
-                    'price': 650,
-                    'stock': None,
-                    'purchase_limit': 1,
-                    'is_active': True
-                }
-            },
-            # Расходники
-            {
-                'item': {
-                    'sku': 'CONS-001',
-                    'name': 'Зелье опыта',
-                    'description': 'Дает +50 XP при использовании. Быстрый способ повысить уровень! ⭐',
-                    'item_type': 'consumable',
-                    'properties': {'xp_bonus': 50}
-                },
-                'store': {
-                    'price': 100,
-                    'stock': 50,
-                    'purchase_limit': 10,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'CONS-002',
-                    'name': 'Большое зелье опыта',
-                    'description': 'Дает +150 XP при использовании. Мощный буст! 💪',
-                    'item_type': 'consumable',
-                    'properties': {'xp_bonus': 150}
-                },
-                'store': {
-                    'price': 250,
-                    'stock': 30,
-                    'purchase_limit': 5,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'CONS-003',
-                    'name': 'Мешок с монетами',
-                    'description': 'Содержит 50 монет. Быстрый заработок! 💰',
-                    'item_type': 'consumable',
-                    'properties': {'coins_bonus': 50}
-                },
-                'store': {
-                    'price': 40,
-                    'stock': 100,
-                    'purchase_limit': 20,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'CONS-004',
-                    'name': 'Сундук с сокровищами',
-                    'description': 'Содержит 200 монет и случайный предмет! 🎁',
-                    'item_type': 'consumable',
-                    'properties': {'coins_bonus': 200, 'random_item': True}
-                },
-                'store': {
-                    'price': 150,
-                    'stock': 20,
-                    'purchase_limit': 3,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'CONS-005',
-                    'name': 'Энергетический напиток',
-                    'description': 'Восстанавливает энергию. +1 к streak! 🔋',
-                    'item_type': 'consumable',
-                    'properties': {'streak_bonus': 1}
-                },
-                'store': {
-                    'price': 80,
-                    'stock': 40,
-                    'purchase_limit': 10,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'CONS-006',
-                    'name': 'Эликсир мудрости',
-                    'description': 'Дает +100 XP и +50 монет. Зелье великих мудрецов! 📖',
-                    'item_type': 'consumable',
-                    'properties': {'xp_bonus': 100, 'coins_bonus': 50}
-                },
-                'store': {
-                    'price': 180,
-                    'stock': 25,
-                    'purchase_limit': 5,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'CONS-007',
-                    'name': 'Зелье удачи',
-                    'description': 'Увеличивает шанс получить бонусы в следующих квестах! 🍀',
-                    'item_type': 'consumable',
-                    'properties': {'luck_bonus': True}
-                },
-                'store': {
-                    'price': 120,
-                    'stock': 30,
-                    'purchase_limit': 8,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'CONS-008',
-                    'name': 'Кристалл силы',
-                    'description': 'Дает +250 XP единовременно. Мощный источник энергии! 💎',
-                    'item_type': 'consumable',
-                    'properties': {'xp_bonus': 250}
-                },
-                'store': {
-                    'price': 400,
-                    'stock': 15,
-                    'purchase_limit': 3,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'CONS-009',
-                    'name': 'Кошелек фортуны',
-                    'description': 'Содержит от 100 до 300 монет. Удача определяет сумму! 🎰',
-                    'item_type': 'consumable',
-                    'properties': {'coins_bonus_random': {'min': 100, 'max': 300}}
-                },
-                'store': {
-                    'price': 200,
-                    'stock': 20,
-                    'purchase_limit': 5,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'CONS-010',
-                    'name': 'Свиток возрождения',
-                    'description': 'Восстанавливает весь streak! Для тех, кто пропустил день 🌱',
-                    'item_type': 'consumable',
-                    'properties': {'streak_restore': True}
-                },
-                'store': {
-                    'price': 300,
-                    'stock': 10,
-                    'purchase_limit': 2,
-                    'is_active': True
-                }
-            },
-            # Бусты
-            {
-                'item': {
-                    'sku': 'BOOST-001',
-                    'name': 'Буст XP (1 день)',
-                    'description': 'Удваивает получаемый XP на 24 часа! 🚀',
-                    'item_type': 'boost',
-                    'properties': {'xp_multiplier': 2, 'duration_hours': 24}
-                },
-                'store': {
-                    'price': 200,
-                    'stock': None,
-                    'purchase_limit': 3,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'BOOST-002',
-                    'name': 'Буст монет (1 день)',
-                    'description': 'Удваивает получаемые монеты на 24 часа! 💎',
-                    'item_type': 'boost',
-                    'properties': {'coins_multiplier': 2, 'duration_hours': 24}
-                },
-                'store': {
-                    'price': 180,
-                    'stock': None,
-                    'purchase_limit': 3,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'BOOST-003',
-                    'name': 'Буст удачи (3 дня)',
-                    'description': 'Увеличивает шанс получить бонусы на 3 дня! 🍀',
-                    'item_type': 'boost',
-                    'properties': {'luck_multiplier': 1.5, 'duration_hours': 72}
-                },
-                'store': {
-                    'price': 350,
-                    'stock': None,
-                    'purchase_limit': 2,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'BOOST-004',
-                    'name': 'Буст скорости (1 день)',
-                    'description': 'Ускоряет выполнение квестов. Меньше времени на задания! ⚡',
-                    'item_type': 'boost',
-                    'properties': {'speed_multiplier': 1.3, 'duration_hours': 24}
-                },
-                'store': {
-                    'price': 220,
-                    'stock': None,
-                    'purchase_limit': 3,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'BOOST-005',
-                    'name': 'Мега-буст (7 дней)',
-                    'description': 'Все бонусы сразу на целую неделю! Легендарный предмет! 🌟',
-                    'item_type': 'boost',
-                    'properties': {
-                        'xp_multiplier': 1.5,
-                        'coins_multiplier': 1.5,
-                        'luck_multiplier': 1.2,
-                        'duration_hours': 168
-                    }
-                },
-                'store': {
-                    'price': 800,
-                    'stock': 10,
-                    'purchase_limit': 1,
-                    'is_active': True
-                }
-            },
-            # Другое
-            {
-                'item': {
-                    'sku': 'OTHER-001',
-                    'name': 'Свиток телепортации',
-                    'description': 'Позволяет мгновенно переместиться к любому квесту! 📜',
-                    'item_type': 'other',
-                    'properties': {'teleport': True}
-                },
-                'store': {
-                    'price': 120,
-                    'stock': 25,
-                    'purchase_limit': 5,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'OTHER-002',
-                    'name': 'Книга знаний',
-                    'description': 'Открывает секретные техники выполнения квестов 📚',
-                    'item_type': 'other',
-                    'properties': {'knowledge_boost': True}
-                },
-                'store': {
-                    'price': 300,
-                    'stock': 15,
-                    'purchase_limit': 2,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'OTHER-003',
-                    'name': 'Амулет защиты',
-                    'description': 'Защищает от потери streak при пропуске дня 🛡️',
-                    'item_type': 'other',
-                    'properties': {'streak_protection': True}
-                },
-                'store': {
-                    'price': 400,
-                    'stock': 10,
-                    'purchase_limit': 1,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'OTHER-004',
-                    'name': 'Компас искателя',
-                    'description': 'Помогает находить скрытые квесты и редкие награды! 🧭',
-                    'item_type': 'other',
-                    'properties': {'quest_finder': True}
-                },
-                'store': {
-                    'price': 250,
-                    'stock': 20,
-                    'purchase_limit': 2,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'OTHER-005',
-                    'name': 'Кристалл времени',
-                    'description': 'Замедляет время выполнения квестов. Больше времени на задания! ⏳',
-                    'item_type': 'other',
-                    'properties': {'time_extension': True}
-                },
-                'store': {
-                    'price': 450,
-                    'stock': 12,
-                    'purchase_limit': 1,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'OTHER-006',
-                    'name': 'Талисман удачи',
-                    'description': 'Постоянно увеличивает шанс получения бонусных наград! 🎯',
-                    'item_type': 'other',
-                    'properties': {'permanent_luck': True}
-                },
-                'store': {
-                    'price': 600,
-                    'stock': 8,
-                    'purchase_limit': 1,
-                    'is_active': True
-                }
-            },
-            {
-                'item': {
-                    'sku': 'OTHER-007',
-                    'name': 'Свиток дружбы',
-                    'description': 'Удваивает награды за групповые квесты на 7 дней! 🤝',
-                    'item_type': 'other',
-                    'properties': {'group_boost': 2, 'duration_days': 7}
-                },
-                'store': {
-                    'price': 500,
-                    'stock': 15,
-                    'purchase_limit': 1,
-                    'is_active': True
-                }
-            },
-        ]
+    def load(self, path):
+        """Читает и проверяет файл каталога"""
+        try:
+            with open(path, encoding='utf-8') as f:
+                entries = json.load(f)
+        except OSError as exc:
+            raise CommandError(f'Не удалось прочитать файл каталога: {exc}')
+        except json.JSONDecodeError as exc:
+            raise CommandError(f'Неверный JSON в файле каталога: {exc}')
+        if not isinstance(entries, list):
+            raise CommandError('Файл каталога должен содержать список предметов')
 
-        created_count = 0
-        updated_count = 0
+        seen = set()
+        for number, entry in enumerate(entries, 1):
+            item = entry.get('item') if isinstance(entry, dict) else None
+            if not isinstance(item, dict) or not item.get('sku') or not item.get('name'):
+                raise CommandError(f'Запись {number}: нужны item.sku и item.name')
+            if item['sku'] in seen:
+                raise CommandError(f'Запись {number}: повторяющийся sku {item["sku"]}')
+            seen.add(item['sku'])
+            if not isinstance(entry.get('store'), dict) or 'price' not in entry['store']:
+                raise CommandError(f'Запись {number} ({item["sku"]}): нужна store.price')
+        return entries
 
-        for item_data in items_data:
-            item_info = item_data['item']
-            store_info = item_data['store']
+    @staticmethod
+    def item_values(entry):
+        item = entry['item']
+        return {
+            'name': item['name'],
+            'description': item.get('description', ''),
+            'item_type': item.get('item_type', 'cosmetic'),
+            'properties': item.get('properties', {}),
+        }
 
-            # Создаем или получаем предмет
-            item, item_created = Item.objects.get_or_create(
-                sku=item_info['sku'],
-                defaults={
-                    'name': item_info['name'],
-                    'description': item_info['description'],
-                    'item_type': item_info['item_type'],
-                    'properties': item_info.get('properties', {})
-                }
-            )
+    @staticmethod
+    def store_values(entry):
+        store = entry['store']
+        return {
+            'price': store['price'],
+            'stock': store.get('stock'),
+            'purchase_limit': store.get('purchase_limit'),
+            'is_active': store.get('is_active', True),
+        }
 
-            # Обновляем предмет, если он уже существует
-            if not item_created:
-                item.name = item_info['name']
-                item.description = item_info['description']
-                item.item_type = item_info['item_type']
-                item.properties = item_info.get('properties', {})
-                item.save()
+    @staticmethod
+    def load_existing(entries):
+        """
+        Текущие предметы и записи магазина для sku из файла (два запроса).
 
-            # Создаем или обновляем запись в магазине
-            store_item, store_created = StoreItem.objects.get_or_create(
-                item=item,
-                defaults=store_info
-            )
+        Returns:
+            tuple: ({sku: Item}, {item_id: StoreItem}) — для предмета берётся
+                первая запись магазина, как раньше делал get_or_create
+        """
+        skus = [entry['item']['sku'] for entry in entries]
+        items = {item.sku: item for item in Item.objects.filter(sku__in=skus)}
+        store = {}
+        for store_item in StoreItem.objects.filter(item_id__in=[item.id for item in items.values()]).order_by('id'):
+            store.setdefault(store_item.item_id, store_item)
+        return items, store
 
-            if not store_created:
-                store_item.price = store_info['price']
-                store_item.stock = store_info['stock']
-                store_item.purchase_limit = store_info['purchase_limit']
-                store_item.is_active = store_info['is_active']
-                store_item.save()
-                updated_count += 1
+    def diff(self, entries, existing_items, existing_store):
+        """
+        Returns:
+            tuple: (новые sku, {sku: {поле: (было, станет)}}, количество без изменений)
+        """
+        created, updated, unchanged = [], {}, 0
+        for entry in entries:
+            sku = entry['item']['sku']
+            item = existing_items.get(sku)
+            if item is None:
+                created.append(sku)
+                continue
+            changes = {
+                field: (getattr(item, field), value)
+                for field, value in self.item_values(entry).items() if getattr(item, field) != value
+            }
+            store_item = existing_store.get(item.id)
+            for field, value in self.store_values(entry).items():
+                old = getattr(store_item, field) if store_item else None
+                if store_item is None or old != value:
+                    changes[f'store.{field}'] = (old, value)
+            if changes:
+                updated[sku] = changes
             else:
-                created_count += 1
+                unchanged += 1
+        return created, updated, unchanged
 
-        self.stdout.write(self.style.SUCCESS(f'\n✅ Предметы добавлены в магазин!'))
-        self.stdout.write(f'   - Создано новых: {created_count}')
-        self.stdout.write(f'   - Обновлено существующих: {updated_count}')
-        self.stdout.write(f'   - Всего предметов в магазине: {StoreItem.objects.filter(is_active=True).count()}')
+    def upsert(self, entries, existing_store, batch_size):
+        Item.objects.bulk_create(
+            [Item(sku=entry['item']['sku'], **self.item_values(entry)) for entry in entries],
+            update_conflicts=True,
+            unique_fields=['sku'],
+            update_fields=ITEM_FIELDS,
+            batch_size=batch_size,
+        )
+        # bulk_create с update_conflicts не возвращает id — читаем их одним запросом
+        item_ids = dict(Item.objects.filter(sku__in=[entry['item']['sku'] for entry in entries]).values_list('sku', 'id'))
 
+        to_update, to_create = [], []
+        for entry in entries:
+            item_id = item_ids[entry['item']['sku']]
+            values = self.store_values(entry)
+            store_item = existing_store.get(item_id)
+            if store_item is None:
+                to_create.append(StoreItem(item_id=item_id, **values))
+            elif any(getattr(store_item, field) != value for field, value in values.items()):
+                for field, value in values.items():
+                    setattr(store_item, field, value)
+                to_update.append(store_item)
+        StoreItem.objects.bulk_update(to_update, STORE_FIELDS, batch_size=batch_size)
+        StoreItem.objects.bulk_create(to_create, batch_size=batch_size)
@@ -0,0 +1,39 @@
+"""
+Django management command для архивации журнала XP и монет
+Использование: python manage.py archive_ledger [--months N] [--batch-size N]
+
+Рассчитан на запуск раз в месяц (например, cron: 0 3 1 * *). Записи старше
+N месяцев (по умолчанию LEDGER_DETAIL_MONTHS) переносятся в
+ArchivedCurrencyTransaction и добавляются к помесячным итогам LedgerMonth.
+Архивируются месяцы целиком; прерванный запуск можно повторить.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.ledger import add_months, archive_ledger, month_start
+
+
+class Command(BaseCommand):
+    help = 'Переносит старые записи журнала XP и монет в архив, сохраняя помесячные итоги'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=settings.LEDGER_DETAIL_MONTHS,
+            help='Сколько последних месяцев хранить подробно (не меньше 2, по умолчанию: LEDGER_DETAIL_MONTHS)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Количество записей в одной транзакции (по умолчанию: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        horizon = add_months(month_start(timezone.localdate()), -max(2, options['months']))
+        archived = archive_ledger(horizon, batch_size=max(1, options['batch_size']))
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Журнал архивирован до {horizon}!'))
+        self.stdout.write(f'   - Перенесено записей: {archived}')
@@ -0,0 +1,31 @@
+"""
+Django management command для пересчёта рекомендаций квестов
+Использование: python manage.py compute_recommendations [--top N]
+
+Рассчитан на периодический запуск (например, раз в ночь из cron).
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.recommendations import compute_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает персональные рекомендации публичных квестов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Количество рекомендаций на пользователя (по умолчанию: 10)'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        users_count = compute_recommendations(top_n=max(1, options['top']))
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS('\n✅ Рекомендации пересчитаны!'))
+        self.stdout.write(f'   - Пользователей: {users_count}')
+        self.stdout.write(f'   - Время: {elapsed:.2f} с')
@@ -0,0 +1,31 @@
+"""
+Django management command для снятия истёкших бустов
+Использование: python manage.py expire_effects [--batch-size N]
+
+Рассчитан на запуск по расписанию (например, cron раз в 10 минут).
+Удаляет истёкшие ActiveEffect (владельцы получают уведомление) и предметы
+инвентаря с истёкшим expires_at. На начисление наград истёкшие эффекты
+не влияют и до запуска команды.
+"""
+from django.core.management.base import BaseCommand
+
+from api.effects import expire_effects
+
+
+class Command(BaseCommand):
+    help = 'Снимает истёкшие бусты и удаляет просроченные предметы инвентаря'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер пачки для DELETE (по умолчанию: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        effects, items = expire_effects(batch_size=max(1, options['batch_size']))
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Истёкшие эффекты сняты!'))
+        self.stdout.write(f'   - Снято эффектов: {effects}')
+        self.stdout.write(f'   - Удалено предметов инвентаря: {items}')
@@ -0,0 +1,72 @@
+"""
+Django management command для выгрузки данных в файл
+Использование: python manage.py export_data {assignments,transactions,users,activity}
+               [--format csv|ndjson|parquet] [--output PATH] [--from YYYY-MM-DD] [--to YYYY-MM-DD]
+               [--faculty NAME] [--course ID]
+
+Строки читаются потоком (серверный курсор в PostgreSQL), память не зависит
+от объёма выгрузки. Без --output CSV/NDJSON пишутся в stdout.
+Parquet требует pyarrow и обязательного --output.
+"""
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.exports import CSV, DATASETS, NDJSON, PARQUET, ExportError, build_queryset, iter_rows, stream, write_parquet
+
+
+class Command(BaseCommand):
+    help = 'Выгружает назначения, журнал, пользователей или активность в CSV, NDJSON или Parquet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(DATASETS), help='Набор данных')
+        parser.add_argument(
+            '--format',
+            choices=[CSV, NDJSON, PARQUET],
+            default=CSV,
+            help='Формат файла (по умолчанию: csv)'
+        )
+        parser.add_argument('--output', type=str, default=None, help='Путь к файлу (по умолчанию: stdout)')
+        parser.add_argument('--from', dest='date_from', type=str, default=None, help='Начало периода YYYY-MM-DD')
+        parser.add_argument('--to', dest='date_to', type=str, default=None, help='Конец периода YYYY-MM-DD (включительно)')
+        parser.add_argument('--faculty', type=str, default=None, help='Факультет пользователя')
+        parser.add_argument('--course', type=int, default=None, help='id курса')
+
+    def handle(self, *args, **options):
+        try:
+            columns, queryset = build_queryset(
+                options['dataset'],
+                date_from=options['date_from'],
+                date_to=options['date_to'],
+                faculty=options['faculty'],
+                course=options['course'],
+            )
+            rows = iter_rows(queryset)
+            if options['format'] == PARQUET:
+                if not options['output']:
+                    raise CommandError('Для Parquet укажите --output')
+                total = write_parquet(options['output'], options['dataset'], rows)
+            else:
+                self.write_text(options['output'], stream(options['format'], columns, self.count(rows)))
+                total = self.rows_written
+        except ExportError as exc:
+            raise CommandError(exc.detail)
+
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f'\n✅ Выгружено строк: {total} -> {options["output"]}'))
+
+    def count(self, rows):
+        self.rows_written = 0
+        for row in rows:
+            self.rows_written += 1
+            yield row
+
+    @staticmethod
+    def write_text(path, chunks):
+        out = open(path, 'w', encoding='utf-8', newline='') if path else sys.stdout
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        finally:
+            if path:
+                out.close()
@@ -0,0 +1,57 @@
+"""
+Django management command для управления распродажами
+Использование:
+    python manage.py flash_sale start --item STORE_ITEM_ID
+    python manage.py flash_sale process --item STORE_ITEM_ID [--interval SECONDS]
+    python manage.py flash_sale stop --item STORE_ITEM_ID
+
+process — обработчик очереди заявок; с --interval работает, пока распродажа активна.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import StoreItem
+from api.shop import PurchaseError, process_flash_queue, start_flash_sale, stop_flash_sale
+
+
+class Command(BaseCommand):
+    help = 'Запускает, обслуживает и завершает распродажу товара магазина'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['start', 'process', 'stop'])
+        parser.add_argument('--item', type=int, required=True, help='ID товара магазина (StoreItem)')
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Для process: обрабатывать очередь каждые N секунд, пока идёт распродажа'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            store_item = StoreItem.objects.select_related('item').get(pk=options['item'])
+        except StoreItem.DoesNotExist:
+            raise CommandError('Товар магазина не найден')
+
+        if options['action'] == 'start':
+            try:
+                start_flash_sale(store_item)
+            except PurchaseError as exc:
+                raise CommandError(str(exc.detail))
+            self.stdout.write(self.style.SUCCESS(f'✅ Распродажа {store_item.item.name} начата, единиц: {store_item.stock}'))
+        elif options['action'] == 'stop':
+            remaining = stop_flash_sale(store_item)
+            self.stdout.write(self.style.SUCCESS(f'✅ Распродажа завершена, на склад возвращено: {remaining}'))
+        else:
+            self.process(store_item, options['interval'])
+
+    def process(self, store_item, interval):
+        while True:
+            processed = process_flash_queue(store_item)
+            if processed:
+                self.stdout.write(', '.join(f'{status}: {count}' for status, count in processed.items()))
+            store_item.refresh_from_db(fields=['is_flash_sale'])
+            if not interval or not store_item.is_flash_sale:
+                break
+            time.sleep(interval)
@@ -0,0 +1,102 @@
+"""
+Django management command для выдачи ежедневных квестов
+Использование: python manage.py issue_daily_quests [--date YYYY-MM-DD] [--chunk-size N]
+
+Запускается раз в сутки (например, cron: 5 0 * * *). Повторный запуск за тот же
+день безопасен: дубликаты отсекаются уникальным ключом (quest, user, due_date).
+"""
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from django.utils import timezone
+
+from api.models import Quest, QuestAssignment, User
+
+
+class Command(BaseCommand):
+    help = 'Создает назначения ежедневных квестов на день для всех студентов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            type=str,
+            default=None,
+            help='День выдачи в формате YYYY-MM-DD (по умолчанию: сегодня в TIME_ZONE)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Количество назначений в одном INSERT (по умолчанию: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        if options['date']:
+            try:
+                day = date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('Неверный формат даты, ожидается YYYY-MM-DD')
+        else:
+            day = timezone.localdate()
+        chunk_size = max(1, options['chunk_size'])
+
+        started = time.monotonic()
+        quests = list(self.get_daily_quests(day))
+        if not quests:
+            self.stdout.write(self.style.WARNING(f'Нет активных ежедневных квестов на {day}'))
+            return
+
+        public_quests = [quest for quest in quests if quest.is_public]
+        personal_quests = [quest for quest in quests if not quest.is_public and quest.created_by_id]
+        quest_ids = [quest.id for quest in quests]
+        existing = QuestAssignment.objects.filter(quest_id__in=quest_ids, due_date=day).count()
+
+        attempted = 0
+        batch = []
+        # Публичные ежедневные квесты получают все активные студенты
+        students = User.objects.filter(role='student', is_active=True).values_list('id', flat=True)
+        for user_id in students.iterator(chunk_size=chunk_size):
+            for quest in public_quests:
+                batch.append(self.make_assignment(quest, user_id, day))
+            if len(batch) >= chunk_size:
+                attempted += self.flush(batch)
+                batch = []
+        # Личные ежедневные квесты — только их авторам
+        for quest in personal_quests:
+            batch.append(self.make_assignment(quest, quest.created_by_id, day))
+        attempted += self.flush(batch)
+
+        created = QuestAssignment.objects.filter(quest_id__in=quest_ids, due_date=day).count() - existing
+        elapsed = time.monotonic() - started
+        rate = attempted / elapsed if elapsed else attempted
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Ежедневные квесты на {day} выданы!'))
+        self.stdout.write(f'   - Ежедневных квестов: {len(quests)}')
+        self.stdout.write(f'   - Создано назначений: {created}')
+        self.stdout.write(f'   - Уже существовало: {attempted - created}')
+        self.stdout.write(f'   - Время: {elapsed:.2f} с ({rate:.0f} назначений/с)')
+
+    def get_daily_quests(self, day):
+        """Ежедневные квесты, активные в указанный день"""
+        return Quest.objects.filter(is_daily=True).filter(
+            Q(active_from__isnull=True) | Q(active_from__date__lte=day),
+            Q(active_to__isnull=True) | Q(active_to__date__gte=day),
+        ).only('id', 'is_public', 'created_by_id', 'xp_reward', 'coin_reward')
+
+    @staticmethod
+    def make_assignment(quest, user_id, day):
+        return QuestAssignment(
+            quest_id=quest.id,
+            user_id=user_id,
+            due_date=day,
+            xp_reward=quest.xp_reward,
+            coin_reward=quest.coin_reward,
+        )
+
+    @staticmethod
+    def flush(batch):
+        if batch:
+            QuestAssignment.objects.bulk_create(batch, ignore_conflicts=True)
+        return len(batch)
@@ -0,0 +1,26 @@
+"""
+Django management command для снимков балансов журнала XP и монет
+Использование: python manage.py ledger_checkpoint [--batch-size N]
+
+Рассчитан на запуск раз в сутки (например, cron: 30 0 * * *). Снимок
+сохраняется только для счетов, изменившихся после предыдущего запуска.
+"""
+from django.core.management.base import BaseCommand
+
+from api.ledger import take_checkpoints
+
+
+class Command(BaseCommand):
+    help = 'Сохраняет снимки балансов счетов журнала XP и монет'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер пачки для INSERT (по умолчанию: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        saved = take_checkpoints(batch_size=max(1, options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Сохранено снимков балансов: {saved}'))
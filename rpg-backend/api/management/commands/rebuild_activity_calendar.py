@@ -0,0 +1,52 @@
+"""
+Django management command для пересборки календарей активности
+Использование: python manage.py rebuild_activity_calendar [--chunk-size N]
+
+Календари (ActivityYear) пересчитываются из выполненных квестов
+(QuestAssignment.completed_at) и начислений XP журнала, включая
+архивированные записи, кроме вводных и корректирующих записей журнала.
+Пользователи обрабатываются пачками по id; каждая пачка — отдельная
+транзакция, которая читает исходные строки и заменяет календари пачки.
+Нужна после первого развёртывания и при расхождениях.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.activity_calendar import rebuild_calendar
+from api.models import User
+from api.utils import get_time_zone
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает календари активности пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Количество пользователей в одной пачке (по умолчанию: 500)'
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        default_tz = timezone.get_default_timezone()
+
+        users = rows = 0
+        last_id = 0
+        while True:
+            chunk = list(
+                User.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'time_zone')[:chunk_size]
+            )
+            if not chunk:
+                break
+            last_id = chunk[-1][0]
+            tz_by_user = {
+                user_id: get_time_zone(name or settings.TIME_ZONE) or default_tz for user_id, name in chunk
+            }
+            rows += rebuild_calendar(tz_by_user)
+            users += len(chunk)
+            self.stdout.write(f'   - пользователи до id {last_id}: {users}')
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Календари пересобраны: пользователей {users}, строк {rows}'))
@@ -0,0 +1,20 @@
+"""
+Django management command для пересчёта статистики групп и курсов
+Использование: python manage.py rebuild_group_stats
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.aggregates import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает GroupStats и CourseStats из исходных таблиц'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Пересчёт статистики групп и курсов...'))
+        with transaction.atomic():
+            groups_count, courses_count = rebuild_stats()
+        self.stdout.write(self.style.SUCCESS('\n✅ Статистика пересчитана!'))
+        self.stdout.write(f'   - Групп: {groups_count}')
+        self.stdout.write(f'   - Курсов: {courses_count}')
@@ -0,0 +1,19 @@
+"""
+Django management command для перестроения поискового индекса квестов
+Использование: python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand
+
+from api.models import Quest
+from api.search import is_postgres, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс квестов (FTS5 при работе на SQLite)'
+
+    def handle(self, *args, **options):
+        if is_postgres():
+            self.stdout.write('PostgreSQL: search_vector поддерживается базой автоматически, перестроение не требуется')
+            return
+        rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'✅ Индекс перестроен, квестов: {Quest.objects.count()}'))
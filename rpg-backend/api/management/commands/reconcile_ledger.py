@@ -0,0 +1,190 @@
+"""
+Django management command для сверки User.level/xp/coins с журналом XP и монет
+Использование: python manage.py reconcile_ledger [--repair users|ledger] [--chunk-size N] [--show N]
+
+Пользователи читаются диапазонами id (iterator), суммы журнала — агрегатом
+по тому же диапазону (подробные записи + помесячные итоги архива), поэтому
+память не зависит от числа пользователей. Для каждого пользователя
+ожидаемые level/xp восстанавливаются по кривой уровней из суммы XP,
+ожидаемые монеты — сумма журнала монет. Также сверяются балансы LedgerAccount.
+
+--repair users   — исправить User и LedgerAccount по журналу (bulk_update);
+--repair ledger  — дописать в журнал корректирующие записи, чтобы он
+                   совпал с User (для данных, созданных мимо журнала,
+                   например generate_mock_data).
+
+Исправление лучше запускать при низкой нагрузке: изменения пользователя
+между чтением и записью пачки будут перезаписаны.
+"""
+from collections import Counter
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min, Sum
+from django.utils import timezone
+
+from api.ledger import COINS, CORRECTION_REASON, XP
+from api.models import CurrencyTransaction, LedgerAccount, LedgerMonth, User
+from api.utils import calculate_total_xp, level_from_total_xp
+
+
+class Command(BaseCommand):
+    help = 'Сверяет уровень, XP и монеты пользователей с журналом и при необходимости исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repair',
+            choices=['users', 'ledger'],
+            default=None,
+            help='Исправить расхождения: users — по журналу, ledger — корректирующими записями'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Размер диапазона id пользователей (по умолчанию: 5000)'
+        )
+        parser.add_argument(
+            '--show',
+            type=int,
+            default=20,
+            help='Сколько расхождений вывести подробно (по умолчанию: 20)'
+        )
+
+    def handle(self, *args, **options):
+        repair = options['repair']
+        chunk_size = max(1, options['chunk_size'])
+        show = max(0, options['show'])
+
+        bounds = User.objects.aggregate(lo=Min('id'), hi=Max('id'))
+        if bounds['lo'] is None:
+            self.stdout.write(self.style.WARNING('Пользователей нет'))
+            return
+
+        stats = Counter()
+        for lo in range(bounds['lo'], bounds['hi'] + 1, chunk_size):
+            drifts = self.check_chunk(lo, lo + chunk_size, stats)
+            for drift in drifts:
+                if stats['shown'] < show:
+                    stats['shown'] += 1
+                    self.stdout.write(self.format_drift(drift))
+            if repair and drifts:
+                with transaction.atomic():
+                    if repair == 'users':
+                        self.repair_users(drifts)
+                    else:
+                        self.repair_ledger(drifts)
+                stats['repaired'] += len(drifts)
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Сверка завершена!'))
+        self.stdout.write(f'   - Проверено пользователей: {stats["users"]}')
+        self.stdout.write(f'   - С расхождениями: {stats["drifted"]}')
+        self.stdout.write(f'   - Расхождение XP (сумма модулей): {stats["xp_drift"]}')
+        self.stdout.write(f'   - Расхождение монет (сумма модулей): {stats["coins_drift"]}')
+        self.stdout.write(f'   - Расхождений баланса счетов: {stats["account_drift"]}')
+        if repair:
+            self.stdout.write(f'   - Исправлено ({repair}): {stats["repaired"]}')
+
+    def ledger_sums(self, lo, hi):
+        """Суммы журнала по (user_id, currency): подробные записи + итоги архивированных месяцев"""
+        sums = Counter()
+        detail = CurrencyTransaction.objects.filter(user_id__gte=lo, user_id__lt=hi).values('user_id', 'currency')
+        for row in detail.annotate(total=Sum('delta')).iterator():
+            sums[row['user_id'], row['currency']] += row['total']
+        archived = LedgerMonth.objects.filter(user_id__gte=lo, user_id__lt=hi).values('user_id', 'currency')
+        for row in archived.annotate(credit=Sum('credit'), debit=Sum('debit')).iterator():
+            sums[row['user_id'], row['currency']] += row['credit'] - row['debit']
+        return sums
+
+    def check_chunk(self, lo, hi, stats):
+        sums = self.ledger_sums(lo, hi)
+        accounts = {
+            (account.user_id, account.currency): account
+            for account in LedgerAccount.objects.filter(user_id__gte=lo, user_id__lt=hi).iterator()
+        }
+        users = User.objects.filter(id__gte=lo, id__lt=hi).only('id', 'username', 'level', 'xp', 'coins')
+        drifts = []
+        for user in users.iterator(chunk_size=2000):
+            stats['users'] += 1
+            total_xp = sums.get((user.id, XP), 0)
+            level, xp = level_from_total_xp(total_xp)
+            coins = sums.get((user.id, COINS), 0)
+            # Счета пользователя: (строка LedgerAccount или None, ожидаемый баланс)
+            user_accounts = {
+                currency: (accounts.get((user.id, currency)), sums.get((user.id, currency), 0))
+                for currency in (XP, COINS)
+            }
+            account_drift = sum(
+                1 for account, expected in user_accounts.values() if (account.balance if account else 0) != expected
+            )
+            if (user.level, user.xp, user.coins) == (level, xp, coins) and not account_drift:
+                continue
+            actual_total = calculate_total_xp(user.level, user.xp)
+            stats['drifted'] += 1
+            stats['xp_drift'] += abs(actual_total - total_xp)
+            stats['coins_drift'] += abs(user.coins - coins)
+            stats['account_drift'] += account_drift
+            drifts.append({
+                'user': user,
+                'expected': (level, xp, coins),
+                'total_xp': (actual_total, total_xp),
+                'accounts': user_accounts,
+            })
+        return drifts
+
+    def format_drift(self, drift):
+        user = drift['user']
+        level, xp, coins = drift['expected']
+        actual_total, total_xp = drift['total_xp']
+        line = (
+            f'   ~ {user.id} {user.username}: level {user.level}->{level}, xp {user.xp}->{xp} '
+            f'(всего {actual_total}->{total_xp}), coins {user.coins}->{coins}'
+        )
+        for currency, (account, expected) in drift['accounts'].items():
+            if (account.balance if account else 0) != expected:
+                line += f', счёт {currency} {account.balance if account else "нет"}->{expected}'
+        return self.style.WARNING(line)
+
+    def repair_users(self, drifts):
+        """User и LedgerAccount приводятся к журналу"""
+        users = []
+        for drift in drifts:
+            user = drift['user']
+            level, xp, coins = drift['expected']
+            user.level, user.xp, user.coins = level, xp, max(0, coins)
+            users.append(user)
+        User.objects.bulk_update(users, ['level', 'xp', 'coins'])
+        self.fix_accounts(drifts)
+
+    def repair_ledger(self, drifts):
+        """В журнал дописываются корректирующие записи до значений User"""
+        corrections = []
+        for drift in drifts:
+            user = drift['user']
+            actual_total, total_xp = drift['total_xp']
+            _, _, coins = drift['expected']
+            for currency, delta, balance in ((XP, actual_total - total_xp, actual_total), (COINS, user.coins - coins, user.coins)):
+                if delta:
+                    corrections.append(CurrencyTransaction(
+                        user_id=user.id, currency=currency, delta=delta, balance=balance,
+                        reason=CORRECTION_REASON, meta={'type': 'reconciliation'}
+                    ))
+                drift['accounts'][currency] = (drift['accounts'][currency][0], balance)
+        CurrencyTransaction.objects.bulk_create(corrections, batch_size=1000)
+        self.fix_accounts(drifts)
+
+    @staticmethod
+    def fix_accounts(drifts):
+        now = timezone.now()
+        to_update, to_create = [], []
+        for drift in drifts:
+            for currency, (account, expected) in drift['accounts'].items():
+                if account is None:
+                    if expected:
+                        to_create.append(LedgerAccount(user_id=drift['user'].id, currency=currency, balance=expected))
+                elif account.balance != expected:
+                    account.balance = expected
+                    account.updated_at = now
+                    to_update.append(account)
+        LedgerAccount.objects.bulk_update(to_update, ['balance', 'updated_at'])
+        LedgerAccount.objects.bulk_create(to_create, ignore_conflicts=True)
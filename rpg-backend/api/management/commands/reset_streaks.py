@@ -0,0 +1,81 @@
+"""
+Django management command для сброса прерванных серий (streak)
+Использование: python manage.py reset_streaks [--batch-size N]
+
+Серия прерывается, если последний день активности раньше вчерашнего в
+часовом поясе пользователя (User.time_zone, по умолчанию TIME_ZONE).
+Для каждого часового пояса прерванные серии сбрасываются пачками: строки
+пачки блокируются (SELECT ... FOR UPDATE), сбрасываются одним UPDATE, и
+после фиксации владельцы именно этих серий получают уведомление
+(bulk_create). Запускать раз в час (например, cron: 5 * * * *), чтобы
+каждый пояс обрабатывался вскоре после своей полуночи; повторный запуск
+ничего не меняет.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from api.models import Notification, User
+from api.utils import get_time_zone
+
+
+class Command(BaseCommand):
+    help = 'Сбрасывает прерванные серии активности и уведомляет пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер пачки сбрасываемых серий (по умолчанию: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        now = timezone.now()
+
+        total_reset = 0
+        zones = User.objects.filter(streak__gt=0).values_list('time_zone', flat=True).distinct()
+        for name in list(zones):
+            tz = get_time_zone(name) if name else None
+            # Пустой или неизвестный пояс — TIME_ZONE
+            if tz is None:
+                if name and name != settings.TIME_ZONE:
+                    self.stdout.write(self.style.WARNING(f'Неизвестный часовой пояс {name!r}, используется {settings.TIME_ZONE}'))
+                tz = timezone.get_default_timezone()
+            today = timezone.localdate(now, timezone=tz)
+            broken = User.objects.filter(
+                time_zone=name, streak__gt=0
+            ).filter(
+                Q(last_activity_date__lt=today - timedelta(days=1)) | Q(last_activity_date__isnull=True)
+            )
+            reset = 0
+            while True:
+                with transaction.atomic():
+                    # Блокировка: параллельная активность не изменит серию между выборкой и сбросом
+                    rows = list(broken.select_for_update().order_by('id').values_list('id', 'streak')[:batch_size])
+                    if not rows:
+                        break
+                    User.objects.filter(pk__in=[user_id for user_id, _ in rows]).update(streak=0)
+                    transaction.on_commit(lambda rows=rows: self.notify(rows))
+                reset += len(rows)
+            total_reset += reset
+            self.stdout.write(f'   - {name or settings.TIME_ZONE} ({today}): сброшено {reset}')
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Прерванных серий сброшено: {total_reset}'))
+
+    @staticmethod
+    def notify(rows):
+        Notification.objects.bulk_create([
+            Notification(
+                user_id=user_id,
+                title="Серия прервана",
+                body=f"Ваша серия из {streak} дн. прервалась. Выполните квест сегодня, чтобы начать новую!",
+                data={"streak": streak, "type": "streak_lost"}
+            )
+            for user_id, streak in rows
+        ])
@@ -0,0 +1,88 @@
+"""
+Django management command для напоминаний о дедлайнах и пометки просроченных назначений
+Использование: python manage.py sweep_deadlines [--hours N] [--batch-size N]
+
+Рассчитан на запуск по расписанию (например, cron раз в час). Назначение
+считается сданным в срок до конца дня due_date (TIME_ZONE). Каждому назначению
+напоминание отправляется один раз (поле reminded_at). Ежедневные квесты
+живут один день, поэтому напоминания по ним не отправляются.
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import Notification, QuestAssignment
+
+
+class Command(BaseCommand):
+    help = 'Отправляет напоминания о приближающихся дедлайнах и помечает просроченные назначения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=24,
+            help='За сколько часов до дедлайна напоминать (по умолчанию: 24)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер пачки для INSERT/UPDATE (по умолчанию: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(1, options['batch_size'])
+        now = timezone.now()
+        today = timezone.localdate(now)
+        horizon = timezone.localdate(now + timedelta(hours=max(0, options['hours'])))
+
+        overdue = self.mark_overdue(today, batch_size)
+        reminded = self.send_reminders(today, horizon, now, batch_size)
+
+        self.stdout.write(self.style.SUCCESS('\n✅ Дедлайны обработаны!'))
+        self.stdout.write(f'   - Отправлено напоминаний: {reminded}')
+        self.stdout.write(f'   - Помечено просроченных: {overdue}')
+
+    def mark_overdue(self, today, batch_size):
+        """Помечает просроченные назначения пачками UPDATE"""
+        pending = QuestAssignment.objects.filter(
+            is_completed=False, due_date__lt=today, is_overdue=False
+        ).order_by('due_date')
+        total = 0
+        while True:
+            ids = list(pending.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return total
+            total += QuestAssignment.objects.filter(id__in=ids).update(is_overdue=True)
+
+    def send_reminders(self, today, horizon, now, batch_size):
+        """
+        Создает напоминания для назначений со сроком в окне [today, horizon).
+
+        Дедлайн назначения — конец дня due_date, поэтому в окно попадают дни,
+        которые заканчиваются не позже чем через --hours часов.
+        """
+        due_soon = QuestAssignment.objects.filter(
+            is_completed=False, due_date__gte=today, due_date__lt=horizon, reminded_at__isnull=True,
+            quest__is_daily=False,
+        ).select_related('quest').only('id', 'user_id', 'due_date', 'quest__id', 'quest__title').order_by('due_date', 'id')
+        total = 0
+        while True:
+            with transaction.atomic():
+                batch = list(due_soon.select_for_update(skip_locked=True, of=('self',))[:batch_size])
+                if not batch:
+                    return total
+                Notification.objects.bulk_create([
+                    Notification(
+                        user_id=assignment.user_id,
+                        title="Скоро дедлайн!",
+                        body=f"Квест «{assignment.quest.title}» нужно выполнить до {assignment.due_date:%d.%m.%Y}",
+                        data={"quest_id": assignment.quest.id, "assignment_id": assignment.id, "type": "deadline_reminder"}
+                    )
+                    for assignment in batch
+                ])
+                QuestAssignment.objects.filter(id__in=[assignment.id for assignment in batch]).update(reminded_at=now)
+                total += len(batch)
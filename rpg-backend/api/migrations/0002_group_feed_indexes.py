@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='grouppost',
+            index=models.Index(fields=['group', '-created_at'], name='api_grouppo_group_i_3c1701_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='grouppostcomment',
+            index=models.Index(fields=['post', 'created_at'], name='api_grouppo_post_id_2fd2b2_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_group_goal_contributions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseStats',
+            fields=[
+                ('course', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='api.course')),
+                ('member_count', models.PositiveIntegerField(default=0)),
+                ('total_xp', models.BigIntegerField(default=0)),
+                ('week_xp', models.BigIntegerField(default=0)),
+                ('week_start', models.DateField(blank=True, null=True)),
+                ('quests_completed', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-total_xp'], name='api_courses_total_x_7190a7_idx'), models.Index(fields=['week_start', '-week_xp'], name='api_courses_week_st_f45a5f_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GroupStats',
+            fields=[
+                ('group', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='api.group')),
+                ('member_count', models.PositiveIntegerField(default=0)),
+                ('total_xp', models.BigIntegerField(default=0)),
+                ('week_xp', models.BigIntegerField(default=0)),
+                ('week_start', models.DateField(blank=True, null=True)),
+                ('quests_completed', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='group_stats', to='api.course')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-total_xp'], name='api_groupst_total_x_128180_idx'), models.Index(fields=['week_start', '-week_xp'], name='api_groupst_week_st_30c8a6_idx'), models.Index(fields=['course', '-total_xp'], name='api_groupst_course__06b227_idx'), models.Index(fields=['course', 'week_start', '-week_xp'], name='api_groupst_course__00b9dd_idx')],
+            },
+        ),
+    ]
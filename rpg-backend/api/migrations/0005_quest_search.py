@@ -0,0 +1,53 @@
+from django.db import migrations
+
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE api_quest ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(description, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(goal, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX api_quest_search_vector_gin ON api_quest USING gin (search_vector)",
+]
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS api_quest_search_vector_gin",
+    "ALTER TABLE api_quest DROP COLUMN IF EXISTS search_vector",
+]
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE api_quest_fts USING fts5(
+        title, description, goal, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    INSERT INTO api_quest_fts (rowid, title, description, goal)
+    SELECT id, replace(replace(title, 'ё', 'е'), 'Ё', 'Е'),
+           replace(replace(description, 'ё', 'е'), 'Ё', 'Е'),
+           replace(replace(goal, 'ё', 'е'), 'Ё', 'Е')
+    FROM api_quest
+    """,
+]
+SQLITE_BACKWARD = ["DROP TABLE IF EXISTS api_quest_fts"]
+
+
+def run(statements_by_vendor):
+    def apply(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_group_course_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            run({'postgresql': POSTGRES_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:31
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_quest_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestRecommendation',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='quest_recommendation', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('items', models.JSONField(blank=True, default=list)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
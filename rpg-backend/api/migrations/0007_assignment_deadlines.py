@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_quest_recommendations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='questassignment',
+            name='is_overdue',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='questassignment',
+            name='reminded_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='questassignment',
+            index=models.Index(fields=['is_completed', 'due_date'], name='api_questas_is_comp_684d63_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def seed_counters(apps, schema_editor):
+    """Уже купленное количество берём из инвентаря"""
+    StoreItem = apps.get_model('api', 'StoreItem')
+    InventoryItem = apps.get_model('api', 'InventoryItem')
+    PurchaseCounter = apps.get_model('api', 'PurchaseCounter')
+    for store_item in StoreItem.objects.all():
+        PurchaseCounter.objects.bulk_create(
+            [
+                PurchaseCounter(user_id=user_id, store_item_id=store_item.id, quantity=quantity)
+                for user_id, quantity in InventoryItem.objects.filter(item_id=store_item.item_id).values_list('user_id', 'quantity')
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_assignment_deadlines'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurchaseCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('store_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchase_counters', to='api.storeitem')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchase_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'store_item')},
+            },
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_purchase_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storeitem',
+            name='is_flash_sale',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='FlashSaleSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('store_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flash_slots', to='api.storeitem')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='flash_slots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['store_item', 'user'], name='api_flashsa_store_i_a06921_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='FlashSaleRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'В очереди'), ('reserved', 'Зарезервировано'), ('sold_out', 'Распродано'), ('failed', 'Отклонено')], default='queued', max_length=16)),
+                ('detail', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+                ('store_item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flash_requests', to='api.storeitem')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='flash_requests', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['store_item', 'status', 'created_at'], name='api_flashsa_store_i_6c8fcc_idx'), models.Index(fields=['user', 'store_item'], name='api_flashsa_user_id_d23f92_idx')],
+            },
+        ),
+    ]
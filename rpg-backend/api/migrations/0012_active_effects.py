@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_catalog_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActiveEffect',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=32)),
+                ('value', models.FloatField(default=1)),
+                ('activated_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+                ('item', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='active_effects', to='api.item')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='active_effects', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'expires_at'], name='api_activee_user_id_0afe21_idx'), models.Index(fields=['expires_at'], name='api_activee_expires_8d32c0_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,132 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+OPENING_REASON = "Начальный баланс"
+
+
+def backfill_ledger(apps, schema_editor):
+    """
+    Размечает старые записи по валютам, добавляет начальные балансы и считает
+    баланс каждой записи.
+
+    Раньше XP и монеты писались в одну таблицу без типа: списания и награды
+    за достижения (meta.achievement_id) — монеты, остальные начисления — XP.
+    Монеты за квесты в журнал не попадали, поэтому разница с текущими
+    User.coins и накопленным XP записывается начальной записью на дату
+    регистрации.
+    """
+    User = apps.get_model('api', 'User')
+    CurrencyTransaction = apps.get_model('api', 'CurrencyTransaction')
+    LedgerAccount = apps.get_model('api', 'LedgerAccount')
+
+    CurrencyTransaction.objects.update(currency='xp')
+    CurrencyTransaction.objects.filter(
+        models.Q(delta__lt=0) | models.Q(meta__has_key='achievement_id')
+    ).update(currency='coins')
+
+    sums = {
+        (row['user_id'], row['currency']): row['total']
+        for row in CurrencyTransaction.objects.values('user_id', 'currency').annotate(total=models.Sum('delta'))
+    }
+    opening = []
+    for user_id, level, xp, coins in User.objects.values_list('id', 'level', 'xp', 'coins').iterator():
+        total_xp = sum(int(100 * (lvl ** 1.5)) for lvl in range(1, level)) + xp
+        for currency, current in (('xp', total_xp), ('coins', coins)):
+            delta = current - sums.get((user_id, currency), 0)
+            if delta:
+                opening.append(CurrencyTransaction(user_id=user_id, currency=currency, delta=delta, reason=OPENING_REASON))
+    CurrencyTransaction.objects.bulk_create(opening, batch_size=1000)
+    CurrencyTransaction.objects.filter(reason=OPENING_REASON).update(
+        created_at=models.Subquery(User.objects.filter(pk=models.OuterRef('user_id')).values('date_joined')[:1])
+    )
+
+    balances = {}
+    batch = []
+    rows = CurrencyTransaction.objects.order_by('user_id', 'created_at', 'id').only('id', 'user_id', 'currency', 'delta')
+    for row in rows.iterator(chunk_size=5000):
+        key = (row.user_id, row.currency)
+        balances[key] = balances.get(key, 0) + row.delta
+        row.balance = balances[key]
+        batch.append(row)
+        if len(batch) >= 5000:
+            CurrencyTransaction.objects.bulk_update(batch, ['balance'])
+            batch = []
+    CurrencyTransaction.objects.bulk_update(batch, ['balance'])
+    LedgerAccount.objects.bulk_create(
+        [LedgerAccount(user_id=user_id, currency=currency, balance=balance) for (user_id, currency), balance in balances.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_active_effects'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(choices=[('xp', 'XP'), ('coins', 'Монеты')], max_length=8)),
+                ('taken_at', models.DateTimeField()),
+                ('balance', models.BigIntegerField()),
+                ('last_transaction_id', models.BigIntegerField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LedgerAccount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(choices=[('xp', 'XP'), ('coins', 'Монеты')], max_length=8)),
+                ('balance', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='currencytransaction',
+            name='balance',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='currencytransaction',
+            name='currency',
+            field=models.CharField(choices=[('xp', 'XP'), ('coins', 'Монеты')], default='coins', max_length=8),
+        ),
+        migrations.AddIndex(
+            model_name='currencytransaction',
+            index=models.Index(fields=['user', 'currency', 'created_at'], name='api_currenc_user_id_92f44b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='currencytransaction',
+            index=models.Index(fields=['currency', 'created_at'], name='api_currenc_currenc_1f52d1_idx'),
+        ),
+        migrations.AddField(
+            model_name='ledgeraccount',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_accounts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='balancecheckpoint',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_checkpoints', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='ledgeraccount',
+            index=models.Index(fields=['updated_at'], name='api_ledgera_updated_9a1c03_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='ledgeraccount',
+            unique_together={('user', 'currency')},
+        ),
+        migrations.AddIndex(
+            model_name='balancecheckpoint',
+            index=models.Index(fields=['user', 'currency', '-taken_at'], name='api_balance_user_id_99e8f6_idx'),
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
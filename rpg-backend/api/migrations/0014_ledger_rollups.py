@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:42
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_ledger_currencies'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerMonth',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(choices=[('xp', 'XP'), ('coins', 'Монеты')], max_length=8)),
+                ('month', models.DateField()),
+                ('credit', models.BigIntegerField(default=0)),
+                ('debit', models.BigIntegerField(default=0)),
+                ('entries', models.PositiveIntegerField(default=0)),
+                ('closing_balance', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_months', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'currency', 'month')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedCurrencyTransaction',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('currency', models.CharField(choices=[('xp', 'XP'), ('coins', 'Монеты')], max_length=8)),
+                ('delta', models.IntegerField()),
+                ('balance', models.BigIntegerField()),
+                ('reason', models.CharField(max_length=255)),
+                ('meta', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_transactions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'currency', 'created_at'], name='api_archive_user_id_b7d46a_idx')],
+            },
+        ),
+    ]
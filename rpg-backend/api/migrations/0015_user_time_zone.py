@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_ledger_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='time_zone',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['time_zone', 'last_activity_date'], name='api_user_time_zo_7cb742_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:48
+
+import api.models
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_user_time_zone'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityYear',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.PositiveSmallIntegerField()),
+                ('completions', models.BinaryField(default=api.models.empty_day_completions)),
+                ('xp', models.BinaryField(default=api.models.empty_day_xp)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_years', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'year')},
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:51
+
+import math
+from datetime import datetime, timezone
+
+from django.db import migrations, models
+
+
+HOT_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+HOT_DECAY_SECONDS = 45000
+
+
+def backfill_hot_score(apps, schema_editor):
+    """Горячесть уже выполненных назначений (формула — api/explore.py)"""
+    QuestAssignment = apps.get_model('api', 'QuestAssignment')
+    rows = QuestAssignment.objects.filter(is_completed=True, completed_at__isnull=False).annotate(
+        likes_total=models.Count('likes')
+    ).values_list('id', 'completed_at', 'likes_total')
+    batch = []
+    for assignment_id, completed_at, likes in rows.iterator(chunk_size=2000):
+        score = math.log10(1 + likes) + (completed_at - HOT_EPOCH).total_seconds() / HOT_DECAY_SECONDS
+        batch.append(QuestAssignment(id=assignment_id, hot_score=score))
+        if len(batch) >= 2000:
+            QuestAssignment.objects.bulk_update(batch, ['hot_score'])
+            batch = []
+    QuestAssignment.objects.bulk_update(batch, ['hot_score'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_activity_log_event_time'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='questassignment',
+            name='hot_score',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='questassignment',
+            index=models.Index(fields=['-hot_score'], name='api_questas_hot_sco_3f794c_idx'),
+        ),
+        migrations.RunPython(backfill_hot_score, migrations.RunPython.noop),
+    ]
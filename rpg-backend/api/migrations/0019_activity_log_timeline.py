@@ -0,0 +1,64 @@
+# Generated by Django 4.2.30 on 2026-10-19 08:52
+
+from django.db import migrations, models
+
+
+def backfill_timeline_events(apps, schema_editor):
+    """
+    Переносит в журнал действий выполнения квестов и достижения, сделанные
+    до появления журнала, чтобы лента друзей не начиналась с пустого места.
+    Уже записанные выполнения (data.assignment_id) пропускаются.
+    """
+    ActivityLog = apps.get_model('api', 'ActivityLog')
+    QuestAssignment = apps.get_model('api', 'QuestAssignment')
+    AchievementProgress = apps.get_model('api', 'AchievementProgress')
+
+    logged = {
+        assignment_id for assignment_id in ActivityLog.objects.filter(
+            verb='quest_completed'
+        ).values_list('data__assignment_id', flat=True) if assignment_id is not None
+    }
+    logged_achievements = set(ActivityLog.objects.filter(verb='achievement_unlocked').values_list(
+        'user_id', 'data__achievement_id'
+    ))
+
+    def events():
+        completed = QuestAssignment.objects.filter(is_completed=True, completed_at__isnull=False).values_list(
+            'id', 'user_id', 'quest_id', 'quest__title', 'xp_reward', 'coin_reward', 'completed_at'
+        )
+        for assignment_id, user_id, quest_id, title, xp, coins, completed_at in completed.iterator(chunk_size=2000):
+            if assignment_id not in logged:
+                yield ActivityLog(user_id=user_id, verb='quest_completed', created_at=completed_at, data={
+                    'assignment_id': assignment_id, 'quest_id': quest_id, 'quest_title': title, 'xp': xp, 'coins': coins,
+                })
+        achieved = AchievementProgress.objects.filter(achieved=True, achieved_at__isnull=False).values_list(
+            'user_id', 'achievement_id', 'achievement__title', 'achieved_at'
+        )
+        for user_id, achievement_id, title, achieved_at in achieved.iterator(chunk_size=2000):
+            if (user_id, achievement_id) not in logged_achievements:
+                yield ActivityLog(user_id=user_id, verb='achievement_unlocked', created_at=achieved_at, data={
+                    'achievement_id': achievement_id, 'achievement_title': title,
+                })
+
+    batch = []
+    for event in events():
+        batch.append(event)
+        if len(batch) >= 2000:
+            ActivityLog.objects.bulk_create(batch)
+            batch = []
+    ActivityLog.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_assignment_hot_score'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='api_activit_user_id_15a60d_idx'),
+        ),
+        migrations.RunPython(backfill_timeline_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_activity_log_timeline'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='currencytransaction',
+            name='balance',
+            field=models.BigIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='currencytransaction',
+            name='currency',
+            field=models.CharField(choices=[('xp', 'XP'), ('coins', 'Монеты')], max_length=8),
+        ),
+    ]
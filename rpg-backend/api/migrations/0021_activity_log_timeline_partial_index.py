@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_ledger_required_fields'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(condition=models.Q(('verb__in', ('quest_completed', 'item_purchased', 'achievement_unlocked'))), fields=['user', '-created_at', '-id'], name='activitylog_timeline_idx'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_contributors(apps, schema_editor):
+    """Итоги по уже записанным вкладам"""
+    GroupGoalContribution = apps.get_model('api', 'GroupGoalContribution')
+    GroupGoalContributor = apps.get_model('api', 'GroupGoalContributor')
+    totals = GroupGoalContribution.objects.values('goal_id', 'user_id').annotate(
+        total=models.Sum('xp'), count=models.Count('id')
+    ).order_by()
+    GroupGoalContributor.objects.bulk_create(
+        (
+            GroupGoalContributor(goal_id=row['goal_id'], user_id=row['user_id'], total_xp=row['total'], contributions=row['count'])
+            for row in totals.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_activity_log_timeline_partial_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupGoalContributor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_xp', models.PositiveIntegerField(default=0)),
+                ('contributions', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('goal', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contributors', to='api.groupgoal')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='goal_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['goal', '-total_xp'], name='api_groupgo_goal_id_78a29a_idx')],
+                'unique_together': {('goal', 'user')},
+            },
+        ),
+        migrations.RunPython(backfill_contributors, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 4.2.30 on 2026-10-19 09:30
+
+from datetime import datetime, time, timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_stats(apps, schema_editor):
+    """
+    Статистика групп и курсов, существовавших до появления GroupStats/CourseStats.
+
+    Повторяет api.aggregates.rebuild_stats на исторических моделях:
+    строки обновляются только инкрементально, поэтому без пересчёта старые
+    группы и курсы оставались без статистики и выпадали из рейтингов.
+    """
+    User = apps.get_model('api', 'User')
+    Group = apps.get_model('api', 'Group')
+    Course = apps.get_model('api', 'Course')
+    GroupStats = apps.get_model('api', 'GroupStats')
+    CourseStats = apps.get_model('api', 'CourseStats')
+    CurrencyTransaction = apps.get_model('api', 'CurrencyTransaction')
+    QuestAssignment = apps.get_model('api', 'QuestAssignment')
+
+    today = timezone.localdate()
+    week_start = today - timedelta(days=today.weekday())
+    since = timezone.make_aware(datetime.combine(week_start, time.min))
+
+    total_xp = {
+        user_id: sum(int(100 * (lvl ** 1.5)) for lvl in range(1, level)) + xp
+        for user_id, level, xp in User.objects.values_list('id', 'level', 'xp').iterator()
+    }
+    week_xp = dict(
+        CurrencyTransaction.objects.filter(currency='xp', created_at__gte=since)
+        .values('user').annotate(s=models.Sum('delta')).values_list('user', 's')
+    )
+    completed = dict(
+        QuestAssignment.objects.filter(is_completed=True)
+        .values('user').annotate(c=models.Count('id')).values_list('user', 'c')
+    )
+
+    def empty():
+        return {'member_count': 0, 'total_xp': 0, 'week_xp': 0, 'quests_completed': 0}
+
+    group_course = dict(Group.objects.values_list('id', 'course_id'))
+    group_rows = {group_id: empty() for group_id in group_course}
+    course_rows = {course_id: empty() for course_id in Course.objects.values_list('id', flat=True)}
+    course_members = set()
+
+    for group_id, user_id in Group.members.through.objects.values_list('group_id', 'user_id').iterator():
+        targets = [group_rows[group_id]]
+        course_id = group_course[group_id]
+        if course_id is not None and (course_id, user_id) not in course_members:
+            course_members.add((course_id, user_id))
+            targets.append(course_rows[course_id])
+        for row in targets:
+            row['member_count'] += 1
+            row['total_xp'] += total_xp.get(user_id, 0)
+            row['week_xp'] += week_xp.get(user_id, 0)
+            row['quests_completed'] += completed.get(user_id, 0)
+
+    fields = ['member_count', 'total_xp', 'week_xp', 'week_start', 'quests_completed', 'updated_at']
+    GroupStats.objects.bulk_create(
+        [
+            GroupStats(group_id=group_id, course_id=group_course[group_id], week_start=week_start, **row)
+            for group_id, row in group_rows.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['group'],
+        update_fields=['course'] + fields,
+        batch_size=1000,
+    )
+    CourseStats.objects.bulk_create(
+        [CourseStats(course_id=course_id, week_start=week_start, **row) for course_id, row in course_rows.items()],
+        update_conflicts=True,
+        unique_fields=['course'],
+        update_fields=fields,
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_group_goal_contributor'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
@@ -20,6 +21,7 @@ class User(AbstractUser):
         last_activity_date: Последний день активности
         faculty: Факультет студента
         group_name: Название группы студента
+        time_zone: Часовой пояс пользователя (IANA); пусто — TIME_ZONE
     """
     ROLE_CHOICES = [
         ("student", "Студент"),
@@ -35,9 +37,14 @@ class User(AbstractUser):
     last_activity_date = models.DateField(null=True, blank=True)  # Последний день активности
     faculty = models.CharField(max_length=255, blank=True)  # Факультет
     group_name = models.CharField(max_length=255, blank=True)  # Группа
+    time_zone = models.CharField(max_length=64, blank=True)  # Часовой пояс для streak; пусто — TIME_ZONE
 
     class Meta:
-        indexes = [models.Index(fields=["-xp", "-coins"]), models.Index(fields=["-level"])]
+        indexes = [
+            models.Index(fields=["-xp", "-coins"]),
+            models.Index(fields=["-level"]),
+            models.Index(fields=["time_zone", "last_activity_date"]),
+        ]
 
     def __str__(self):
         return self.get_full_name() or self.username
@@ -135,10 +142,17 @@ class QuestAssignment(models.Model):
     xp_reward = models.PositiveIntegerField(default=0)
     coin_reward = models.PositiveIntegerField(default=0)
     needs_review = models.BooleanField(default=False)
+    is_overdue = models.BooleanField(default=False)
+    reminded_at = models.DateTimeField(null=True, blank=True)  # Когда отправлено напоминание о дедлайне
+    hot_score = models.FloatField(null=True, blank=True, editable=False)  # Горячесть для ленты «Обзор» (api/explore.py)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        indexes = [models.Index(fields=["user", "is_completed"])]
+        indexes = [
+            models.Index(fields=["user", "is_completed"]),
+            models.Index(fields=["is_completed", "due_date"]),
+            models.Index(fields=["-hot_score"]),
+        ]
         unique_together = ("quest", "user", "due_date")
 
 
@@ -185,11 +199,48 @@ class StoreItem(models.Model):
     stock = models.IntegerField(null=True, blank=True)
     purchase_limit = models.PositiveIntegerField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
+    is_flash_sale = models.BooleanField(default=False)  # Режим распродажи: склад раздаётся через FlashSaleSlot
 
     class Meta:
         indexes = [models.Index(fields=["price"])]
 
 
+class FlashSaleSlot(models.Model):
+    """Единица товара в режиме распродажи; покупатели занимают разные строки вместо одной строки склада"""
+    store_item = models.ForeignKey(StoreItem, on_delete=models.CASCADE, related_name="flash_slots")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, related_name="flash_slots")
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["store_item", "user"])]
+
+
+class FlashSaleRequest(models.Model):
+    """Очередь заявок на товар распродажи, которые не получили слот сразу"""
+    STATUS_CHOICES = [("queued", "В очереди"), ("reserved", "Зарезервировано"), ("sold_out", "Распродано"), ("failed", "Отклонено")]
+
+    store_item = models.ForeignKey(StoreItem, on_delete=models.CASCADE, related_name="flash_requests")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="flash_requests")
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="queued")
+    detail = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["store_item", "status", "created_at"]), models.Index(fields=["user", "store_item"])]
+
+
+class PurchaseCounter(models.Model):
+    """Сколько единиц товара магазина купил пользователь (для purchase_limit)"""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="purchase_counters")
+    store_item = models.ForeignKey(StoreItem, on_delete=models.CASCADE, related_name="purchase_counters")
+    quantity = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("user", "store_item")
+
+
 class InventoryItem(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="inventory")
     item = models.ForeignKey(Item, on_delete=models.CASCADE)
@@ -213,14 +264,47 @@ class EquippedItem(models.Model):
 
 
 class CurrencyTransaction(models.Model):
+    CURRENCY_CHOICES = [("xp", "XP"), ("coins", "Монеты")]
+
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="transactions")
+    # Без значений по умолчанию: записи создаются только через api/ledger.py, который задаёт счёт и баланс
+    currency = models.CharField(max_length=8, choices=CURRENCY_CHOICES)
     delta = models.IntegerField()
+    balance = models.BigIntegerField()  # Баланс счёта (user, currency) после этой записи
     reason = models.CharField(max_length=255)
     meta = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
-        indexes = [models.Index(fields=["user", "-created_at"])]
+        indexes = [
+            models.Index(fields=["user", "-created_at"]),
+            models.Index(fields=["user", "currency", "created_at"]),
+            models.Index(fields=["currency", "created_at"]),
+        ]
+
+
+# Текущий баланс счёта пользователя в журнале (см. api/ledger.py)
+class LedgerAccount(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="ledger_accounts")
+    currency = models.CharField(max_length=8, choices=CurrencyTransaction.CURRENCY_CHOICES)
+    balance = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("user", "currency")
+        indexes = [models.Index(fields=["updated_at"])]
+
+
+# Периодические снимки баланса счёта (команда ledger_checkpoint)
+class BalanceCheckpoint(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="balance_checkpoints")
+    currency = models.CharField(max_length=8, choices=CurrencyTransaction.CURRENCY_CHOICES)
+    taken_at = models.DateTimeField()
+    balance = models.BigIntegerField()
+    last_transaction_id = models.BigIntegerField(null=True, blank=True)  # Последняя учтённая запись журнала
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "currency", "-taken_at"])]
 
 
 class LeaderboardEntry(models.Model):
@@ -242,11 +326,50 @@ class Notification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
 
+DAYS_IN_YEAR = 366
+
+
+def empty_day_completions():
+    return bytes(2 * DAYS_IN_YEAR)  # 366 x uint16
+
+
+def empty_day_xp():
+    return bytes(4 * DAYS_IN_YEAR)  # 366 x uint32
+
+
+# Календарь активности пользователя за год: счётчики по дням в упакованных массивах (см. api/activity_calendar.py)
+class ActivityYear(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="activity_years")
+    year = models.PositiveSmallIntegerField()
+    completions = models.BinaryField(default=empty_day_completions)  # Выполненные квесты по дням года
+    xp = models.BinaryField(default=empty_day_xp)  # Полученный XP по дням года
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("user", "year")
+
+
+# События ленты друзей (api/timeline.py): выполнение квеста, покупка, достижение (константы api/activity_log.py)
+TIMELINE_VERBS = ("quest_completed", "item_purchased", "achievement_unlocked")
+
+
 class ActivityLog(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
     verb = models.CharField(max_length=128)
     data = models.JSONField(default=dict, blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Время события, а не записи: журнал сохраняется пачками с задержкой (см. api/activity_log.py)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"]),
+            # Диапазоны ленты друзей (api/timeline.py): частые входы и прочие события в индекс не попадают
+            models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="activitylog_timeline_idx",
+                condition=models.Q(verb__in=TIMELINE_VERBS),
+            ),
+        ]
 
 
 class FriendRequest(models.Model):
@@ -299,6 +422,7 @@ class GroupPost(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [models.Index(fields=["group", "-created_at"])]
 
 
 # Комментарии к постам в группах
@@ -311,6 +435,7 @@ class GroupPostComment(models.Model):
 
     class Meta:
         ordering = ['created_at']
+        indexes = [models.Index(fields=["post", "created_at"])]
 
 
 # Групповые цели (опционально для MVP)
@@ -323,4 +448,133 @@ class GroupGoal(models.Model):
     deadline = models.DateTimeField(null=True, blank=True)
     is_completed = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
-    completed_at = models.DateTimeField(null=True, blank=True)
\ No newline at end of file
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+
+# Вклады участников в групповые цели (журнал)
+class GroupGoalContribution(models.Model):
+    goal = models.ForeignKey(GroupGoal, on_delete=models.CASCADE, related_name="contributions")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="goal_contributions")
+    xp = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["goal", "user"])]
+
+
+# Итог вкладов участника в групповую цель (обновляется вместе с журналом GroupGoalContribution)
+class GroupGoalContributor(models.Model):
+    goal = models.ForeignKey(GroupGoal, on_delete=models.CASCADE, related_name="contributors")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="goal_totals")
+    total_xp = models.PositiveIntegerField(default=0)
+    contributions = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("goal", "user")
+        indexes = [models.Index(fields=["goal", "-total_xp"])]
+
+
+# Материализованная статистика групп и курсов (поддерживается инкрементально, см. api/aggregates.py)
+class GroupStats(models.Model):
+    group = models.OneToOneField(Group, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, null=True, blank=True, related_name="group_stats")
+    member_count = models.PositiveIntegerField(default=0)
+    total_xp = models.BigIntegerField(default=0)  # XP, заработанный участниками за всё время
+    week_xp = models.BigIntegerField(default=0)  # XP участников за неделю, начавшуюся week_start
+    week_start = models.DateField(null=True, blank=True)
+    quests_completed = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-total_xp"]),
+            models.Index(fields=["week_start", "-week_xp"]),
+            models.Index(fields=["course", "-total_xp"]),
+            models.Index(fields=["course", "week_start", "-week_xp"]),
+        ]
+
+
+class CourseStats(models.Model):
+    course = models.OneToOneField(Course, on_delete=models.CASCADE, primary_key=True, related_name="stats")
+    member_count = models.PositiveIntegerField(default=0)  # Уникальные участники групп курса
+    total_xp = models.BigIntegerField(default=0)
+    week_xp = models.BigIntegerField(default=0)
+    week_start = models.DateField(null=True, blank=True)
+    quests_completed = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["-total_xp"]), models.Index(fields=["week_start", "-week_xp"])]
+
+
+# Предрассчитанные рекомендации квестов (см. api/recommendations.py)
+class QuestRecommendation(models.Model):
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name="quest_recommendation")
+    items = models.JSONField(default=list, blank=True)  # [{"quest": id, "score": float}, ...] по убыванию score
+    computed_at = models.DateTimeField(auto_now=True)
+
+
+# Ключи идемпотентности для повторяемых запросов (см. api/idempotency.py)
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="idempotency_keys")
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=255)  # Метод и путь запроса
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)  # null — запрос ещё выполняется
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("user", "key")
+        indexes = [models.Index(fields=["expires_at"])]
+
+
+# Версия каталога магазина (одна строка); увеличивается при любом изменении Item/StoreItem (см. api/catalog.py)
+class CatalogVersion(models.Model):
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+# Действующие эффекты бустов (см. api/effects.py)
+class ActiveEffect(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="active_effects")
+    item = models.ForeignKey(Item, on_delete=models.SET_NULL, null=True, blank=True, related_name="active_effects")
+    kind = models.CharField(max_length=32)  # xp_multiplier, coins_multiplier, group_boost, ...
+    value = models.FloatField(default=1)
+    activated_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "expires_at"]), models.Index(fields=["expires_at"])]
+
+
+# Помесячные итоги журнала по счёту пользователя (см. api/ledger.py, команда archive_ledger)
+class LedgerMonth(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="ledger_months")
+    currency = models.CharField(max_length=8, choices=CurrencyTransaction.CURRENCY_CHOICES)
+    month = models.DateField()  # Первый день месяца в TIME_ZONE
+    credit = models.BigIntegerField(default=0)  # Сумма начислений
+    debit = models.BigIntegerField(default=0)  # Сумма списаний (положительное число)
+    entries = models.PositiveIntegerField(default=0)
+    closing_balance = models.BigIntegerField(default=0)  # Баланс после последней записи месяца
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("user", "currency", "month")
+
+
+# Архив записей журнала старше горизонта детализации
+class ArchivedCurrencyTransaction(models.Model):
+    id = models.BigIntegerField(primary_key=True)  # id исходной записи CurrencyTransaction
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="archived_transactions")
+    currency = models.CharField(max_length=8, choices=CurrencyTransaction.CURRENCY_CHOICES)
+    delta = models.IntegerField()
+    balance = models.BigIntegerField()
+    reason = models.CharField(max_length=255)
+    meta = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "currency", "created_at"])]
@@ -0,0 +1,53 @@
+from rest_framework.pagination import CursorPagination
+
+
+class GroupFeedPagination(CursorPagination):
+    """
+    Keyset-пагинация ленты группы.
+
+    Курсор кодирует позицию (created_at, id) последнего поста страницы,
+    поэтому стоимость страницы не зависит от количества постов в группе
+    и использует индекс (group, -created_at).
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+
+class OptionalCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация, включаемая клиентом.
+
+    Если в запросе нет параметров cursor/limit, возвращается обычный список
+    (как раньше), чтобы не ломать существующих клиентов.
+    """
+    page_size = 50
+    page_size_query_param = 'limit'
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class GroupPostCommentPagination(OptionalCursorPagination):
+    ordering = ('created_at', 'id')
+
+
+class ActivityLogPagination(CursorPagination):
+    """Журнал действий, новые записи первыми (индекс user, -created_at, -id)"""
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'limit'
+    max_page_size = 200
+
+
+class LedgerPagination(CursorPagination):
+    """Последние записи журнала XP и монет (индекс user, currency, created_at)"""
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'limit'
+    max_page_size = 200
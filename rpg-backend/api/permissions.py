@@ -33,4 +33,8 @@ class IsOwnerOrAdmin(BasePermission):
         if hasattr(obj, 'created_by'):
             return obj.created_by == request.user or (request.user.is_authenticated and request.user.role == 'admin')
         # fallback: admins
-        return request.user.is_authenticated and request.user.role == 'admin'
\ No newline at end of file
+        return request.user.is_authenticated and request.user.role == 'admin'
+
+class IsAdmin(BasePermission):
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated and request.user.role == 'admin')
@@ -0,0 +1,224 @@
+"""
+Персональные рекомендации публичных квестов.
+
+Рекомендации считаются пакетно (команда compute_recommendations) и хранятся
+как короткий top-N список в QuestRecommendation, поэтому /quests/recommended/
+читает одну строку по ключу.
+
+Оценка кандидата складывается из:
+- совместных выполнений: косинусная близость квеста к уже выполненным
+  пользователем (по матрице совместных выполнений quest x quest);
+- популярности среди однокурсников: выполнения в той же группе (group_name)
+  и на том же факультете;
+- соответствия сложности: средняя сложность выполненных квестов, сдвинутая
+  вверх при высокой доле выполнения и вниз при низкой;
+- общей популярности квеста.
+
+Матрица совместных выполнений разреженная и считается словарями, без numpy:
+стоимость пропорциональна сумме квадратов числа выполнений на пользователя.
+"""
+import math
+from collections import Counter, defaultdict
+from itertools import combinations
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Quest, QuestAssignment, QuestRecommendation, User
+
+WEIGHT_CO_COMPLETION = 0.5
+WEIGHT_COHORT = 0.25
+WEIGHT_DIFFICULTY = 0.15
+WEIGHT_POPULARITY = 0.1
+DEFAULT_DIFFICULTY = 2
+POPULAR_CANDIDATES = 50
+COHORT_CANDIDATES = 30
+
+
+def _load_quests():
+    """Публичные квесты, которые ещё можно выполнить: id -> (difficulty, created_by_id)"""
+    now = timezone.now()
+    return {
+        quest_id: (difficulty, created_by_id)
+        for quest_id, difficulty, created_by_id in Quest.objects.filter(is_public=True).filter(
+            Q(deadline__isnull=True) | Q(deadline__gt=now),
+            Q(active_to__isnull=True) | Q(active_to__gt=now),
+        ).values_list('id', 'difficulty', 'created_by_id').iterator()
+    }
+
+
+def _load_completed(public_ids):
+    """
+    Выполненные публичные квесты по пользователю.
+
+    Пары (user, quest) различаются в SQL, поэтому повторные выполнения
+    (ежедневные квесты) не читаются.
+    """
+    completed = defaultdict(set)
+    rows = QuestAssignment.objects.filter(is_completed=True, quest__is_public=True).values_list(
+        'user_id', 'quest_id'
+    ).distinct().order_by()
+    for user_id, quest_id in rows.iterator(chunk_size=10000):
+        if quest_id in public_ids:
+            completed[user_id].add(quest_id)
+    return completed
+
+
+def _load_user_history(user_ids):
+    """
+    История назначений пачки пользователей.
+
+    Returns:
+        tuple: (назначенные публичные квесты по пользователю,
+                {user_id: (назначено, выполнено, сумма сложностей выполненных)})
+    """
+    assigned = defaultdict(set)
+    rows = QuestAssignment.objects.filter(user_id__in=user_ids, quest__is_public=True).values_list(
+        'user_id', 'quest_id'
+    ).distinct().order_by()
+    for user_id, quest_id in rows.iterator(chunk_size=10000):
+        assigned[user_id].add(quest_id)
+    totals = QuestAssignment.objects.filter(user_id__in=user_ids).values('user_id').annotate(
+        assigned_count=Count('id'),
+        completed_count=Count('id', filter=Q(is_completed=True)),
+        difficulty_sum=Sum('quest__difficulty', filter=Q(is_completed=True)),
+    ).order_by()
+    history = {
+        row['user_id']: (row['assigned_count'], row['completed_count'], row['difficulty_sum'] or 0)
+        for row in totals
+    }
+    return assigned, history
+
+
+def _co_completion(completed):
+    """Разреженная матрица совместных выполнений и число выполнений каждого квеста"""
+    counts = Counter()
+    pairs = defaultdict(Counter)
+    for quests in completed.values():
+        counts.update(quests)
+        for a, b in combinations(sorted(quests), 2):
+            pairs[a][b] += 1
+            pairs[b][a] += 1
+    return pairs, counts
+
+
+def _cohort_popularity(completed, users):
+    """Число выполнений каждого квеста по группам (group_name) и факультетам"""
+    by_group = defaultdict(Counter)
+    by_faculty = defaultdict(Counter)
+    group_size = Counter()
+    faculty_size = Counter()
+    for user_id, faculty, group_name in users:
+        if group_name:
+            group_size[group_name] += 1
+            by_group[group_name].update(completed.get(user_id, ()))
+        if faculty:
+            faculty_size[faculty] += 1
+            by_faculty[faculty].update(completed.get(user_id, ()))
+    return by_group, by_faculty, group_size, faculty_size
+
+
+def _target_difficulty(stats):
+    assigned_count, completed_count, difficulty_sum = stats
+    if not completed_count:
+        return DEFAULT_DIFFICULTY
+    target = difficulty_sum / completed_count
+    rate = completed_count / assigned_count
+    if rate >= 0.7:
+        target += 0.5
+    elif rate < 0.4:
+        target -= 0.5
+    return min(5, max(1, target))
+
+
+def compute_recommendations(top_n=10, batch_size=1000):
+    """
+    Пересчитывает рекомендации для всех активных студентов.
+
+    Args:
+        top_n: Количество рекомендаций на пользователя
+        batch_size: Размер пачки при записи результатов
+
+    Returns:
+        int: Количество пользователей, для которых сохранены рекомендации
+    """
+    quests = _load_quests()
+    completed = _load_completed(quests.keys())
+    pairs, counts = _co_completion(completed)
+    users = list(User.objects.filter(role='student', is_active=True).values_list('id', 'faculty', 'group_name'))
+    by_group, by_faculty, group_size, faculty_size = _cohort_popularity(completed, users)
+
+    max_count = max(counts.values(), default=0)
+    popular = [quest_id for quest_id, _ in counts.most_common(POPULAR_CANDIDATES)]
+    if len(popular) < POPULAR_CANDIDATES:
+        newest = sorted(quests, reverse=True)[:POPULAR_CANDIDATES]
+        popular.extend(quest_id for quest_id in newest if quest_id not in counts)
+
+    batch = []
+    saved = 0
+    assigned, history = {}, {}
+    for index, (user_id, faculty, group_name) in enumerate(users):
+        if index % batch_size == 0:
+            # История назначений читается пачками пользователей, а не целиком
+            assigned, history = _load_user_history([row[0] for row in users[index:index + batch_size]])
+        done = completed.get(user_id, set())
+        taken = assigned.get(user_id, set())
+        target = _target_difficulty(history.get(user_id, (0, 0, 0)))
+
+        # Кандидаты: соседи выполненных квестов, популярное у однокурсников и в целом
+        co_scores = Counter()
+        for quest_id in done:
+            norm = counts[quest_id]
+            for other_id, together in pairs.get(quest_id, {}).items():
+                co_scores[other_id] += together / math.sqrt(norm * counts[other_id])
+        group_counts = by_group.get(group_name, Counter())
+        faculty_counts = by_faculty.get(faculty, Counter())
+        candidates = set(co_scores)
+        candidates.update(quest_id for quest_id, _ in group_counts.most_common(COHORT_CANDIDATES))
+        candidates.update(quest_id for quest_id, _ in faculty_counts.most_common(COHORT_CANDIDATES))
+        candidates.update(popular)
+
+        max_co = max(co_scores.values(), default=0) or 1
+        scored = []
+        for quest_id in candidates:
+            if quest_id in taken or quest_id not in quests:
+                continue
+            difficulty, created_by_id = quests[quest_id]
+            if created_by_id == user_id:
+                continue
+            cohort = 0.0
+            if group_name and group_size[group_name] > 1:
+                cohort += 0.6 * group_counts[quest_id] / (group_size[group_name] - 1)
+            if faculty and faculty_size[faculty] > 1:
+                cohort += 0.4 * faculty_counts[quest_id] / (faculty_size[faculty] - 1)
+            fit = 1 - abs(difficulty - target) / 4
+            popularity = math.log1p(counts[quest_id]) / math.log1p(max_count) if max_count else 0
+            score = (
+                WEIGHT_CO_COMPLETION * co_scores[quest_id] / max_co
+                + WEIGHT_COHORT * min(cohort, 1.0)
+                + WEIGHT_DIFFICULTY * fit
+                + WEIGHT_POPULARITY * popularity
+            )
+            scored.append((score, quest_id))
+
+        scored.sort(reverse=True)
+        batch.append(QuestRecommendation(
+            user_id=user_id,
+            items=[{'quest': quest_id, 'score': round(score, 4)} for score, quest_id in scored[:top_n]],
+        ))
+        if len(batch) >= batch_size:
+            saved += _save(batch)
+            batch = []
+    saved += _save(batch)
+    return saved
+
+
+def _save(batch):
+    if batch:
+        QuestRecommendation.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['items', 'computed_at'],
+        )
+    return len(batch)
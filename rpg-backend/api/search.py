@@ -0,0 +1,149 @@
+"""
+Полнотекстовый поиск квестов.
+
+PostgreSQL: генерируемая колонка api_quest.search_vector (конфигурация russian,
+веса title > description > goal) и GIN-индекс по ней. Колонка пересчитывается
+самой базой при каждом сохранении квеста.
+
+SQLite (разработка без PostgreSQL): виртуальная таблица FTS5 api_quest_fts,
+которая обновляется сигналами при сохранении и удалении квеста.
+Стемминга для русского языка в FTS5 нет, его заменяет префиксный поиск.
+
+Оба варианта создаются миграцией 0005_quest_search.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, TextField
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+TERM_RE = re.compile(r'[^\W_]+')
+MAX_TERMS = 8
+SEARCH_RESULTS_LIMIT = 50
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_STOP = '</mark>'
+SNIPPET_WORDS = 12
+
+
+def is_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def normalize(text):
+    return (text or '').replace('ё', 'е').replace('Ё', 'Е')
+
+
+def parse_terms(query):
+    """Разбивает строку поиска на слова, отбрасывая операторы и спецсимволы"""
+    return TERM_RE.findall(normalize(query).lower())[:MAX_TERMS]
+
+
+def search_quests(queryset, query):
+    """
+    Фильтрует квесты по полнотекстовому запросу.
+
+    Каждое слово ищется по префиксу (поиск по мере набора), все слова
+    должны встретиться в квесте. Результаты упорядочены по релевантности.
+
+    Args:
+        queryset: QuerySet квестов (с уже применёнными правами доступа)
+        query: Строка поиска
+
+    Returns:
+        QuerySet с аннотациями search_rank и search_snippet
+    """
+    terms = parse_terms(query)
+    if not terms:
+        return queryset.none()
+    if is_postgres():
+        return _search_postgres(queryset, terms)
+    return _search_sqlite(queryset, terms)
+
+
+def _search_postgres(queryset, terms):
+    tsquery = ' & '.join(f'{term}:*' for term in terms)
+    headline_options = f'StartSel={HIGHLIGHT_START},StopSel={HIGHLIGHT_STOP},MaxWords={SNIPPET_WORDS * 2},MinWords={SNIPPET_WORDS}'
+    return queryset.annotate(
+        search_match=RawSQL(
+            "api_quest.search_vector @@ to_tsquery('russian', %s)", [tsquery], output_field=BooleanField()
+        ),
+        search_rank=RawSQL(
+            "ts_rank_cd(api_quest.search_vector, to_tsquery('russian', %s))", [tsquery], output_field=FloatField()
+        ),
+        search_snippet=RawSQL(
+            "ts_headline('russian', concat_ws(' — ', api_quest.title, nullif(api_quest.description, '')), "
+            "to_tsquery('russian', %s), %s)",
+            [tsquery, headline_options],
+            output_field=TextField(),
+        ),
+    ).filter(search_match=True).order_by('-search_rank', '-id')
+
+
+def _search_sqlite(queryset, terms):
+    match = ' '.join(f'"{term}"*' for term in terms)
+    return queryset.filter(
+        id__in=RawSQL("SELECT rowid FROM api_quest_fts WHERE api_quest_fts MATCH %s", [match])
+    ).annotate(
+        search_rank=RawSQL(
+            "SELECT -bm25(api_quest_fts, 10.0, 4.0, 1.0) FROM api_quest_fts "
+            "WHERE api_quest_fts MATCH %s AND api_quest_fts.rowid = api_quest.id",
+            [match],
+            output_field=FloatField(),
+        ),
+        search_snippet=RawSQL(
+            "SELECT snippet(api_quest_fts, -1, %s, %s, '…', %s) FROM api_quest_fts "
+            "WHERE api_quest_fts MATCH %s AND api_quest_fts.rowid = api_quest.id",
+            [HIGHLIGHT_START, HIGHLIGHT_STOP, SNIPPET_WORDS, match],
+            output_field=TextField(),
+        ),
+    ).order_by('-search_rank', '-id')
+
+
+def index_quest(quest):
+    """Обновляет запись квеста в индексе FTS5 (в PostgreSQL индекс обновляет база)"""
+    if is_postgres():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM api_quest_fts WHERE rowid = %s", [quest.pk])
+        cursor.execute(
+            "INSERT INTO api_quest_fts (rowid, title, description, goal) VALUES (%s, %s, %s, %s)",
+            [quest.pk, normalize(quest.title), normalize(quest.description), normalize(quest.goal)],
+        )
+
+
+def unindex_quest(quest_id):
+    if is_postgres():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM api_quest_fts WHERE rowid = %s", [quest_id])
+
+
+def rebuild_index():
+    """Полностью перестраивает индекс FTS5 (например, после Quest.objects.update())"""
+    if is_postgres():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM api_quest_fts")
+        cursor.execute(
+            "INSERT INTO api_quest_fts (rowid, title, description, goal) "
+            "SELECT id, replace(replace(title, 'ё', 'е'), 'Ё', 'Е'), "
+            "replace(replace(description, 'ё', 'е'), 'Ё', 'Е'), "
+            "replace(replace(goal, 'ё', 'е'), 'Ё', 'Е') FROM api_quest"
+        )
+
+
+class QuestSearchFilter(filters.BaseFilterBackend):
+    """
+    Полнотекстовый поиск по параметру ?search= с ранжированием.
+
+    Применяется только к списку; в выдаче не больше SEARCH_RESULTS_LIMIT
+    самых релевантных квестов.
+    """
+    search_param = 'search'
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query or getattr(view, 'action', None) != 'list':
+            return queryset
+        return search_quests(queryset, query)[:SEARCH_RESULTS_LIMIT]
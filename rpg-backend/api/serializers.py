@@ -1,12 +1,14 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from .models import (
     User, Profile, Course, Group, Quest, QuestAssignment, Achievement,
     AchievementProgress, Item, StoreItem, InventoryItem, EquippedItem,
     CurrencyTransaction, LeaderboardEntry, Notification, ActivityLog,
     FriendRequest, Message, QuestComment, QuestLike, GroupPost,
-    GroupPostComment, GroupGoal
+    GroupPostComment, GroupGoal, GroupStats, CourseStats, ActiveEffect
 )
-from .utils import filter_profanity
+from .utils import filter_profanity, get_time_zone
+from .activity_log import LOGIN, log_activity
 
 
 class ProfileSerializer(serializers.ModelSerializer):
@@ -26,6 +28,19 @@ class UserSerializer(serializers.ModelSerializer):
         exclude = ('password',)
         read_only_fields = ('xp', 'coins', 'level', 'streak')
 
+    def validate_time_zone(self, value):
+        if value and get_time_zone(value) is None:
+            raise serializers.ValidationError('Неизвестный часовой пояс')
+        return value
+
+
+class LoginSerializer(TokenObtainPairSerializer):
+    """Выдача JWT с записью входа в журнал действий"""
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        log_activity(self.user, LOGIN, method='jwt')
+        return data
+
 
 class UserCreateSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
@@ -82,7 +97,11 @@ class GroupSerializer(serializers.ModelSerializer):
 
 class QuestSerializer(serializers.ModelSerializer):
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
-    comments_count = serializers.IntegerField(source='comments.count', read_only=True)
+    # Заполняется аннотацией Count('comments') во вьюсете (у нового квеста — 0)
+    comments_count = serializers.IntegerField(read_only=True, default=0)
+    # Присутствуют только в результатах полнотекстового поиска
+    search_rank = serializers.FloatField(read_only=True)
+    search_snippet = serializers.CharField(read_only=True)
     
     class Meta:
         model = Quest
@@ -102,19 +121,19 @@ class QuestSerializer(serializers.ModelSerializer):
 class QuestAssignmentSerializer(serializers.ModelSerializer):
     quest_title = serializers.CharField(source='quest.title', read_only=True)
     quest_description = serializers.CharField(source='quest.description', read_only=True)
-    likes_count = serializers.IntegerField(source='likes.count', read_only=True)
-    is_liked = serializers.SerializerMethodField()
+    # Заполняются аннотациями из annotate_assignments()
+    likes_count = serializers.IntegerField(read_only=True, default=0)
+    is_liked = serializers.BooleanField(read_only=True, default=False)
     
     class Meta:
         model = QuestAssignment
         fields = '__all__'
-        read_only_fields = ('user', 'xp_reward', 'coin_reward', 'created_at', 'completed_at')
-    
-    def get_is_liked(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            return QuestLike.objects.filter(quest_assignment=obj, user=request.user).exists()
-        return False
+        read_only_fields = ('user', 'xp_reward', 'coin_reward', 'created_at', 'completed_at', 'is_overdue', 'reminded_at')
+
+
+class ExploreAssignmentSerializer(QuestAssignmentSerializer):
+    """Выполненный квест в ленте «Обзор»"""
+    user_username = serializers.CharField(source='user.username', read_only=True)
 
 
 class AchievementSerializer(serializers.ModelSerializer):
@@ -150,6 +169,24 @@ class StoreItemSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class StoreCatalogItemSerializer(StoreItemSerializer):
+    """Товар магазина с данными о текущем пользователе (аннотации catalog_queryset)"""
+    owned_quantity = serializers.IntegerField(read_only=True)
+    is_equipped = serializers.BooleanField(read_only=True)
+    purchased_quantity = serializers.IntegerField(read_only=True)
+    remaining_allowance = serializers.IntegerField(read_only=True, allow_null=True)
+    can_afford = serializers.BooleanField(read_only=True)
+
+
+class ActiveEffectSerializer(serializers.ModelSerializer):
+    item_name = serializers.CharField(source='item.name', read_only=True, default=None)
+
+    class Meta:
+        model = ActiveEffect
+        fields = ('id', 'item', 'item_name', 'kind', 'value', 'activated_at', 'expires_at')
+        read_only_fields = fields
+
+
 class InventoryItemSerializer(serializers.ModelSerializer):
     item = ItemSerializer(read_only=True)
     
@@ -172,7 +209,7 @@ class CurrencyTransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = CurrencyTransaction
         fields = '__all__'
-        read_only_fields = ('user', 'created_at')
+        read_only_fields = ('user', 'balance', 'created_at')
 
 
 class LeaderboardEntrySerializer(serializers.ModelSerializer):
@@ -248,7 +285,8 @@ class QuestLikeSerializer(serializers.ModelSerializer):
 
 class GroupPostSerializer(serializers.ModelSerializer):
     author_username = serializers.CharField(source='author.username', read_only=True)
-    comments_count = serializers.IntegerField(source='comments.count', read_only=True)
+    # Заполняется аннотацией Count('comments') во вьюсете (у нового поста — 0)
+    comments_count = serializers.IntegerField(read_only=True, default=0)
     
     class Meta:
         model = GroupPost
@@ -271,6 +309,11 @@ class GroupPostCommentSerializer(serializers.ModelSerializer):
         return filter_profanity(value)
 
 
+class GroupFeedPostSerializer(GroupPostSerializer):
+    """Пост ленты группы с превью последних комментариев (новые сначала)."""
+    latest_comments = GroupPostCommentSerializer(many=True, read_only=True)
+
+
 class GroupGoalSerializer(serializers.ModelSerializer):
     class Meta:
         model = GroupGoal
@@ -281,4 +324,30 @@ class GroupGoalSerializer(serializers.ModelSerializer):
         return filter_profanity(value)
     
     def validate_description(self, value):
-        return filter_profanity(value) if value else value
\ No newline at end of file
+        return filter_profanity(value) if value else value
+
+
+class WeeklyStatsMixin:
+    def get_week_xp(self, obj):
+        # Строка могла не обновляться с прошлой недели
+        from .aggregates import current_week_start
+        return obj.week_xp if obj.week_start == current_week_start() else 0
+
+
+class GroupStatsSerializer(WeeklyStatsMixin, serializers.ModelSerializer):
+    group_name = serializers.CharField(source='group.name', read_only=True)
+    week_xp = serializers.SerializerMethodField()
+
+    class Meta:
+        model = GroupStats
+        fields = ['group', 'group_name', 'course', 'member_count', 'total_xp', 'week_xp', 'quests_completed', 'updated_at']
+
+
+class CourseStatsSerializer(WeeklyStatsMixin, serializers.ModelSerializer):
+    course_code = serializers.CharField(source='course.code', read_only=True)
+    course_title = serializers.CharField(source='course.title', read_only=True)
+    week_xp = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CourseStats
+        fields = ['course', 'course_code', 'course_title', 'member_count', 'total_xp', 'week_xp', 'quests_completed', 'updated_at']
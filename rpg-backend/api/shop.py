@@ -0,0 +1,442 @@
+"""
+Покупки в магазине.
+
+Склад, баланс и лимит покупок меняются условными UPDATE
+(stock = stock - q WHERE stock >= q и т.д.) в одной транзакции, поэтому
+параллельные покупки не могут продать больше остатка или потратить монеты
+дважды. Если условие не выполнилось, транзакция откатывается целиком.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import BooleanField, Case, Exists, ExpressionWrapper, F, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .activity_log import ITEM_PURCHASED, log_activity
+from .catalog import bump_catalog_version_on_commit
+from .ledger import COINS, record, record_many
+from .models import (
+    EquippedItem, FlashSaleRequest, FlashSaleSlot, InventoryItem, Notification, PurchaseCounter,
+    StoreItem, User,
+)
+
+
+class PurchaseError(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'Покупка невозможна'
+    default_code = 'purchase_error'
+
+
+def parse_quantity(value):
+    """Проверяет количество из запроса"""
+    try:
+        quantity = int(value)
+    except (TypeError, ValueError):
+        raise PurchaseError('Количество должно быть числом')
+    if quantity < 1:
+        raise PurchaseError('Количество должно быть положительным')
+    return quantity
+
+
+def _charge(user, store_item, quantity):
+    """
+    Списывает монеты, учитывает лимит покупок и выдаёт предмет.
+
+    Вызывается внутри транзакции; склад здесь не трогается.
+
+    Returns:
+        InventoryItem: Запись инвентаря (quantity обновлён F-выражением)
+    """
+    total_cost = store_item.price * quantity
+    item = store_item.item
+
+    counter, _ = PurchaseCounter.objects.get_or_create(user=user, store_item=store_item)
+    counters = PurchaseCounter.objects.filter(pk=counter.pk)
+    if store_item.purchase_limit:
+        counters = counters.filter(quantity__lte=store_item.purchase_limit - quantity)
+    if not counters.update(quantity=F('quantity') + quantity):
+        raise PurchaseError('Достигнут лимит покупок этого предмета')
+
+    if not User.objects.filter(pk=user.pk, coins__gte=total_cost).update(coins=F('coins') - total_cost):
+        raise PurchaseError('Недостаточно монет')
+
+    inventory_item, created = InventoryItem.objects.get_or_create(
+        user=user,
+        item=item,
+        defaults={'quantity': quantity}
+    )
+    if not created:
+        InventoryItem.objects.filter(pk=inventory_item.pk).update(quantity=F('quantity') + quantity)
+
+    record(
+        user,
+        COINS,
+        -total_cost,
+        f"Покупка: {item.name} x{quantity}",
+        {"store_item_id": store_item.id, "item_id": item.id, "quantity": quantity}
+    )
+    Notification.objects.create(
+        user=user,
+        title="Покупка выполнена",
+        body=f"Вы купили {item.name} x{quantity} за {total_cost} монет",
+        data={"store_item_id": store_item.id, "item_id": item.id, "type": "item_purchased"}
+    )
+    log_activity(
+        user, ITEM_PURCHASED,
+        store_item_id=store_item.id, item_id=item.id, item_name=item.name, quantity=quantity, price=total_cost,
+    )
+    return inventory_item
+
+
+def purchase_store_item(user, store_item, quantity):
+    """
+    Покупает товар магазина.
+
+    Горячая строка StoreItem обновляется последней, чтобы блокировка
+    склада держалась как можно меньше. store_item может быть копией из
+    кэша каталога: его stock используется только для быстрого отказа,
+    окончательно остаток проверяет условный UPDATE.
+
+    Args:
+        user: Покупатель
+        store_item: Товар магазина
+        quantity: Количество
+
+    Returns:
+        InventoryItem: Обновлённая запись инвентаря
+
+    Raises:
+        PurchaseError: Товар недоступен, закончился, достигнут лимит
+            или не хватает монет
+    """
+    if not store_item.is_active:
+        raise PurchaseError('Предмет недоступен для покупки')
+    if store_item.stock is not None and store_item.stock < quantity:
+        raise PurchaseError('Недостаточно товара на складе')
+
+    with transaction.atomic():
+        inventory_item = _charge(user, store_item, quantity)
+        if store_item.stock is not None:
+            if not StoreItem.objects.filter(pk=store_item.pk, is_active=True, stock__gte=quantity).update(
+                stock=F('stock') - quantity
+            ):
+                raise PurchaseError('Недостаточно товара на складе')
+
+    user.refresh_from_db(fields=['coins'])
+    inventory_item.refresh_from_db()
+    return inventory_item
+
+
+def catalog_queryset(user):
+    """
+    Активные товары магазина с персональными полями для пользователя.
+
+    Всё считается коррелированными подзапросами в одном SELECT:
+    owned_quantity, is_equipped, purchased_quantity, remaining_allowance
+    (None — без лимита) и can_afford.
+    """
+    purchased = Coalesce(
+        Subquery(
+            PurchaseCounter.objects.filter(user=user, store_item=OuterRef('pk')).values('quantity')[:1],
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+    return StoreItem.objects.filter(is_active=True).select_related('item').annotate(
+        owned_quantity=Coalesce(
+            Subquery(
+                InventoryItem.objects.filter(user=user, item=OuterRef('item')).values('quantity')[:1],
+                output_field=IntegerField(),
+            ),
+            Value(0),
+        ),
+        is_equipped=Exists(EquippedItem.objects.filter(user=user, item=OuterRef('item'))),
+        purchased_quantity=purchased,
+        remaining_allowance=Case(
+            When(purchase_limit__isnull=True, then=Value(None)),
+            default=Greatest(F('purchase_limit') - purchased, Value(0)),
+            output_field=IntegerField(),
+        ),
+        can_afford=ExpressionWrapper(Q(price__lte=user.coins), output_field=BooleanField()),
+    ).order_by('price', 'id')
+
+
+MAX_CART_LINES = 50
+
+
+def parse_cart(lines):
+    """
+    Проверяет корзину из запроса и объединяет повторяющиеся позиции.
+
+    Returns:
+        dict: store_item_id -> quantity
+    """
+    if not isinstance(lines, list) or not lines:
+        raise PurchaseError('Корзина пуста')
+    if len(lines) > MAX_CART_LINES:
+        raise PurchaseError(f'В корзине не может быть больше {MAX_CART_LINES} позиций')
+    cart = {}
+    for line in lines:
+        if not isinstance(line, dict):
+            raise PurchaseError('Неверный формат корзины')
+        try:
+            store_item_id = int(line.get('store_item'))
+        except (TypeError, ValueError):
+            raise PurchaseError('Неверный идентификатор товара')
+        cart[store_item_id] = cart.get(store_item_id, 0) + parse_quantity(line.get('quantity', 1))
+    return cart
+
+
+def checkout(user, cart):
+    """
+    Покупает несколько товаров в одной транзакции.
+
+    Проверки и изменения выполняются набором запросов на всю корзину:
+    товары и счётчики покупок читаются одним запросом каждый, баланс
+    списывается одним условным UPDATE, склад и счётчики блокируются
+    (в порядке id) и обновляются bulk_update, инвентарь и журнал
+    пишутся bulk_create. Пользователь получает одно итоговое уведомление.
+
+    Args:
+        user: Покупатель
+        cart: dict store_item_id -> quantity (см. parse_cart)
+
+    Returns:
+        tuple: (список InventoryItem, итоговая стоимость)
+
+    Raises:
+        PurchaseError: Любая позиция не может быть куплена — корзина
+            не покупается целиком
+    """
+    store_items = {
+        store_item.id: store_item
+        for store_item in StoreItem.objects.select_related('item').filter(id__in=cart, is_active=True)
+    }
+    missing = set(cart) - set(store_items)
+    if missing:
+        raise PurchaseError(f'Товары недоступны для покупки: {", ".join(map(str, sorted(missing)))}')
+    if any(store_item.is_flash_sale for store_item in store_items.values()):
+        raise PurchaseError('Товары распродажи покупаются по одному')
+    total_cost = sum(store_items[store_item_id].price * quantity for store_item_id, quantity in cart.items())
+
+    with transaction.atomic():
+        # Счётчики покупок (строки только этого пользователя)
+        PurchaseCounter.objects.bulk_create(
+            [PurchaseCounter(user=user, store_item_id=store_item_id) for store_item_id in cart],
+            ignore_conflicts=True,
+        )
+        counters = list(PurchaseCounter.objects.select_for_update().filter(user=user, store_item_id__in=cart))
+        for counter in counters:
+            store_item = store_items[counter.store_item_id]
+            counter.quantity += cart[counter.store_item_id]
+            if store_item.purchase_limit and counter.quantity > store_item.purchase_limit:
+                raise PurchaseError(f'Достигнут лимит покупок предмета {store_item.item.name}')
+        PurchaseCounter.objects.bulk_update(counters, ['quantity'])
+
+        if not User.objects.filter(pk=user.pk, coins__gte=total_cost).update(coins=F('coins') - total_cost):
+            raise PurchaseError('Недостаточно монет')
+
+        # Инвентарь: один товар магазина — один предмет, но предмет может продаваться в нескольких записях
+        quantities = Counter()
+        for store_item_id, quantity in cart.items():
+            quantities[store_items[store_item_id].item_id] += quantity
+        existing = {
+            inventory_item.item_id: inventory_item
+            for inventory_item in InventoryItem.objects.select_for_update().filter(user=user, item_id__in=quantities)
+        }
+        for item_id, inventory_item in existing.items():
+            inventory_item.quantity += quantities[item_id]
+        InventoryItem.objects.bulk_update(list(existing.values()), ['quantity'])
+        InventoryItem.objects.bulk_create([
+            InventoryItem(user=user, item_id=item_id, quantity=quantity)
+            for item_id, quantity in quantities.items() if item_id not in existing
+        ])
+
+        record_many(user, COINS, [
+            (
+                -store_items[store_item_id].price * quantity,
+                f"Покупка: {store_items[store_item_id].item.name} x{quantity}",
+                {"store_item_id": store_item_id, "item_id": store_items[store_item_id].item_id, "quantity": quantity},
+            )
+            for store_item_id, quantity in cart.items()
+        ])
+        names = ', '.join(f"{store_items[store_item_id].item.name} x{quantity}" for store_item_id, quantity in cart.items())
+        Notification.objects.create(
+            user=user,
+            title="Покупка выполнена",
+            body=f"Вы купили {names} за {total_cost} монет",
+            data={"store_item_ids": list(cart), "type": "cart_purchased"}
+        )
+        for store_item_id, quantity in cart.items():
+            store_item = store_items[store_item_id]
+            log_activity(
+                user, ITEM_PURCHASED,
+                store_item_id=store_item_id, item_id=store_item.item_id, item_name=store_item.item.name,
+                quantity=quantity, price=store_item.price * quantity,
+            )
+
+        # Склад — последним, в порядке id, чтобы параллельные корзины не взаимоблокировались
+        limited = [store_item_id for store_item_id in sorted(cart) if store_items[store_item_id].stock is not None]
+        if limited:
+            locked = list(StoreItem.objects.select_for_update().filter(id__in=limited).order_by('id'))
+            for store_item in locked:
+                if store_item.stock < cart[store_item.id]:
+                    raise PurchaseError(f'Недостаточно товара на складе: {store_items[store_item.id].item.name}')
+                store_item.stock -= cart[store_item.id]
+            StoreItem.objects.bulk_update(locked, ['stock'])
+
+    user.refresh_from_db(fields=['coins'])
+    inventory = list(InventoryItem.objects.select_related('item').filter(user=user, item_id__in=quantities))
+    return inventory, total_cost
+
+
+# Распродажи
+#
+# При старте распродажи остаток товара раскладывается на FlashSaleSlot —
+# по строке на единицу. Покупатель занимает свободный слот через
+# SELECT ... FOR UPDATE SKIP LOCKED, поэтому параллельные покупатели блокируют
+# разные строки и не ждут друг друга на строке StoreItem. Заявки, которым
+# свободный слот временно не достался (все заняты незавершёнными
+# транзакциями), ставятся в очередь и обрабатываются process_flash_queue
+# по порядку поступления; пока очередь не пуста, новые заявки встают в неё,
+# а не занимают освободившиеся слоты.
+
+RESERVED = 'reserved'
+QUEUED = 'queued'
+SOLD_OUT = 'sold_out'
+
+
+def start_flash_sale(store_item):
+    """
+    Переводит товар в режим распродажи, раскладывая склад на слоты.
+
+    Строка товара блокируется, а склад читается заново: повторный старт
+    идущей распродажи отклоняется, иначе свободные слоты создались бы
+    ещё раз поверх уже занятых.
+    """
+    with transaction.atomic():
+        current = StoreItem.objects.select_for_update().get(pk=store_item.pk)
+        if current.is_flash_sale:
+            raise PurchaseError('Распродажа уже идёт')
+        if current.stock is None:
+            raise PurchaseError('Распродажа возможна только для товара с ограниченным складом')
+        # Свободных слотов вне распродажи быть не должно (stop_flash_sale их удаляет) — учитываем на всякий случай
+        free = FlashSaleSlot.objects.filter(store_item=store_item, user__isnull=True).count()
+        FlashSaleSlot.objects.bulk_create(
+            [FlashSaleSlot(store_item=store_item) for _ in range(max(0, current.stock - free))],
+            batch_size=1000,
+        )
+        StoreItem.objects.filter(pk=store_item.pk).update(is_flash_sale=True)
+        bump_catalog_version_on_commit()
+    store_item.is_flash_sale = True
+    store_item.stock = current.stock
+
+
+def stop_flash_sale(store_item):
+    """
+    Завершает распродажу: нераспроданные слоты возвращаются на склад.
+
+    Строка товара блокируется, как и при синхронизации склада в
+    process_flash_queue, чтобы обработчик очереди не перезаписал
+    возвращённый склад устаревшим значением.
+    """
+    with transaction.atomic():
+        StoreItem.objects.select_for_update().filter(pk=store_item.pk).values_list('pk', flat=True).first()
+        remaining = FlashSaleSlot.objects.filter(store_item=store_item, user__isnull=True).delete()[0]
+        StoreItem.objects.filter(pk=store_item.pk).update(is_flash_sale=False, stock=remaining)
+        bump_catalog_version_on_commit()
+        FlashSaleRequest.objects.filter(store_item=store_item, status=QUEUED).update(
+            status=SOLD_OUT, processed_at=timezone.now()
+        )
+    store_item.is_flash_sale = False
+    store_item.stock = remaining
+    return remaining
+
+
+def _claim_slot(user, store_item):
+    """
+    Занимает свободный слот и оплачивает его.
+
+    Returns:
+        InventoryItem или None, если свободный слот не удалось взять
+    """
+    with transaction.atomic():
+        while True:
+            slot = FlashSaleSlot.objects.select_for_update(skip_locked=True).filter(
+                store_item=store_item, user__isnull=True
+            ).order_by('id').first()
+            if slot is None:
+                return None
+            # Условие user IS NULL — на случай СУБД без SKIP LOCKED (SQLite): слот мог занять другой покупатель
+            if FlashSaleSlot.objects.filter(pk=slot.pk, user__isnull=True).update(user=user, claimed_at=timezone.now()) == 1:
+                return _charge(user, store_item, 1)
+
+
+def reserve_flash_item(user, store_item):
+    """
+    Обрабатывает заявку на товар распродажи (одна единица на заявку).
+
+    Returns:
+        tuple: (статус reserved/queued/sold_out, InventoryItem или FlashSaleRequest или None)
+
+    Raises:
+        PurchaseError: Достигнут лимит покупок или не хватает монет
+    """
+    if not store_item.is_active:
+        raise PurchaseError('Предмет недоступен для покупки')
+    # Пока очередь не пуста, освободившиеся слоты принадлежат ей — новая заявка встаёт в конец
+    if not FlashSaleRequest.objects.filter(store_item=store_item, status=QUEUED).exists():
+        inventory_item = _claim_slot(user, store_item)
+        if inventory_item is not None:
+            user.refresh_from_db(fields=['coins'])
+            inventory_item.refresh_from_db()
+            return RESERVED, inventory_item
+    # Свободные слоты есть, но заняты незавершёнными покупками или очередью — ждём в очереди
+    if FlashSaleSlot.objects.filter(store_item=store_item, user__isnull=True).exists():
+        request = FlashSaleRequest.objects.create(store_item=store_item, user=user)
+        return QUEUED, request
+    return SOLD_OUT, None
+
+
+def process_flash_queue(store_item, limit=None):
+    """
+    Раздаёт освободившиеся слоты заявкам из очереди в порядке поступления
+    и синхронизирует StoreItem.stock с количеством свободных слотов.
+
+    Returns:
+        Counter: количество обработанных заявок по итоговому статусу
+    """
+    processed = Counter()
+    queued = FlashSaleRequest.objects.filter(store_item=store_item, status=QUEUED).select_related('user').order_by('created_at', 'id')
+    if limit:
+        queued = queued[:limit]
+    for request in queued:
+        status, detail = SOLD_OUT, ''
+        try:
+            if _claim_slot(request.user, store_item) is not None:
+                status = RESERVED
+        except PurchaseError as exc:
+            status, detail = 'failed', str(exc.detail)
+        if status == SOLD_OUT and FlashSaleSlot.objects.filter(store_item=store_item, user__isnull=True).exists():
+            # Слоты ещё заняты чужими транзакциями — заявка остаётся в очереди
+            break
+        FlashSaleRequest.objects.filter(pk=request.pk).update(status=status, detail=detail, processed_at=timezone.now())
+        if status == RESERVED:
+            Notification.objects.create(
+                user=request.user,
+                title="Заявка на распродаже одобрена",
+                body=f"Вам достался предмет {store_item.item.name}",
+                data={"store_item_id": store_item.id, "type": "flash_sale_reserved"}
+            )
+        processed[status] += 1
+
+    with transaction.atomic():
+        # Под блокировкой строки и только для идущей распродажи: после stop_flash_sale склад уже возвращён
+        active = StoreItem.objects.select_for_update().filter(pk=store_item.pk, is_flash_sale=True).values_list('pk', flat=True).first()
+        if active is not None:
+            free = FlashSaleSlot.objects.filter(store_item=store_item, user__isnull=True).count()
+            StoreItem.objects.filter(pk=store_item.pk).update(stock=free)
+    return processed
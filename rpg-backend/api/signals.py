@@ -1,11 +1,115 @@
-from django.db.models.signals import post_save
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
 from django.conf import settings
-from .models import Profile, LeaderboardEntry
+from .models import (
+    Profile, LeaderboardEntry, Group, Course, GroupStats, CourseStats, Quest, Item, StoreItem, QuestLike, FriendRequest,
+)
+from .aggregates import apply_membership_change
+from .search import index_quest, unindex_quest
+from .catalog import bump_catalog_version_on_commit
+from .activity_log import LOGIN, log_activity
+from .explore import refresh_hot_score_on_commit
+from .timeline import invalidate_friends_on_commit
 
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_profile_and_leaderboard(sender, instance, created, **kwargs):
     if created:
         Profile.objects.create(user=instance)
-        LeaderboardEntry.objects.create(user=instance)
\ No newline at end of file
+        LeaderboardEntry.objects.create(user=instance)
+
+
+@receiver(user_logged_in)
+def log_session_login(sender, request, user, **kwargs):
+    # Вход через сессию (админка); вход по JWT записывает LoginSerializer
+    log_activity(user, LOGIN, method='session')
+
+
+@receiver(post_save, sender=Quest)
+def update_quest_search_index(sender, instance, **kwargs):
+    index_quest(instance)
+
+
+@receiver(post_delete, sender=Quest)
+def remove_quest_from_search_index(sender, instance, **kwargs):
+    unindex_quest(instance.pk)
+
+
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+@receiver(post_save, sender=StoreItem)
+@receiver(post_delete, sender=StoreItem)
+def invalidate_catalog(sender, instance, **kwargs):
+    bump_catalog_version_on_commit()
+
+
+@receiver(post_save, sender=QuestLike)
+@receiver(post_delete, sender=QuestLike)
+def update_hot_score(sender, instance, **kwargs):
+    refresh_hot_score_on_commit(instance.quest_assignment_id)
+
+
+@receiver(post_save, sender=FriendRequest)
+@receiver(post_delete, sender=FriendRequest)
+def invalidate_friend_ids(sender, instance, **kwargs):
+    invalidate_friends_on_commit(instance.from_user_id, instance.to_user_id)
+
+
+@receiver(post_save, sender=Group)
+def create_group_stats(sender, instance, created, **kwargs):
+    if created:
+        GroupStats.objects.create(group=instance, course_id=instance.course_id)
+    else:
+        # Смена курса группы требует пересчёта курсов: rebuild_group_stats
+        GroupStats.objects.filter(group=instance).exclude(course_id=instance.course_id).update(course_id=instance.course_id)
+
+
+@receiver(post_save, sender=Course)
+def create_course_stats(sender, instance, created, **kwargs):
+    if created:
+        CourseStats.objects.create(course=instance)
+
+
+@receiver(m2m_changed, sender=Group.members.through)
+def update_group_stats_on_membership(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Поддерживает GroupStats/CourseStats при изменении состава групп.
+
+    Все пары (группа, пользователь) операции учитываются одним вызовом,
+    чтобы курс с несколькими затронутыми группами изменился один раз.
+    """
+    if action == 'pre_clear':
+        if reverse:
+            group_ids = instance.user_groups.values_list('id', flat=True)
+            instance._cleared_memberships = [(group_id, instance.pk) for group_id in group_ids]
+        else:
+            user_ids = instance.members.values_list('id', flat=True)
+            instance._cleared_memberships = [(instance.pk, user_id) for user_id in user_ids]
+        return
+    if action == 'post_clear':
+        apply_membership_change(getattr(instance, '_cleared_memberships', []), -1)
+        return
+    if action not in ('post_add', 'post_remove') or not pk_set:
+        return
+
+    sign = 1 if action == 'post_add' else -1
+    if reverse:
+        apply_membership_change([(group_id, instance.pk) for group_id in pk_set], sign)
+    else:
+        apply_membership_change([(instance.pk, user_id) for user_id in pk_set], sign)
+
+
+@receiver(pre_delete, sender=settings.AUTH_USER_MODEL)
+def update_group_stats_on_user_delete(sender, instance, **kwargs):
+    # Каскадное удаление членств не вызывает m2m_changed
+    apply_membership_change(
+        [(group_id, instance.pk) for group_id in instance.user_groups.values_list('id', flat=True)], -1
+    )
+
+
+@receiver(pre_delete, sender=Group)
+def update_course_stats_on_group_delete(sender, instance, **kwargs):
+    apply_membership_change(
+        [(instance.pk, user_id) for user_id in instance.members.values_list('id', flat=True)], -1
+    )
@@ -0,0 +1,161 @@
+import threading
+from datetime import timedelta
+
+from django.db import OperationalError, connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from api.activity_log import flush_activity_log
+from api.aggregates import rebuild_stats
+from api.ledger import (
+    COINS, add_months, archive_ledger, balance_at, balance_before_expr, month_start, month_start_datetime, record,
+)
+from api.models import (
+    Course, CourseStats, CurrencyTransaction, Group, GroupStats, InventoryItem, Item, LedgerAccount, StoreItem, User,
+)
+from api.shop import PurchaseError, purchase_store_item
+from api.utils import add_xp_to_user
+
+
+class ConcurrentPurchaseTests(TransactionTestCase):
+    """Параллельные покупки товара с ограниченным складом"""
+    buyers = 8
+    stock = 3
+    price = 10
+    initial_coins = 100
+
+    def setUp(self):
+        item = Item.objects.create(sku='limited-badge', name='Лимитированный значок')
+        self.store_item = StoreItem.objects.create(item=item, price=self.price, stock=self.stock)
+        self.users = [
+            User.objects.create_user(username=f'buyer{number}', password='password123')
+            for number in range(self.buyers)
+        ]
+        User.objects.filter(pk__in=[user.pk for user in self.users]).update(coins=self.initial_coins)
+
+    def tearDown(self):
+        flush_activity_log()
+
+    def buy(self, user, barrier, results):
+        try:
+            barrier.wait()
+            while True:
+                try:
+                    purchase_store_item(User.objects.get(pk=user.pk), StoreItem.objects.get(pk=self.store_item.pk), 1)
+                    results.append('ok')
+                    return
+                except PurchaseError:
+                    results.append('rejected')
+                    return
+                except OperationalError:
+                    # SQLite не ждёт повышения блокировки до записи и сразу отвечает
+                    # «database is locked» — повторяем покупку (в PostgreSQL не возникает)
+                    continue
+        finally:
+            connection.close()
+
+    def test_limited_stock_is_not_oversold(self):
+        barrier = threading.Barrier(self.buyers)
+        results = []
+        threads = [threading.Thread(target=self.buy, args=(user, barrier, results)) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count('ok'), self.stock)
+        self.assertEqual(results.count('rejected'), self.buyers - self.stock)
+        self.store_item.refresh_from_db()
+        self.assertEqual(self.store_item.stock, 0)
+        self.assertEqual(InventoryItem.objects.filter(item=self.store_item.item).count(), self.stock)
+
+        for user in self.users:
+            user.refresh_from_db()
+            spent = CurrencyTransaction.objects.filter(user=user, currency=COINS).aggregate(total=Sum('delta'))['total'] or 0
+            self.assertEqual(user.coins, self.initial_coins + spent)
+            account = LedgerAccount.objects.filter(user=user, currency=COINS).values_list('balance', flat=True).first()
+            self.assertEqual(account or 0, spent)
+        self.assertEqual(
+            sum(user.coins for user in self.users),
+            self.buyers * self.initial_coins - self.stock * self.price,
+        )
+
+
+class MembershipStatsTests(TestCase):
+    """Инкрементальная статистика групп и курсов совпадает с полным пересчётом"""
+
+    def setUp(self):
+        self.course = Course.objects.create(title='Курс', code='C-1')
+        self.first = Group.objects.create(name='Первая', course=self.course)
+        self.second = Group.objects.create(name='Вторая', course=self.course)
+        self.user = User.objects.create_user(username='member', password='password123')
+        self.other = User.objects.create_user(username='other', password='password123')
+        add_xp_to_user(self.user, 150, 'Тест', boost=False)
+        add_xp_to_user(self.other, 40, 'Тест', boost=False)
+
+    def snapshot(self):
+        return (
+            sorted(GroupStats.objects.values_list('group_id', 'member_count', 'total_xp', 'week_xp', 'quests_completed')),
+            sorted(CourseStats.objects.values_list('course_id', 'member_count', 'total_xp', 'week_xp', 'quests_completed')),
+        )
+
+    def assertMatchesRebuild(self):
+        incremental = self.snapshot()
+        rebuild_stats()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_reverse_add_of_several_course_groups(self):
+        self.user.user_groups.add(self.first, self.second)
+        course = CourseStats.objects.get(course=self.course)
+        self.assertEqual(course.member_count, 1)
+        self.assertEqual(course.total_xp, 150)
+        self.assertMatchesRebuild()
+
+    def test_reverse_clear_of_several_course_groups(self):
+        self.first.members.add(self.user, self.other)
+        self.second.members.add(self.user)
+        self.user.user_groups.clear()
+        course = CourseStats.objects.get(course=self.course)
+        self.assertEqual(course.member_count, 1)
+        self.assertEqual(course.total_xp, 40)
+        self.assertMatchesRebuild()
+
+    def test_reverse_remove_keeps_course_membership(self):
+        self.user.user_groups.add(self.first, self.second)
+        self.user.user_groups.remove(self.first)
+        self.assertEqual(CourseStats.objects.get(course=self.course).member_count, 1)
+        self.assertMatchesRebuild()
+
+    def test_user_delete(self):
+        self.user.user_groups.add(self.first, self.second)
+        self.other.user_groups.add(self.second)
+        self.user.delete()
+        course = CourseStats.objects.get(course=self.course)
+        self.assertEqual((course.member_count, course.total_xp), (1, 40))
+        self.assertMatchesRebuild()
+
+
+class ArchivedBalanceTests(TestCase):
+    """Баланс на момент внутри архивированного месяца"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='saver', password='password123')
+        self.month = add_months(month_start(timezone.localdate()), -8)
+        start = month_start_datetime(self.month)
+        for day, delta in ((2, 100), (10, 50), (20, -30)):
+            entry = record(self.user, COINS, delta, 'Тест')
+            CurrencyTransaction.objects.filter(pk=entry.pk).update(created_at=start + timedelta(days=day))
+        self.middle = start + timedelta(days=15)
+        archive_ledger(add_months(month_start(timezone.localdate()), -6))
+
+    def test_balance_at_middle_of_archived_month(self):
+        self.assertFalse(CurrencyTransaction.objects.filter(user=self.user).exists())
+        self.assertEqual(balance_at(self.user.pk, COINS, self.middle), 150)
+        self.assertEqual(balance_at(self.user.pk, COINS, self.middle + timedelta(days=10)), 120)
+
+    def test_balance_before_expr_middle_of_archived_month(self):
+        annotated = User.objects.filter(pk=self.user.pk).annotate(
+            before=balance_before_expr(COINS, self.middle)
+        ).values_list('before', flat=True).get()
+        self.assertEqual(annotated, 150)
@@ -0,0 +1,132 @@
+"""
+Лента друзей: выполненные квесты, покупки и достижения принятых друзей.
+
+Лента собирается при чтении (fan-out-on-read) из журнала действий.
+Для каждого друга берётся не больше limit + 1 событий старше курсора —
+это диапазон частичного индекса activitylog_timeline_idx, в который
+не попадают входы и другие события вне ленты, — и упорядоченные диапазоны
+сливаются k-путевым слиянием (heapq.merge). Поэтому стоимость страницы
+зависит от размера страницы и числа друзей, а не от объёма журнала.
+Там, где СУБД допускает LIMIT в частях UNION (PostgreSQL), диапазоны
+друзей читаются одним запросом на FRIENDS_PER_QUERY друзей.
+
+Множество id друзей кэшируется на FRIENDS_CACHE_TTL и сбрасывается
+при изменении заявок в друзья.
+"""
+import base64
+import heapq
+from datetime import datetime
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import TIMELINE_VERBS, ActivityLog, FriendRequest, User
+
+FRIENDS_PER_QUERY = 100
+FIELDS = ('id', 'user_id', 'verb', 'data', 'created_at')
+
+
+class TimelineError(APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = 'Неверный курсор ленты'
+    default_code = 'timeline_error'
+
+
+def _friends_key(user_id):
+    return f'friends:{user_id}'
+
+
+def invalidate_friends(*user_ids):
+    cache.delete_many([_friends_key(user_id) for user_id in user_ids])
+
+
+def invalidate_friends_on_commit(*user_ids):
+    # После фиксации: иначе параллельный читатель успеет закэшировать старый список друзей
+    transaction.on_commit(lambda: invalidate_friends(*user_ids))
+
+
+def get_friend_ids(user_id):
+    """Id пользователей, с которыми у user_id принятая заявка в друзья (в любую сторону)"""
+    key = _friends_key(user_id)
+    friend_ids = cache.get(key)
+    if friend_ids is None:
+        friend_ids = set()
+        for from_id, to_id in FriendRequest.objects.filter(
+            Q(from_user_id=user_id) | Q(to_user_id=user_id), status='accepted'
+        ).values_list('from_user_id', 'to_user_id'):
+            friend_ids.add(to_id if from_id == user_id else from_id)
+        cache.set(key, friend_ids, int(settings.FRIENDS_CACHE_TTL.total_seconds()))
+    return friend_ids
+
+
+def encode_cursor(created_at, event_id):
+    return base64.urlsafe_b64encode(f'{created_at.isoformat()}|{event_id}'.encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        created_at, event_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(event_id)
+    except (ValueError, UnicodeError):
+        raise TimelineError()
+
+
+def _friend_range(friend_id, before, size):
+    """Последние size событий друга старше позиции before (created_at, id)"""
+    events = ActivityLog.objects.filter(user_id=friend_id, verb__in=TIMELINE_VERBS)
+    if before is not None:
+        created_at, event_id = before
+        events = events.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=event_id))
+    return events.order_by('-created_at', '-id').values_list(*FIELDS)[:size]
+
+
+def _ranges(friend_ids, before, size):
+    """Упорядоченные (новые первыми) диапазоны событий друзей"""
+    friend_ids = sorted(friend_ids)
+    if not connection.features.supports_slicing_ordering_in_compound:
+        return [list(_friend_range(friend_id, before, size)) for friend_id in friend_ids]
+
+    by_friend = {}
+    for start in range(0, len(friend_ids), FRIENDS_PER_QUERY):
+        chunk = [_friend_range(friend_id, before, size) for friend_id in friend_ids[start:start + FRIENDS_PER_QUERY]]
+        rows = chunk[0].union(*chunk[1:], all=True) if len(chunk) > 1 else chunk[0]
+        for row in rows:
+            by_friend.setdefault(row[1], []).append(row)
+    # Порядок строк UNION не гарантирован — восстанавливаем порядок внутри диапазона
+    return [sorted(rows, key=lambda row: (row[4], row[0]), reverse=True) for rows in by_friend.values()]
+
+
+def friends_timeline(user_id, cursor=None, limit=20):
+    """
+    Страница ленты друзей.
+
+    Args:
+        user_id: Id читателя
+        cursor: Курсор из предыдущей страницы (next_cursor) или None
+        limit: Размер страницы
+
+    Returns:
+        tuple: (список событий-словарей с username, курсор следующей страницы или None)
+    """
+    friend_ids = get_friend_ids(user_id)
+    if not friend_ids:
+        return [], None
+    before = decode_cursor(cursor) if cursor else None
+
+    merged = heapq.merge(*_ranges(friend_ids, before, limit + 1), key=lambda row: (row[4], row[0]), reverse=True)
+    rows = list(islice(merged, limit + 1))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    usernames = dict(User.objects.filter(id__in={row[1] for row in rows}).values_list('id', 'username'))
+    events = [
+        {**dict(zip(FIELDS, row)), 'user_username': usernames.get(row[1])}
+        for row in rows
+    ]
+    next_cursor = encode_cursor(rows[-1][4], rows[-1][0]) if has_more else None
+    return events, next_cursor
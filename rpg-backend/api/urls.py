@@ -6,7 +6,7 @@ from .views import (
     ItemViewSet, StoreItemViewSet, InventoryItemViewSet, EquippedItemViewSet,
     LeaderboardViewSet, NotificationViewSet, ActivityLogViewSet, 
     FriendRequestViewSet, MessageViewSet, QuestCommentViewSet, QuestLikeViewSet, 
-    GroupPostViewSet, GroupPostCommentViewSet, GroupGoalViewSet
+    GroupPostViewSet, GroupPostCommentViewSet, GroupGoalViewSet, ExportViewSet
 )
 
 router = routers.DefaultRouter()
@@ -31,6 +31,7 @@ router.register('quest-likes', QuestLikeViewSet, basename='quest-likes')
 router.register('group-posts', GroupPostViewSet, basename='group-posts')
 router.register('group-post-comments', GroupPostCommentViewSet, basename='group-post-comments')
 router.register('group-goals', GroupGoalViewSet, basename='group-goals')
+router.register('exports', ExportViewSet, basename='exports')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,8 +1,15 @@
 from django.utils import timezone
+from django.conf import settings
 from datetime import date, timedelta
-from .models import User, QuestAssignment, Achievement, AchievementProgress, Notification, CurrencyTransaction, GroupGoal
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from .models import (
+    User, QuestAssignment, Achievement, AchievementProgress, Notification, GroupGoal, GroupGoalContribution,
+    GroupGoalContributor,
+)
 from django.db.models import Q, Sum, Count, F
 from django.db import transaction
+from .ledger import XP, COINS, earned_since_expr, record
+from .activity_log import ACHIEVEMENT_UNLOCKED, log_activity
 import re
 
 
@@ -24,7 +31,41 @@ def calculate_xp_for_level(level):
     return int(base_xp * (level ** 1.5))
 
 
-def add_xp_to_user(user, xp_amount, reason="", meta=None):
+def calculate_total_xp(level, xp):
+    """
+    Вычисляет XP, заработанный пользователем за всё время.
+    
+    При повышении уровня XP списывается, поэтому накопленный опыт
+    восстанавливается по кривой уровней.
+    
+    Args:
+        level: Текущий уровень
+        xp: Текущий остаток XP на уровне
+        
+    Returns:
+        int: Суммарно заработанный XP
+    """
+    return sum(calculate_xp_for_level(lvl) for lvl in range(1, level)) + xp
+
+
+def level_from_total_xp(total_xp):
+    """
+    Обратная к calculate_total_xp: уровень и остаток XP для накопленного опыта.
+    
+    Args:
+        total_xp: XP, заработанный за всё время
+        
+    Returns:
+        tuple: (уровень, остаток XP на уровне)
+    """
+    level, xp = 1, max(0, total_xp)
+    while xp >= calculate_xp_for_level(level):
+        xp -= calculate_xp_for_level(level)
+        level += 1
+    return level, xp
+
+
+def add_xp_to_user(user, xp_amount, reason="", meta=None, boost=True):
     """
     Добавляет XP пользователю и автоматически повышает уровень при необходимости.
     
@@ -36,10 +77,18 @@ def add_xp_to_user(user, xp_amount, reason="", meta=None):
         xp_amount: Количество XP для добавления
         reason: Причина начисления XP (для транзакции)
         meta: Дополнительные метаданные для транзакции
+        boost: Применить действующий буст XP (xp_multiplier)
         
     Returns:
         int: Новый уровень пользователя
     """
+    if boost:
+        from .effects import get_multiplier
+        multiplier = get_multiplier(user, 'xp_multiplier')
+        if multiplier != 1:
+            xp_amount = int(xp_amount * multiplier)
+            meta = {**(meta or {}), "xp_multiplier": multiplier}
+    
     user.xp += xp_amount
     
     # Проверяем, нужно ли повысить уровень
@@ -58,19 +107,43 @@ def add_xp_to_user(user, xp_amount, reason="", meta=None):
         else:
             break
     
-    user.save()
+    # Пользователь, журнал и день календаря — одной транзакцией и в порядке
+    # блокировок User -> LedgerAccount -> ActivityYear, как у остальных писателей
+    # (иначе параллельные начисления одному пользователю взаимоблокируются).
+    # Пересборка календаря видит либо все записи, либо ни одной
+    from .activity_calendar import record_activity
+    with transaction.atomic():
+        # Только XP и уровень: полная запись устаревшего объекта затёрла бы монеты,
+        # списанные условным UPDATE (покупки, см. api/shop.py)
+        user.save(update_fields=['xp', 'level'])
+        record(user, XP, xp_amount, reason or "Начисление XP", meta)
+        record_activity(user, xp=xp_amount)
     
-    # Записываем транзакцию
-    CurrencyTransaction.objects.create(
-        user=user,
-        delta=xp_amount,
-        reason=reason or "Начисление XP",
-        meta=meta or {}
-    )
+    from .aggregates import record_xp_award
+    record_xp_award(user, xp_amount)
     
     return user.level
 
 
+def get_time_zone(name):
+    """
+    Часовой пояс по имени IANA.
+    
+    Returns:
+        ZoneInfo или None, если имя неизвестно
+    """
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def user_today(user):
+    """Текущая дата в часовом поясе пользователя (или TIME_ZONE)"""
+    tz = get_time_zone(user.time_zone or settings.TIME_ZONE) or timezone.get_default_timezone()
+    return timezone.localdate(timezone=tz)
+
+
 def update_streak(user):
     """
     Обновляет streak (серию дней активности) пользователя.
@@ -84,7 +157,7 @@ def update_streak(user):
     Returns:
         int: Текущее значение streak
     """
-    today = date.today()
+    today = user_today(user)
     
     if user.last_activity_date is None:
         # Первая активность
@@ -102,7 +175,7 @@ def update_streak(user):
         user.streak = 1
         user.last_activity_date = today
     
-    user.save()
+    user.save(update_fields=['streak', 'last_activity_date'])
     return user.streak
 
 
@@ -208,14 +281,9 @@ def check_achievements(user):
                 add_xp_to_user(user, achievement.xp_reward, f"Достижение: {achievement.title}")
             
             if achievement.coin_reward > 0:
-                user.coins += achievement.coin_reward
-                user.save()
-                CurrencyTransaction.objects.create(
-                    user=user,
-                    delta=achievement.coin_reward,
-                    reason=f"Достижение: {achievement.title}",
-                    meta={"achievement_id": achievement.id}
-                )
+                User.objects.filter(pk=user.pk).update(coins=F('coins') + achievement.coin_reward)
+                user.refresh_from_db(fields=['coins'])
+                record(user, COINS, achievement.coin_reward, f"Достижение: {achievement.title}", {"achievement_id": achievement.id})
             
             # Создаем уведомление
             Notification.objects.create(
@@ -224,12 +292,71 @@ def check_achievements(user):
                 body=f"Вы получили достижение: {achievement.title}",
                 data={"achievement_id": achievement.id, "achievement_title": achievement.title, "type": "achievement"}
             )
+            log_activity(user, ACHIEVEMENT_UNLOCKED, achievement_id=achievement.id, achievement_title=achievement.title)
             
             new_achievements.append(achievement)
     
     return new_achievements
 
 
+def contribute_to_group_goal(goal, user, xp_amount):
+    """
+    Атомарно вносит вклад пользователя в групповую цель.
+    
+    Прибавление выполняется одним UPDATE (current_xp = current_xp + x), поэтому
+    параллельные вклады не теряются. Выполнение цели фиксируется
+    compare-and-set'ом по is_completed: награды участникам выдаёт ровно
+    один запрос, который перевёл цель в выполненную.
+    
+    Args:
+        goal: Объект групповой цели
+        user: Пользователь, вносящий вклад
+        xp_amount: Размер вклада (положительное число)
+        
+    Returns:
+        tuple: (обновлённая цель, True если этот вклад завершил цель)
+        или (цель, None), если цель уже была выполнена
+    """
+    with transaction.atomic():
+        updated = GroupGoal.objects.filter(pk=goal.pk, is_completed=False).update(
+            current_xp=F('current_xp') + xp_amount
+        )
+        if not updated:
+            goal.refresh_from_db()
+            return goal, None
+        
+        GroupGoalContribution.objects.create(goal=goal, user=user, xp=xp_amount)
+        totals = GroupGoalContributor.objects.filter(goal=goal, user=user)
+        increment = {'total_xp': F('total_xp') + xp_amount, 'contributions': F('contributions') + 1, 'updated_at': timezone.now()}
+        if not totals.update(**increment):
+            GroupGoalContributor.objects.get_or_create(goal=goal, user=user)
+            totals.update(**increment)
+        
+        completed = GroupGoal.objects.filter(
+            pk=goal.pk, is_completed=False, current_xp__gte=F('target_xp')
+        ).update(is_completed=True, completed_at=timezone.now())
+        
+        goal.refresh_from_db()
+        if completed:
+            # Награждаем всех участников группы (с учётом группового буста)
+            from .effects import apply_multiplier
+            members = list(goal.group.members.all())
+            for member in members:
+                reward = apply_multiplier(member, 'group_boost', 50)
+                add_xp_to_user(member, reward, f"Групповая цель выполнена: {goal.title}", {"goal_id": goal.id})
+            Notification.objects.bulk_create([
+                Notification(
+                    user=member,
+                    title="Групповая цель выполнена!",
+                    body=f"Группа {goal.group.name} выполнила цель: {goal.title}",
+                    data={"goal_id": goal.id, "type": "group_goal_completed"}
+                )
+                for member in members
+            ])
+    
+    return goal, bool(completed)
+
+
 def get_leaderboard(period="all", faculty=None, group_name=None):
     """
     Возвращает рейтинг пользователей.
@@ -253,32 +380,11 @@ def get_leaderboard(period="all", faculty=None, group_name=None):
     if group_name:
         queryset = queryset.filter(group_name=group_name)
     
-    if period == "week":
-        week_ago = timezone.now() - timedelta(days=7)
-        # Получаем XP за неделю из транзакций
-        user_xp = CurrencyTransaction.objects.filter(
-            created_at__gte=week_ago,
-            delta__gt=0
-        ).values('user').annotate(
-            week_xp=Sum('delta')
-        )
-        # Создаем словарь для быстрого доступа
-        xp_dict = {item['user']: item['week_xp'] for item in user_xp}
-        # Сортируем по XP за неделю
-        queryset_list = sorted(list(queryset), key=lambda u: xp_dict.get(u.id, 0), reverse=True)
-        return queryset_list[:100]
-    
-    elif period == "month":
-        month_ago = timezone.now() - timedelta(days=30)
-        user_xp = CurrencyTransaction.objects.filter(
-            created_at__gte=month_ago,
-            delta__gt=0
-        ).values('user').annotate(
-            month_xp=Sum('delta')
-        )
-        xp_dict = {item['user']: item['month_xp'] for item in user_xp}
-        queryset_list = sorted(list(queryset), key=lambda u: xp_dict.get(u.id, 0), reverse=True)
-        return queryset_list[:100]
+    if period in ("week", "month"):
+        # XP за период — разность балансов журнала XP (два индексных поиска на пользователя)
+        since = timezone.now() - timedelta(days=7 if period == "week" else 30)
+        queryset = queryset.annotate(period_xp=earned_since_expr(XP, since)).order_by('-period_xp', 'id')
+        return list(queryset[:100])
     
     # По умолчанию сортируем по уровню и XP, преобразуем в список
     queryset = queryset.order_by('-level', '-xp')[:100]
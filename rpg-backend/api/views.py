@@ -1,16 +1,48 @@
-from rest_framework import viewsets, filters, status
+from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.utils.urls import replace_query_param
 from django.shortcuts import get_object_or_404
+from django.http import Http404, StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Q, Count, Sum
+from django.db import transaction
+from django.db.models import Q, F, Count, Sum, Prefetch, Exists, OuterRef, Value, BooleanField
 from datetime import timedelta
 
 from .models import *
 from .serializers import *
-from .permissions import IsAdminOrReadOnly, IsOwnerOrAdmin
-from .utils import add_xp_to_user, update_streak, check_achievements, get_leaderboard, get_user_rank, calculate_xp_for_level
+from .permissions import IsAdmin, IsAdminOrReadOnly, IsOwnerOrAdmin
+from .pagination import ActivityLogPagination, GroupFeedPagination, GroupPostCommentPagination, LedgerPagination
+from .utils import (
+    add_xp_to_user, update_streak, check_achievements, get_leaderboard, get_user_rank, calculate_xp_for_level,
+    contribute_to_group_goal,
+)
+from .aggregates import current_week_start, record_quest_completed
+from .activity_calendar import get_year, record_activity
+from .activity_log import GROUP_JOINED, GROUP_LEFT, QUEST_COMPLETED, log_activity
+from .search import QuestSearchFilter
+from .idempotency import idempotent
+from .catalog import get_store_item, store_list
+from .effects import apply_multiplier, get_active_effects, use_item
+from .explore import explore_page, hot_score
+from .exports import CSV, DATASETS, build_queryset, iter_rows, stream
+from .ledger import COINS, XP, detail_horizon, ledger_history, month_start_datetime, record as record_ledger
+from .shop import catalog_queryset, checkout, parse_cart, parse_quantity, purchase_store_item, reserve_flash_item
+from .timeline import friends_timeline
+
+
+def annotate_assignments(queryset, user):
+    """
+    Добавляет к назначениям likes_count и is_liked одним запросом
+    вместо двух запросов на каждую строку в сериализаторе.
+    """
+    queryset = queryset.annotate(likes_count=Count('likes'))
+    if user.is_authenticated:
+        return queryset.annotate(is_liked=Exists(
+            QuestLike.objects.filter(quest_assignment=OuterRef('pk'), user=user)
+        ))
+    return queryset.annotate(is_liked=Value(False, output_field=BooleanField()))
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -22,6 +54,7 @@ class UserViewSet(viewsets.ModelViewSet):
     - me: получение данных текущего пользователя
     - stats: статистика пользователя
     - search: поиск пользователей по username
+    - activity: календарь активности пользователя за год
     """
     queryset = User.objects.all().select_related('profile')
     
@@ -63,6 +96,66 @@ class UserViewSet(viewsets.ModelViewSet):
         }
         return Response(stats)
     
+    def get_ledger_currency(self, request):
+        currency = request.query_params.get('currency', XP)
+        if currency not in (XP, COINS):
+            return None
+        return currency
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def ledger(self, request):
+        """
+        Помесячная история XP или монет текущего пользователя.
+        
+        Параметры: currency (xp/coins, по умолчанию xp), months (1–60, по умолчанию 12).
+        """
+        currency = self.get_ledger_currency(request)
+        if currency is None:
+            return Response({'detail': 'currency должен быть xp или coins'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            months = min(60, max(1, int(request.query_params.get('months', 12))))
+        except ValueError:
+            return Response({'detail': 'months должен быть числом'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'currency': currency, 'months': ledger_history(request.user.pk, currency, months)})
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def transactions(self, request):
+        """
+        Подробные записи журнала текущего пользователя (курсорная пагинация).
+        
+        Доступны только записи за период подробного хранения; более старые
+        месяцы — в /users/ledger/.
+        """
+        currency = self.get_ledger_currency(request)
+        if currency is None:
+            return Response({'detail': 'currency должен быть xp или coins'}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = CurrencyTransaction.objects.filter(
+            user=request.user, currency=currency, created_at__gte=month_start_datetime(detail_horizon())
+        )
+        paginator = LedgerPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(CurrencyTransactionSerializer(page, many=True).data)
+    
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def activity(self, request, pk=None):
+        """
+        Календарь активности пользователя за год: выполненные квесты и XP по дням.
+        
+        Параметр year (по умолчанию текущий). Массивы начинаются с 1 января.
+        """
+        if not str(pk).isdigit():
+            raise Http404
+        try:
+            year = int(request.query_params.get('year', timezone.localdate().year))
+        except ValueError:
+            return Response({'detail': 'year должен быть числом'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 2000 <= year <= 9998:
+            return Response({'detail': 'Недопустимый год'}, status=status.HTTP_400_BAD_REQUEST)
+        calendar = get_year(int(pk), year)
+        if calendar is None:
+            raise Http404
+        return Response(calendar)
+    
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def search(self, request):
         """Поиск пользователей по username"""
@@ -91,7 +184,7 @@ class GroupViewSet(viewsets.ModelViewSet):
         return context
     
     def get_permissions(self):
-        if self.action in ['create']:
+        if self.action in ['create', 'feed']:
             return [IsAuthenticated()]
         elif self.action in ['update', 'partial_update', 'destroy']:
             return [IsAuthenticated(), IsOwnerOrAdmin()]
@@ -125,6 +218,7 @@ class GroupViewSet(viewsets.ModelViewSet):
             body=f"Вы присоединились к группе: {group.name}",
             data={"group_id": group.id, "type": "group_joined"}
         )
+        log_activity(request.user, GROUP_JOINED, group_id=group.id, group_name=group.name)
         
         return Response({'detail': 'Присоединились к группе'})
     
@@ -135,7 +229,50 @@ class GroupViewSet(viewsets.ModelViewSet):
         if not group.members.filter(id=request.user.id).exists():
             return Response({'detail': 'Не в группе'}, status=status.HTTP_400_BAD_REQUEST)
         group.members.remove(request.user)
+        log_activity(request.user, GROUP_LEFT, group_id=group.id, group_name=group.name)
         return Response({'detail': 'Покинули группу'})
+    
+    @action(detail=True, methods=['get'])
+    def feed(self, request, pk=None):
+        """
+        Лента постов группы.
+        
+        Посты отдаются по курсору (?cursor=..., ?limit=N), у каждого поста
+        есть comments_count и latest_comments — последние ?comments=N
+        комментариев (по умолчанию 3, максимум 10). Страница обходится
+        тремя запросами независимо от размера группы.
+        """
+        group = self.get_object()
+        try:
+            preview_size = int(request.query_params.get('comments', 3))
+        except ValueError:
+            return Response({'detail': 'Параметр comments должен быть числом'}, status=status.HTTP_400_BAD_REQUEST)
+        preview_size = max(0, min(preview_size, 10))
+        
+        posts = GroupPost.objects.filter(group=group).select_related('author').annotate(
+            comments_count=Count('comments')
+        )
+        if preview_size:
+            posts = posts.prefetch_related(Prefetch(
+                'comments',
+                queryset=GroupPostComment.objects.select_related('author').order_by('-created_at', '-id')[:preview_size],
+                to_attr='latest_comments'
+            ))
+        
+        paginator = GroupFeedPagination()
+        page = paginator.paginate_queryset(posts, request, view=self)
+        if not preview_size:
+            for post in page:
+                post.latest_comments = []
+        serializer = GroupFeedPostSerializer(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+    
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        """Статистика группы: участники, суммарный XP, XP за неделю, выполненные квесты"""
+        group = self.get_object()
+        stats, _ = GroupStats.objects.get_or_create(group=group, defaults={'course_id': group.course_id})
+        return Response(GroupStatsSerializer(stats).data)
 
 
 class QuestViewSet(viewsets.ModelViewSet):
@@ -143,24 +280,25 @@ class QuestViewSet(viewsets.ModelViewSet):
     ViewSet для управления квестами.
     
     Публичные квесты видны всем, личные - только создателю.
-    Поддерживает поиск по названию и описанию.
+    Поддерживает полнотекстовый поиск (?search=) с ранжированием
+    по релевантности и подсветкой совпадений.
     Включает кастомное действие:
     - accept: принятие публичного квеста (создание assignment)
+    - recommended: персональные рекомендации публичных квестов
     """
     queryset = Quest.objects.all().select_related('created_by')
     serializer_class = QuestSerializer
-    filter_backends = [filters.SearchFilter]
-    search_fields = ['title', 'description']
+    filter_backends = [QuestSearchFilter]
     
     def get_permissions(self):
-        if self.action in ['create']:
+        if self.action in ['create', 'recommended']:
             return [IsAuthenticated()]
         elif self.action in ['update', 'partial_update', 'destroy']:
             return [IsAuthenticated(), IsOwnerOrAdmin()]
         return [AllowAny()]
     
     def get_queryset(self):
-        queryset = Quest.objects.all().select_related('created_by')
+        queryset = Quest.objects.all().select_related('created_by').annotate(comments_count=Count('comments'))
         # Публичные квесты видны всем, личные - только создателю
         if self.request.user.is_authenticated:
             if self.request.user.role == 'admin':
@@ -187,6 +325,7 @@ class QuestViewSet(viewsets.ModelViewSet):
                 )
     
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    @idempotent
     def accept(self, request, pk=None):
         """Принять публичный квест (создать assignment)"""
         quest = self.get_object()
@@ -195,8 +334,7 @@ class QuestViewSet(viewsets.ModelViewSet):
             return Response({'detail': 'Этот квест не публичный'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Проверяем, не принят ли уже квест
-        existing = QuestAssignment.objects.filter(quest=quest, user=request.user).first()
-        if existing:
+        if QuestAssignment.objects.filter(quest=quest, user=request.user).exists():
             return Response({'detail': 'Квест уже принят'}, status=status.HTTP_400_BAD_REQUEST)
         
         # Создаем assignment
@@ -210,6 +348,31 @@ class QuestViewSet(viewsets.ModelViewSet):
         
         serializer = QuestAssignmentSerializer(assignment, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['get'])
+    def recommended(self, request):
+        """
+        Рекомендованные квесты текущего пользователя.
+        
+        Список предрассчитывается командой compute_recommendations;
+        пока его нет, возвращаются новые публичные квесты.
+        """
+        recommendation = QuestRecommendation.objects.filter(user=request.user).first()
+        if recommendation is None:
+            quests = self.get_queryset().filter(is_public=True).exclude(
+                assignments__user=request.user
+            ).order_by('-created_at')[:10]
+            return Response(self.get_serializer(quests, many=True).data)
+        
+        scores = {item['quest']: item['score'] for item in recommendation.items}
+        quests = {quest.id: quest for quest in self.get_queryset().filter(id__in=scores, is_public=True)}
+        data = []
+        for quest_id, score in scores.items():
+            if quest_id in quests:
+                row = self.get_serializer(quests[quest_id]).data
+                row['recommendation_score'] = score
+                data.append(row)
+        return Response(data)
 
 
 class QuestAssignmentViewSet(viewsets.ModelViewSet):
@@ -219,9 +382,10 @@ class QuestAssignmentViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
+        queryset = annotate_assignments(QuestAssignment.objects.select_related('quest', 'user'), user)
         if user.role == 'admin':
-            return QuestAssignment.objects.all().select_related('quest', 'user')
-        return QuestAssignment.objects.filter(user=user).select_related('quest', 'user')
+            return queryset
+        return queryset.filter(user=user)
     
     def get_serializer_context(self):
         context = super().get_serializer_context()
@@ -231,7 +395,28 @@ class QuestAssignmentViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @action(detail=False, methods=['get'])
+    def explore(self, request):
+        """
+        Лента «Обзор»: недавно выполненные публичные квесты всех пользователей
+        по горячести (лайки и новизна).
+        
+        Курсорная пагинация: ?limit=N (по умолчанию 20, максимум 100), ?cursor=... из next.
+        Порядок фиксируется на первой странице (см. api/explore.py).
+        """
+        try:
+            limit = min(100, max(1, int(request.query_params.get('limit', 20))))
+        except ValueError:
+            return Response({'detail': 'limit должен быть числом'}, status=status.HTTP_400_BAD_REQUEST)
+        page, next_cursor = explore_page(request.user, request.query_params.get('cursor'), limit)
+        serializer = ExploreAssignmentSerializer(page, many=True, context=self.get_serializer_context())
+        next_url = None
+        if next_cursor:
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+        return Response({'next': next_url, 'results': serializer.data})
+
     @action(detail=True, methods=['post'])
+    @idempotent
     def complete(self, request, pk=None):
         """
         Выполнить квест (отметить как выполненный).
@@ -259,15 +444,31 @@ class QuestAssignmentViewSet(viewsets.ModelViewSet):
         if quest.deadline and assignment.completed_at < quest.deadline:
             xp_reward = int(xp_reward * 1.2)  # +20% бонус
         
+        # Действующие бусты пользователя
+        user = assignment.user
+        xp_reward = apply_multiplier(user, 'xp_multiplier', xp_reward)
+        coin_reward = apply_multiplier(user, 'coins_multiplier', coin_reward)
+        
         assignment.xp_reward = xp_reward
         assignment.coin_reward = coin_reward
-        assignment.save()
+        assignment.hot_score = hot_score(0, assignment.completed_at)
+        with transaction.atomic():
+            assignment.save()
+            # В одной транзакции с completed_at — см. rebuild_calendar
+            record_activity(user, completions=1)
         
         # Начисляем XP и обновляем streak
-        user = assignment.user
-        add_xp_to_user(user, xp_reward, f"Выполнение квеста: {quest.title}")
-        user.coins += coin_reward
-        user.save()
+        add_xp_to_user(user, xp_reward, f"Выполнение квеста: {quest.title}", boost=False)
+        User.objects.filter(pk=user.pk).update(coins=F('coins') + coin_reward)
+        user.refresh_from_db(fields=['coins'])
+        if coin_reward:
+            record_ledger(user, COINS, coin_reward, f"Выполнение квеста: {quest.title}", {"quest_id": quest.id})
+        
+        record_quest_completed(user)
+        log_activity(
+            user, QUEST_COMPLETED,
+            assignment_id=assignment.id, quest_id=quest.id, quest_title=quest.title, xp=xp_reward, coins=coin_reward,
+        )
         
         # Обновляем streak
         update_streak(user)
@@ -324,75 +525,96 @@ class StoreItemViewSet(viewsets.ModelViewSet):
     serializer_class = StoreItemSerializer
     
     def get_permissions(self):
-        if self.action in ['list', 'retrieve', 'purchase']:
+        if self.action in ['list', 'retrieve', 'purchase', 'reservation', 'checkout', 'catalog']:
             return [IsAuthenticated()]
         return [IsAdminOrReadOnly()]
     
+    def list(self, request, *args, **kwargs):
+        """Список товаров из кэша каталога; ETag меняется вместе с каталогом или остатками"""
+        data, etag = store_list()
+        if etag in request.headers.get('If-None-Match', ''):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        return response
+    
+    def get_cached_store_item(self):
+        try:
+            store_item = get_store_item(int(self.kwargs['pk']))
+        except (TypeError, ValueError):
+            store_item = None
+        if store_item is None:
+            raise Http404
+        return store_item
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def catalog(self, request):
+        """
+        Витрина магазина для текущего пользователя одним запросом:
+        сколько предметов уже есть, экипирован ли, сколько ещё можно купить
+        по лимиту и хватает ли монет.
+        """
+        serializer = StoreCatalogItemSerializer(catalog_queryset(request.user), many=True)
+        return Response(serializer.data)
+    
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
+    @idempotent
     def purchase(self, request, pk=None):
-        """Купить предмет из магазина"""
-        store_item = self.get_object()
-        user = request.user
-        quantity = request.data.get('quantity', 1)
-        
-        if not store_item.is_active:
-            return Response({'detail': 'Предмет недоступен для покупки'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Проверка наличия на складе
-        if store_item.stock is not None and store_item.stock < quantity:
-            return Response({'detail': 'Недостаточно товара на складе'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Проверка лимита покупок
-        if store_item.purchase_limit:
-            purchases_count = InventoryItem.objects.filter(
-                user=user, 
-                item=store_item.item
-            ).count()
-            if purchases_count >= store_item.purchase_limit:
-                return Response({'detail': 'Достигнут лимит покупок этого предмета'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Проверка достаточности средств
-        total_cost = store_item.price * quantity
-        if user.coins < total_cost:
-            return Response({'detail': 'Недостаточно монет'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        # Покупка
-        user.coins -= total_cost
-        user.save()
-        
-        # Создаем запись в инвентаре
-        inventory_item, created = InventoryItem.objects.get_or_create(
-            user=user,
-            item=store_item.item,
-            defaults={'quantity': quantity}
-        )
-        if not created:
-            inventory_item.quantity += quantity
-            inventory_item.save()
-        
-        # Обновляем склад
-        if store_item.stock is not None:
-            store_item.stock -= quantity
-            store_item.save()
-        
-        # Создаем транзакцию
-        CurrencyTransaction.objects.create(
-            user=user,
-            delta=-total_cost,
-            reason=f"Покупка: {store_item.item.name} x{quantity}",
-            meta={"store_item_id": store_item.id, "item_id": store_item.item.id, "quantity": quantity}
-        )
-        
-        # Создаем уведомление
-        Notification.objects.create(
-            user=user,
-            title="Покупка выполнена",
-            body=f"Вы купили {store_item.item.name} x{quantity} за {total_cost} монет",
-            data={"store_item_id": store_item.id, "item_id": store_item.item.id, "type": "item_purchased"}
-        )
-        
+        """Купить предмет из магазина (метаданные товара — из кэша каталога)"""
+        store_item = self.get_cached_store_item()
+        if store_item.is_flash_sale:
+            return self.reserve(request, store_item)
+        quantity = parse_quantity(request.data.get('quantity', 1))
+        inventory_item = purchase_store_item(request.user, store_item, quantity)
         serializer = InventoryItemSerializer(inventory_item)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
+    @idempotent
+    def checkout(self, request):
+        """
+        Купить несколько товаров одной транзакцией.
+        
+        Тело запроса: {"items": [{"store_item": id, "quantity": n}, ...]}.
+        Корзина покупается целиком или не покупается совсем.
+        """
+        cart = parse_cart(request.data.get('items'))
+        inventory, total_cost = checkout(request.user, cart)
+        return Response({
+            'total_cost': total_cost,
+            'coins': request.user.coins,
+            'items': InventoryItemSerializer(inventory, many=True).data,
+        }, status=status.HTTP_201_CREATED)
+    
+    def reserve(self, request, store_item):
+        """
+        Покупка в режиме распродажи: ответ reserved (предмет получен),
+        queued (заявка в очереди, статус — в /reservation/) или sold_out.
+        """
+        result, obj = reserve_flash_item(request.user, store_item)
+        if result == 'reserved':
+            data = {'status': result, 'inventory_item': InventoryItemSerializer(obj).data}
+            return Response(data, status=status.HTTP_201_CREATED)
+        if result == 'queued':
+            return Response({'status': result, 'request_id': obj.id}, status=status.HTTP_202_ACCEPTED)
+        return Response({'status': result, 'detail': 'Товар распродан'}, status=status.HTTP_409_CONFLICT)
+    
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def reservation(self, request, pk=None):
+        """Статус последней заявки пользователя на товар распродажи"""
+        flash_request = FlashSaleRequest.objects.filter(
+            store_item_id=pk, user=request.user
+        ).order_by('-created_at').first()
+        if flash_request is None:
+            return Response({'detail': 'Заявок нет'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'request_id': flash_request.id,
+            'status': flash_request.status,
+            'detail': flash_request.detail,
+            'created_at': flash_request.created_at,
+            'processed_at': flash_request.processed_at,
+        })
 
 
 class InventoryItemViewSet(viewsets.ModelViewSet):
@@ -430,6 +652,33 @@ class InventoryItemViewSet(viewsets.ModelViewSet):
         
         return Response({'detail': 'Этот тип предмета нельзя экипировать'}, status=status.HTTP_400_BAD_REQUEST)
     
+    @action(detail=True, methods=['post'])
+    @idempotent
+    def use(self, request, pk=None):
+        """Использовать буст или расходник: списывает одну единицу и применяет эффекты"""
+        inventory_item = self.get_object()
+        if inventory_item.user != request.user:
+            return Response({'detail': 'Нет прав'}, status=status.HTTP_403_FORBIDDEN)
+        result = use_item(request.user, inventory_item)
+        return Response({
+            'effects': ActiveEffectSerializer(result['effects'], many=True).data,
+            'xp': result['xp'],
+            'coins': result['coins'],
+            'streak': result['streak'],
+            'user': UserSerializer(request.user).data,
+        })
+    
+    @action(detail=False, methods=['get'])
+    def effects(self, request):
+        """Действующие бусты текущего пользователя и итоговые множители"""
+        active = ActiveEffect.objects.filter(
+            user=request.user, expires_at__gt=timezone.now()
+        ).select_related('item').order_by('expires_at')
+        return Response({
+            'multipliers': get_active_effects(request.user.pk),
+            'effects': ActiveEffectSerializer(active, many=True).data,
+        })
+    
     @action(detail=True, methods=['post'])
     def unequip(self, request, pk=None):
         """Снять предмет"""
@@ -520,6 +769,39 @@ class LeaderboardViewSet(viewsets.ReadOnlyModelViewSet):
                 })
         
         return Response(data)
+    
+    @action(detail=False, methods=['get'])
+    def groups(self, request):
+        """
+        Рейтинг групп по материализованной статистике.
+        
+        Параметры: course (id курса), period (all, week).
+        """
+        queryset = GroupStats.objects.select_related('group').filter(group__is_public=True)
+        course_id = request.query_params.get('course')
+        if course_id:
+            queryset = queryset.filter(course_id=course_id)
+        if request.query_params.get('period', 'all') == 'week':
+            queryset = queryset.filter(week_start=current_week_start()).order_by('-week_xp')
+        else:
+            queryset = queryset.order_by('-total_xp')
+        return Response(self._ranked(GroupStatsSerializer(queryset[:100], many=True).data))
+    
+    @action(detail=False, methods=['get'])
+    def courses(self, request):
+        """Рейтинг курсов по материализованной статистике (period: all, week)"""
+        queryset = CourseStats.objects.select_related('course')
+        if request.query_params.get('period', 'all') == 'week':
+            queryset = queryset.filter(week_start=current_week_start()).order_by('-week_xp')
+        else:
+            queryset = queryset.order_by('-total_xp')
+        return Response(self._ranked(CourseStatsSerializer(queryset[:100], many=True).data))
+    
+    @staticmethod
+    def _ranked(rows):
+        for idx, row in enumerate(rows, 1):
+            row['rank'] = idx
+        return rows
 
 
 class NotificationViewSet(viewsets.ModelViewSet):
@@ -532,9 +814,63 @@ class NotificationViewSet(viewsets.ModelViewSet):
 
 
 class ActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
+    """Журнал действий: администратор видит все записи, остальные — только свои"""
     queryset = ActivityLog.objects.all()
     serializer_class = ActivityLogSerializer
-    permission_classes = [IsAdminOrReadOnly]
+    permission_classes = [IsAuthenticated]
+    pagination_class = ActivityLogPagination
+    
+    def get_queryset(self):
+        user = self.request.user
+        if user.role == 'admin':
+            return ActivityLog.objects.all()
+        return ActivityLog.objects.filter(user=user)
+    
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def friends(self, request):
+        """
+        Лента друзей: выполненные квесты, покупки и достижения, новые сначала.
+        
+        Курсорная пагинация: ?limit=N (по умолчанию 20, максимум 100), ?cursor=... из next.
+        """
+        try:
+            limit = min(100, max(1, int(request.query_params.get('limit', 20))))
+        except ValueError:
+            return Response({'detail': 'limit должен быть числом'}, status=status.HTTP_400_BAD_REQUEST)
+        events, next_cursor = friends_timeline(request.user.pk, request.query_params.get('cursor'), limit)
+        next_url = None
+        if next_cursor:
+            next_url = replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor)
+        return Response({'next': next_url, 'results': events})
+
+
+class ExportViewSet(viewsets.ViewSet):
+    """
+    Потоковая выгрузка для отчётности (только администраторы).
+    
+    GET /api/exports/{набор}/?output=csv|ndjson&from=YYYY-MM-DD&to=YYYY-MM-DD&faculty=...&course=id
+    """
+    permission_classes = [IsAdmin]
+    
+    def list(self, request):
+        return Response({name: list(dataset.columns) for name, dataset in DATASETS.items()})
+    
+    def retrieve(self, request, pk=None):
+        params = request.query_params
+        output = params.get('output', CSV)
+        columns, queryset = build_queryset(
+            pk,
+            date_from=params.get('from'),
+            date_to=params.get('to'),
+            faculty=params.get('faculty'),
+            course=params.get('course'),
+        )
+        content = stream(output, columns, iter_rows(queryset))
+        content_type = 'text/csv; charset=utf-8' if output == CSV else 'application/x-ndjson; charset=utf-8'
+        response = StreamingHttpResponse(content, content_type=content_type)
+        filename = f'{pk}-{timezone.localdate():%Y%m%d}.{output}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
 
 class FriendRequestViewSet(viewsets.ModelViewSet):
@@ -628,10 +964,11 @@ class GroupPostViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
+        queryset = GroupPost.objects.all().select_related('author').annotate(comments_count=Count('comments'))
         group_id = self.request.query_params.get('group', None)
         if group_id:
-            return GroupPost.objects.filter(group_id=group_id).select_related('author')
-        return GroupPost.objects.all().select_related('author')
+            return queryset.filter(group_id=group_id)
+        return queryset
     
     def perform_create(self, serializer):
         group = serializer.validated_data['group']
@@ -647,6 +984,7 @@ class GroupPostCommentViewSet(viewsets.ModelViewSet):
     queryset = GroupPostComment.objects.all().select_related('author', 'post')
     serializer_class = GroupPostCommentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = GroupPostCommentPagination
     
     def get_queryset(self):
         post_id = self.request.query_params.get('post', None)
@@ -671,28 +1009,38 @@ class GroupGoalViewSet(viewsets.ModelViewSet):
         return GroupGoal.objects.all()
     
     @action(detail=True, methods=['post'])
+    @idempotent
     def contribute(self, request, pk=None):
         """Внести вклад в групповую цель"""
         goal = self.get_object()
-        xp_amount = request.data.get('xp', 0)
+        try:
+            xp_amount = int(request.data.get('xp', 0))
+        except (TypeError, ValueError):
+            return Response({'detail': 'Параметр xp должен быть числом'}, status=status.HTTP_400_BAD_REQUEST)
+        if xp_amount <= 0:
+            return Response({'detail': 'Вклад должен быть положительным'}, status=status.HTTP_400_BAD_REQUEST)
         
         if not goal.group.members.filter(id=request.user.id).exists():
             return Response({'detail': 'Вы не в группе'}, status=status.HTTP_403_FORBIDDEN)
         
-        goal.current_xp += xp_amount
-        if goal.current_xp >= goal.target_xp and not goal.is_completed:
-            goal.is_completed = True
-            goal.completed_at = timezone.now()
-            
-            # Награждаем всех участников группы
-            for member in goal.group.members.all():
-                add_xp_to_user(member, 50, f"Групповая цель выполнена: {goal.title}")
-                Notification.objects.create(
-                    user=member,
-                    title="Групповая цель выполнена!",
-                    body=f"Группа {goal.group.name} выполнила цель: {goal.title}",
-                    data={"goal_id": goal.id, "type": "group_goal_completed"}
-                )
-        
-        goal.save()
-        return Response(GroupGoalSerializer(goal).data)
\ No newline at end of file
+        goal, completed = contribute_to_group_goal(goal, request.user, xp_amount)
+        if completed is None:
+            return Response({'detail': 'Цель уже выполнена'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(GroupGoalSerializer(goal).data)
+    
+    @action(detail=True, methods=['get'])
+    def contributions(self, request, pk=None):
+        """Суммарный вклад каждого участника в цель (из итогов GroupGoalContributor)"""
+        goal = self.get_object()
+        totals = GroupGoalContributor.objects.filter(goal=goal).values(
+            'user', 'user__username', 'total_xp', 'contributions'
+        ).order_by('-total_xp', 'user')
+        return Response([
+            {
+                'user': row['user'],
+                'username': row['user__username'],
+                'total_xp': row['total_xp'],
+                'contributions': row['contributions'],
+            }
+            for row in totals
+        ])
@@ -71,6 +71,9 @@ else:
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
             'NAME': BASE_DIR / 'db.sqlite3',
+            # Тестовая база в файле, а не в общей памяти: иначе параллельные
+            # соединения тестов конкурентности получают блокировки без ожидания
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
         }
     }
 
@@ -103,6 +106,7 @@ from datetime import timedelta
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
+    'TOKEN_OBTAIN_SERIALIZER': 'api.serializers.LoginSerializer',
 }
 
 # Swagger/OpenAPI настройки
@@ -154,4 +158,33 @@ CORS_ALLOW_HEADERS = [
     'user-agent',
     'x-csrftoken',
     'x-requested-with',
-]
\ No newline at end of file
+    'idempotency-key',
+]
+
+CORS_EXPOSE_HEADERS = ['idempotent-replayed']
+
+# Сколько хранится ответ для повторов запроса с тем же Idempotency-Key
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+# Максимальное время жизни кэша действующих эффектов пользователя.
+# С общим кэшем (CACHES) активация сбрасывает его сразу во всех процессах,
+# с локальным — остальные процессы увидят новый эффект не позже чем через это время.
+EFFECTS_CACHE_TTL = timedelta(minutes=1)
+
+# Сколько последних месяцев журнала XP и монет хранится подробно;
+# более старые записи команда archive_ledger переносит в архив, оставляя помесячные итоги
+LEDGER_DETAIL_MONTHS = 6
+
+# Журнал действий пишется фоновым потоком пачками: по размеру пачки или
+# по интервалу; при переполнении очереди новые события отбрасываются
+ACTIVITY_LOG_BATCH_SIZE = 200
+ACTIVITY_LOG_FLUSH_INTERVAL = timedelta(seconds=2)
+ACTIVITY_LOG_QUEUE_SIZE = 10000
+
+# Лента «Обзор» показывает публичные квесты, выполненные за последние N дней
+EXPLORE_FEED_DAYS = 30
+# Порядок ленты «Обзор» фиксируется на первой странице: сколько записей и на сколько
+EXPLORE_SNAPSHOT_SIZE = 1000
+EXPLORE_SNAPSHOT_TTL = timedelta(minutes=30)
+
+# Сколько кэшируется множество друзей для ленты друзей (сбрасывается при изменении заявок)
+FRIENDS_CACHE_TTL = timedelta(minutes=10)